@@ -9,8 +9,22 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Core.settings')
 
 application = get_asgi_application()
+
+# Cache invalidation has to reach every worker process
+if not settings.DEBUG and not settings.SHARED_CACHE:
+    raise ImproperlyConfigured(
+        'Set REDIS_URL (or CACHE_DIR for workers on a single host) to give '
+        'the workers a shared cache.'
+    )
+
+# Build the per-worker search autocomplete index before the first request
+from courses.autocomplete import warm_up  # noqa: E402
+
+warm_up()
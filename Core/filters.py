@@ -0,0 +1,18 @@
+from rest_framework.filters import OrderingFilter
+
+
+class AliasOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter that also accepts named orderings.
+
+    Views map a public name to model orderings with `ordering_aliases`,
+    e.g. {'trending': ['-trending_score', '-created_at']}; `?ordering=trending`
+    then sorts by those fields. Other values behave as usual.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        aliases = getattr(view, 'ordering_aliases', {})
+        params = request.query_params.get(self.ordering_param)
+        if params and params.strip() in aliases:
+            return list(aliases[params.strip()])
+        return super().get_ordering(request, queryset, view)
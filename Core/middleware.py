@@ -0,0 +1,40 @@
+import logging
+
+from django.db import connection
+
+from .query_budgets import get_query_budget
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCountMiddleware:
+    """
+    Report the number of SQL queries a request ran in an X-Query-Count
+    header. Enabled by QUERY_COUNT_HEADER; the HTTP benchmark reads it to
+    show queries per request. Requests running more queries than their
+    view's declared budget are logged as warnings.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        count = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        response['X-Query-Count'] = str(count)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            budget = get_query_budget(match.func, request.method)
+            if budget is not None and count > budget:
+                logger.warning(
+                    '%s %s ran %d queries, over its budget of %d',
+                    request.method, request.path, count, budget,
+                )
+        return response
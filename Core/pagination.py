@@ -0,0 +1,169 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque cursor pagination over a composite, unique ordering.
+
+    Each page is fetched with a WHERE clause on the ordering columns of
+    the last row seen instead of an OFFSET, and no COUNT(*) is issued, so
+    deep pages cost the same as the first one. Views opt in by declaring
+    `keyset_ordering`, e.g. ('-created_at', 'id'); the last field must be
+    unique.
+
+    Views without a keyset ordering, and clients that send `?page=` (or a
+    custom `?ordering=`), get the classic page-number response instead.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    page_query_param = 'page'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+    fallback_class = PageNumberPagination
+    display_page_controls = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fallback = None
+        ordering = getattr(view, 'keyset_ordering', None)
+        if not ordering or self.use_page_numbers(request):
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.base_url = request.build_absolute_uri()
+
+        position, reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, ordering))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_previous, self.has_next = has_more, position is not None
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = results
+        return results
+
+    def use_page_numbers(self, request):
+        return (
+            self.page_query_param in request.query_params
+            or self.ordering_query_param in request.query_params
+        )
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response_schema(schema)
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'The pagination cursor value.',
+            'schema': {'type': 'string'},
+        }]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(encoded + padding))
+            values, reverse = payload['p'], bool(payload.get('r'))
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode()
+        ).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _position(self, obj):
+        values = []
+        for field in self.fields:
+            # Pages of values() querysets hold dicts
+            value = obj[field] if isinstance(obj, dict) else getattr(obj, field)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif not isinstance(value, (int, float)):
+                value = force_str(value)
+            values.append(value)
+        return values
+
+    def _invert(self, field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _after(self, position, ordering):
+        """Rows strictly after `position` in the given ordering"""
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                ordering[i].lstrip('-'): position[i] for i in range(index)
+            }
+            condition |= Q(**equal, **{f'{name}__{lookup}': position[index]})
+        return condition
@@ -0,0 +1,37 @@
+"""
+Per-endpoint SQL query budgets.
+
+Views declare the most queries one request may run: function views with
+the @query_budget decorator, viewsets with a `query_budgets` dict keyed
+by action name (list, retrieve, custom @action names). The budget tests
+in Core/tests.py request every viewset action and frontend page with a
+small and a ten times larger dataset, and fail when an endpoint has no
+budget, exceeds it, or runs more queries on more data.
+
+With QUERY_COUNT_HEADER enabled, QueryCountMiddleware also logs requests
+that exceed their view's budget.
+"""
+
+
+def query_budget(limit):
+    """Declare that a function view runs at most `limit` queries per request"""
+
+    def decorate(view):
+        view.query_budget = limit
+        return view
+
+    return decorate
+
+
+def get_query_budget(callback, method='get'):
+    """The declared budget of a resolved view for an HTTP method, or None"""
+    viewset = getattr(callback, 'cls', None)
+    if viewset is None:
+        return getattr(callback, 'query_budget', None)
+    action = (getattr(callback, 'actions', None) or {}).get(method.lower())
+    if action is None:
+        return None
+    budget = getattr(getattr(viewset, action, None), 'query_budget', None)
+    if budget is None:
+        budget = getattr(viewset, 'query_budgets', {}).get(action)
+    return budget
@@ -0,0 +1,175 @@
+"""
+EXPLAIN checks for the queries a piece of code runs.
+
+`capture_queries` records the SELECTs executed inside a block with their
+parameters, so they can be explained afterwards with the same values.
+`find_problems` explains each one and reports:
+
+- full scans of large tables: `Seq Scan` nodes on PostgreSQL, `SCAN`
+  steps without an index on SQLite;
+- pages (LIMIT queries) of a large table that are cut from a sort of
+  every matching row, rather than read in index order;
+- queries whose cost exceeds a budget. On PostgreSQL that is the
+  planner's estimated total cost; SQLite has no estimate, so the query is
+  run and its cost is the number of virtual machine instructions it
+  executed, in thousands.
+
+Which tables count as large is up to the caller, usually the ones with
+more than a few thousand rows in a seeded test database; scans of small
+lookup tables are what a good planner picks for them. Queries that read
+a whole table by design (catalog-wide aggregates) can be exempted from
+the scan check with `full_scans_allowed`; they still get the other checks.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SQLITE_SCAN_RE = re.compile(r'^SCAN (?P<table>\S+)(?: AS (?P<alias>\S+))?(?P<rest>.*)$')
+SQLITE_TABLE_RE = re.compile(r'^(?:SCAN|SEARCH) (?P<table>\S+)')
+# Django inlines LIMIT/OFFSET values at the end of the statement
+LIMIT_RE = re.compile(r'\s+LIMIT\s+\d+(?:\s+OFFSET\s+\d+)?\s*$', re.IGNORECASE)
+# A sorted page of at most this many input rows is fine
+SORTED_ROWS_LIMIT = 100
+
+
+@contextmanager
+def capture_queries(using=DEFAULT_DB_ALIAS):
+    """Collect (sql, params) of every SELECT run on `using` inside the block"""
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connections[using].execute_wrapper(record):
+        yield queries
+
+
+def explain(sql, params, using=DEFAULT_DB_ALIAS):
+    """The plan of one query: PostgreSQL's JSON plan, or SQLite's QUERY PLAN rows"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            return plan[0]['Plan'] if isinstance(plan, list) else plan
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+    raise NotImplementedError(f'EXPLAIN checks do not support {connection.vendor}')
+
+
+def sqlite_cost(sql, params, using=DEFAULT_DB_ALIAS):
+    """Thousands of SQLite VM instructions executed to run a query to completion"""
+    connection = connections[using]
+    steps = 0
+
+    def count():
+        nonlocal steps
+        steps += 1
+        return 0  # keep going
+
+    with connection.cursor() as cursor:
+        connection.connection.set_progress_handler(count, 1000)
+        try:
+            cursor.execute(sql, params)
+            cursor.fetchall()
+        finally:
+            connection.connection.set_progress_handler(None, 1000)
+    return steps
+
+
+def _postgres_problems(plan, large_tables, cost_budget, check_scans=True):
+    problems = []
+    if cost_budget is not None and plan['Total Cost'] > cost_budget:
+        problems.append(f'estimated cost {plan["Total Cost"]:.0f} exceeds {cost_budget}')
+    nodes = [(plan, False)]
+    while nodes:
+        node, limited = nodes.pop()
+        if (check_scans and node['Node Type'] == 'Seq Scan'
+                and node.get('Relation Name') in large_tables):
+            problems.append(f'sequential scan on {node["Relation Name"]}')
+        if node['Node Type'] == 'Sort' and limited:
+            rows = sum(child['Plan Rows'] for child in node.get('Plans', ()))
+            if rows > SORTED_ROWS_LIMIT:
+                problems.append(f'sorts {rows} rows to return a page')
+        limited = limited or node['Node Type'] == 'Limit'
+        nodes.extend((child, limited) for child in node.get('Plans', ()))
+    return problems
+
+
+def sqlite_rows(sql, params, using=DEFAULT_DB_ALIAS):
+    """Rows a LIMIT query would match without its LIMIT (SQLite estimates none)"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM ({LIMIT_RE.sub("", sql)})', params)
+        return cursor.fetchone()[0]
+
+
+def _sqlite_problems(sql, params, plan, large_tables, using, check_scans=True):
+    problems = []
+    tables = set()
+    for step in plan:
+        match = SQLITE_TABLE_RE.match(step)
+        if match:
+            tables.add(match.group('table'))
+        match = SQLITE_SCAN_RE.match(step)
+        if not match or match.group('table') not in large_tables:
+            continue
+        # "SCAN t USING [COVERING] INDEX i" walks an index in order (and stops
+        # at the LIMIT); a bare "SCAN t" reads the whole table.
+        if check_scans and 'INDEX' not in match.group('rest'):
+            problems.append(f'full scan on {match.group("table")}')
+    # Relevance-ranked full-text results (virtual tables) can only be sorted
+    sorted_page = (
+        LIMIT_RE.search(sql)
+        and tables & large_tables
+        and any(step.startswith('USE TEMP B-TREE FOR') and 'ORDER BY' in step for step in plan)
+        and not any('VIRTUAL TABLE' in step for step in plan)
+    )
+    if sorted_page:
+        rows = sqlite_rows(sql, params, using)
+        if rows > SORTED_ROWS_LIMIT:
+            problems.append(f'sorts {rows} rows to return a page')
+    return problems
+
+
+def find_problems(queries, large_tables, cost_budget=None, using=DEFAULT_DB_ALIAS,
+                  full_scans_allowed=()):
+    """
+    Explain captured `queries` and return (sql, plan, problems) for those
+    that scan a table in `large_tables` or cost more than `cost_budget`
+    (planner cost units on PostgreSQL, thousands of instructions on SQLite).
+    Queries matching one of the `full_scans_allowed` regexes may scan.
+    """
+    vendor = connections[using].vendor
+    found = []
+    for sql, params in queries:
+        plan = explain(sql, params, using)
+        check_scans = not any(pattern.search(sql) for pattern in full_scans_allowed)
+        if vendor == 'postgresql':
+            problems = _postgres_problems(plan, large_tables, cost_budget, check_scans)
+        else:
+            problems = _sqlite_problems(sql, params, plan, large_tables, using, check_scans)
+            if cost_budget is not None:
+                cost = sqlite_cost(sql, params, using)
+                if cost > cost_budget:
+                    problems.append(f'{cost}k VM instructions exceed {cost_budget}k')
+        if problems:
+            found.append((sql, plan, problems))
+    return found
+
+
+def large_tables(models, min_rows, using=DEFAULT_DB_ALIAS):
+    """db_table of each model in `models` holding at least `min_rows` rows"""
+    return {
+        model._meta.db_table for model in models
+        if model._default_manager.using(using).count() >= min_rows
+    }
+
+
+def analyze(using=DEFAULT_DB_ALIAS):
+    """Refresh planner statistics after bulk loads"""
+    with connections[using].cursor() as cursor:
+        cursor.execute('ANALYZE')
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# DRF's encoder turns Decimal, lazy strings, datetimes (with its own
+# millisecond/"Z" formatting), timedeltas, querysets etc. into JSON types;
+# orjson and msgpack call it for anything they do not handle natively.
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson.
+
+    With the default settings (compact, UTF-8, U+2028/U+2029 escaped) it
+    produces the same bytes as the stock renderer for serializer output;
+    only float spelling (1e16 vs 1e+16) and NaN handling differ. Indented
+    output (the browsable API, `; indent=` media type parameters) and
+    values orjson cannot encode (e.g. integers over 64 bits) go through
+    the stock renderer.
+    """
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like the stock renderer, so the output is valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack for clients that send `Accept: application/msgpack` (or
+    `?format=msgpack`).
+
+    The payload is the JSON one in binary form: Decimals are strings (as
+    with COERCE_DECIMAL_TO_STRING) and datetimes, dates, times, UUIDs etc.
+    use DRF's JSON spellings, so both formats decode to the same values.
+    Maps keep their insertion order.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True, datetime=False)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return _encoder.default(obj)
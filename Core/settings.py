@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 
 from decouple import Csv, config
@@ -75,6 +76,11 @@ MIDDLEWARE = [
     "django_browser_reload.middleware.BrowserReloadMiddleware",
 ]
 
+# Adds an X-Query-Count header to every response (used by benchmark_http)
+QUERY_COUNT_HEADER = config("QUERY_COUNT_HEADER", default=False, cast=bool)
+if QUERY_COUNT_HEADER:
+    MIDDLEWARE.insert(0, "Core.middleware.QueryCountMiddleware")
+
 ROOT_URLCONF = "Core.urls"
 
 TEMPLATES = [
@@ -116,6 +122,75 @@ if config("USE_SQLITE", default=False, cast=bool):
         }
     }
 
+# Cache
+# Cache invalidation bumps version keys that every worker process must
+# see, so serving with several workers needs a shared cache: Redis
+# (REDIS_URL), or files under CACHE_DIR for the workers of one host.
+# Without either, each process has its own memory cache, which is only
+# right for a single process (runserver); the WSGI/ASGI entry points
+# refuse to start that way unless DEBUG is on. Tests always get their own
+# memory cache so they never touch the running app's.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+if config("REDIS_URL", default="") and not TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": config("REDIS_URL"),
+        }
+    }
+elif config("CACHE_DIR", default="") and not TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": config("CACHE_DIR"),
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+SHARED_CACHE = CACHES["default"]["BACKEND"] != "django.core.cache.backends.locmem.LocMemCache"
+
+# Rendered home page sections are keyed by the catalog version, so they can
+# live long; any course, category or enrollment change replaces them.
+HOME_FRAGMENT_CACHE_TIMEOUT = config("HOME_FRAGMENT_CACHE_TIMEOUT", default=3600, cast=int)
+
+# Catalog facet counts are keyed by the catalog version as well
+FACET_CACHE_TIMEOUT = config("FACET_CACHE_TIMEOUT", default=3600, cast=int)
+
+# Rendered search suggestions per normalized query: a per-process LRU of
+# this many entries in front of the shared cache, both keyed by the
+# catalog version and expiring after the timeout
+SEARCH_SUGGESTION_CACHE_TIMEOUT = config("SEARCH_SUGGESTION_CACHE_TIMEOUT", default=600, cast=int)
+SEARCH_SUGGESTION_LOCAL_CACHE_SIZE = config(
+    "SEARCH_SUGGESTION_LOCAL_CACHE_SIZE", default=2000, cast=int
+)
+
+# Seconds a worker's in-memory category directory is used before it is
+# reloaded even without a version bump
+CATEGORY_DIRECTORY_MAX_AGE = config("CATEGORY_DIRECTORY_MAX_AGE", default=300, cast=int)
+
+# Web workers rebuild their search autocomplete index in the background:
+# they check the shared autocomplete version every REFRESH_INTERVAL seconds
+# (0 rebuilds inline on the next search instead), and rebuild an index
+# older than MAX_AGE seconds even if the version key was lost.
+AUTOCOMPLETE_REFRESH_INTERVAL = config("AUTOCOMPLETE_REFRESH_INTERVAL", default=30, cast=int)
+AUTOCOMPLETE_INDEX_MAX_AGE = config("AUTOCOMPLETE_INDEX_MAX_AGE", default=900, cast=int)
+
+# Trending score: an enrollment counts half as much after this many hours
+TRENDING_HALF_LIFE_HOURS = config("TRENDING_HALF_LIFE_HOURS", default=48, cast=float)
+
+# Background threads rebuilding curriculum snapshots after edits; 0 leaves
+# rebuilding to the first reader.
+CURRICULUM_SNAPSHOT_WORKERS = config("CURRICULUM_SNAPSHOT_WORKERS", default=2, cast=int)
+
+# Worker processes rendering course image variants after uploads; 0 leaves
+# them to the generate_image_variants command.
+IMAGE_VARIANT_WORKERS = config("IMAGE_VARIANT_WORKERS", default=2, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -148,6 +223,9 @@ STATICFILES_DIRS = [
 # Media files
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# nginx `internal` location aliasing MEDIA_ROOT; protected lesson files are
+# handed to it with X-Accel-Redirect (see courses.downloads and nginx.conf)
+PROTECTED_MEDIA_LOCATION = "/protected-media/"
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -164,12 +242,27 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    # orjson-backed JSON, same output as the stock renderer, and MessagePack
+    # for clients that ask for it (see Core.renderers)
+    "DEFAULT_RENDERER_CLASSES": [
+        "Core.renderers.ORJSONRenderer",
+        "Core.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "Core.parsers.ORJSONParser",
+        "Core.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    # Cursor pagination for views that declare `keyset_ordering`, page
+    # numbers for everything else (and for clients sending ?page=)
+    "DEFAULT_PAGINATION_CLASS": "Core.pagination.KeysetPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
-        "rest_framework.filters.OrderingFilter",
+        "Core.filters.AliasOrderingFilter",
     ],
 }
 
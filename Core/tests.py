@@ -0,0 +1,478 @@
+"""
+Query plan and query budget regression tests.
+
+Query plans: a synthetic catalog large enough for the planner to prefer indexes is
+seeded once, then every SELECT issued by the main pages and API views is
+explained and must not scan a large table, cut a page from a sort of all
+matching rows or exceed the cost budget (see Core.query_plans). Run them
+against PostgreSQL before shipping query or index changes (CI does, at
+QUERY_PLAN_SCALE=5); on SQLite the same checks run against its planner.
+QUERY_PLAN_SCALE multiplies the dataset size, and QUERY_PLAN_COST_BUDGET
+overrides the budget.
+
+Query budgets: every viewset action and frontend page is requested with a
+small and a ten times larger dataset and must stay within the budget its
+view declares (see Core.query_budgets), with the same number of queries.
+"""
+import json
+import os
+import random
+import re
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Core.query_budgets import get_query_budget
+from Core.query_plans import analyze, capture_queries, find_problems, large_tables
+from courses import autocomplete, categories, suggestions
+from courses.models import Category, Content, Course, CourseRecommendation, Lesson, Module
+from courses.search import get_search_backend
+from courses.views import CategoryViewSet
+from courses.snapshots import get_snapshot
+from enrollments.models import CourseProgress, Enrollment, LessonProgress
+from payments.models import Payment
+from payments.testing import StripeStandIn
+
+User = get_user_model()
+
+SCALE = float(os.environ.get('QUERY_PLAN_SCALE', 1))
+# Planner cost units on PostgreSQL, thousands of VM instructions on SQLite.
+# Catalog-wide queries (facet counts, the autocomplete index) grow with the
+# catalog, so the budget does too.
+COST_BUDGETS = {'postgresql': 5000, 'sqlite': 100}
+# Tables with at least this many rows must be read through an index.
+# PostgreSQL rightly prefers a sequential scan while a table spans only a
+# few hundred pages, so its threshold is higher and the scaled-up run
+# (QUERY_PLAN_SCALE=5) is the one that checks the course table.
+LARGE_TABLE_ROWS = {'postgresql': 10000, 'sqlite': 1000}
+# Queries that read every published course by design. They may scan the
+# course table but still have to stay within the cost budget.
+FULL_CATALOG_QUERIES = {
+    'facet counts': re.compile(r'AS "price_bucket".* GROUP BY', re.DOTALL),
+    'autocomplete index': re.compile(r'AS "instructor__username" FROM "courses_course"'),
+}
+
+TOPICS = ['python', 'django', 'design', 'data', 'marketing', 'guitar', 'finance', 'cloud']
+
+
+def seed(rng, scale):
+    """Bulk-load users, courses with curricula, enrollments, progress and payments"""
+    counts = {
+        'instructors': int(100 * scale),
+        'students': int(3000 * scale),
+        'courses': int(3000 * scale),
+    }
+    category_list = Category.objects.bulk_create([
+        Category(name=topic.title(), slug=topic) for topic in TOPICS
+    ])
+    instructors = User.objects.bulk_create([
+        User(username=f'instructor-{index}', first_name='Ins', last_name=f'Tructor {index}',
+             user_type='instructor')
+        for index in range(counts['instructors'])
+    ])
+    students = User.objects.bulk_create([
+        User(username=f'student-{index}', user_type='student')
+        for index in range(counts['students'])
+    ])
+    now = timezone.now()
+    courses = Course.objects.bulk_create([
+        Course(
+            title=f'{rng.choice(TOPICS).title()} course {index}', slug=f'course-{index}',
+            description=f'Learn {" ".join(rng.sample(TOPICS, 3))}.',
+            short_description='A short description.',
+            instructor=rng.choice(instructors), category=rng.choice(category_list),
+            price=rng.choice([0, 19, 49, 99, 199]), level=rng.choice(['beginner', 'advanced']),
+            duration_hours=rng.randint(1, 30),
+            # Most of a large catalog is unpublished drafts and archives
+            status=rng.choices(['published', 'draft', 'archived'], [30, 60, 10])[0],
+            featured=rng.random() < 0.02, trending_score=rng.random() * 100,
+            modules_count=2, lessons_count=6,
+        )
+        for index in range(counts['courses'])
+    ])
+    # bulk_create skips auto_now_add overrides; spread creation dates out
+    for index, course in enumerate(courses):
+        course.created_at = now - timedelta(minutes=index)
+    Course.objects.bulk_update(courses, ['created_at'], batch_size=500)
+
+    modules = Module.objects.bulk_create([
+        Module(course=course, title=f'Module {order}', order=order)
+        for course in courses for order in (1, 2)
+    ])
+    lessons = Lesson.objects.bulk_create([
+        Lesson(module=module, title=f'Lesson {order}', order=order, duration_minutes=10,
+               is_free_preview=order == 1)
+        for module in modules for order in (1, 2, 3)
+    ])
+    Content.objects.bulk_create([
+        Content(lesson=lesson, content_type='text', text_content='Notes.')
+        for lesson in lessons
+    ])
+
+    lessons_by_course = {}
+    for lesson, module in ((lesson, lesson.module) for lesson in lessons):
+        lessons_by_course.setdefault(module.course_id, []).append(lesson)
+    published = [course for course in courses if course.status == 'published']
+    enrollments = Enrollment.objects.bulk_create([
+        Enrollment(student=student, course=course)
+        for student in students for course in rng.sample(published, 5)
+    ])
+    CourseProgress.objects.bulk_create([
+        CourseProgress(enrollment=enrollment) for enrollment in enrollments
+    ])
+    LessonProgress.objects.bulk_create([
+        LessonProgress(enrollment=enrollment, lesson=lesson, is_completed=True,
+                       watched_duration=60)
+        for enrollment in enrollments
+        for lesson in lessons_by_course[enrollment.course_id][:2]
+    ])
+    Payment.objects.bulk_create([
+        Payment(user=enrollment.student, course_id=enrollment.course_id, amount=49,
+                status='completed')
+        for enrollment in enrollments[::2]
+    ])
+    get_search_backend().rebuild()
+    analyze()
+    return {'student': students[0], 'course': published[0]}
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seeded = seed(random.Random(7), SCALE)
+        cls.large_tables = large_tables(
+            [User, Course, Module, Lesson, Content, Enrollment, CourseProgress,
+             LessonProgress, Payment],
+            LARGE_TABLE_ROWS[connection.vendor],
+        )
+
+    def setUp(self):
+        # Cached fragments and per-process indexes would hide the queries
+        cache.clear()
+        suggestions.reset()
+        categories.invalidate()
+        autocomplete.invalidate()
+        self.student = self.seeded['student']
+        self.course = self.seeded['course']
+        # Built outside the measured requests; snapshots are written on save
+        get_snapshot(self.course.pk)
+
+    def assertEfficientQueries(self, queries):
+        self.assertTrue(queries, 'no queries were captured')
+        budget = os.environ.get('QUERY_PLAN_COST_BUDGET')
+        budget = float(budget) if budget else COST_BUDGETS[connection.vendor] * max(SCALE, 1)
+        problems = find_problems(
+            queries, self.large_tables, budget, full_scans_allowed=FULL_CATALOG_QUERIES.values()
+        )
+        self.assertFalse(problems, '\n\n'.join(
+            f'{sql}\n  plan: {plan}\n  problems: {", ".join(found)}'
+            for sql, plan, found in problems
+        ))
+
+    def get_pages(self, client, *paths):
+        with capture_queries() as queries:
+            for path in paths:
+                response = client.get(path)
+                self.assertIn(response.status_code, (200, 304), path)
+        return queries
+
+    def test_home(self):
+        self.assertEfficientQueries(self.get_pages(self.client, '/'))
+
+    def test_full_catalog_allow_list_matches_current_queries(self):
+        with capture_queries() as queries:
+            self.client.get('/courses/')
+            self.client.get('/search/?q=pyth')
+        for name, pattern in FULL_CATALOG_QUERIES.items():
+            self.assertTrue(any(pattern.search(sql) for sql, _ in queries), name)
+
+    def test_course_list(self):
+        self.assertEfficientQueries(self.get_pages(
+            self.client,
+            '/courses/',
+            '/courses/?page=3',
+            '/courses/?category=python',
+            '/courses/?category=python&level=advanced',
+            '/courses/?price=free&duration=2-5',
+            '/courses/?search=guitar',
+        ))
+
+    def test_course_detail(self):
+        self.client.force_login(self.student)
+        self.assertEfficientQueries(self.get_pages(
+            self.client, f'/course/{self.course.slug}/',
+        ))
+
+    def test_search_courses(self):
+        self.assertEfficientQueries(self.get_pages(
+            self.client, '/search/?q=pyth', '/search/?q=learn+finance',
+        ))
+
+    def test_enrollment_api(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        enrollment = self.student.enrollments.first()
+        self.assertEfficientQueries(self.get_pages(
+            client,
+            '/api/enrollments/enrollments/',
+            '/api/enrollments/enrollments/?status=active',
+            '/api/enrollments/enrollments/my_enrollments/',
+            f'/api/enrollments/enrollments/{enrollment.pk}/',
+            f'/api/enrollments/enrollments/{enrollment.pk}/progress/',
+        ))
+
+    def test_lesson_progress_api(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        progress = LessonProgress.objects.filter(enrollment__student=self.student).first()
+        self.assertEfficientQueries(self.get_pages(
+            client,
+            '/api/enrollments/lesson-progress/',
+            f'/api/enrollments/lesson-progress/{progress.pk}/',
+        ))
+
+    def test_payment_history(self):
+        self.client.force_login(self.student)
+        self.assertEfficientQueries(self.get_pages(self.client, '/payments/history/'))
+
+
+@modify_settings(MIDDLEWARE={'prepend': 'Core.middleware.QueryCountMiddleware'})
+class QueryCountMiddlewareTests(TestCase):
+    def test_reports_queries_per_request(self):
+        Category.objects.create(name='Design', slug='design')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/courses/categories/')
+        self.assertEqual(response['X-Query-Count'], '1')
+
+    def test_logs_requests_over_budget(self):
+        with patch.object(CategoryViewSet, 'query_budgets', {'list': 0}):
+            with self.assertLogs('Core.middleware', 'WARNING') as logs:
+                self.client.get('/api/courses/categories/')
+        self.assertIn('over its budget of 0', logs.output[0])
+
+
+def build_budget_data(size):
+    """`size` rows in every list an endpoint can show, around one course and one student"""
+    staff = User.objects.create(username='staff', user_type='admin', is_staff=True)
+    instructor = User.objects.create(username='teacher', user_type='instructor')
+    student = User.objects.create(username='learner', user_type='student')
+    others = [
+        User.objects.create(username=f'{user_type}-{index}', user_type=user_type)
+        for index in range(size) for user_type in ('instructor', 'student')
+    ]
+    category_list = [
+        Category.objects.create(name=f'Topic {index}', slug=f'topic-{index}')
+        for index in range(size)
+    ]
+    courses = [
+        Course.objects.create(
+            title=f'Course {index}', slug=f'course-{index}', description='About it.',
+            instructor=instructor if index == 0 else others[2 * index],
+            category=category_list[index], price='49.00', status='published',
+        )
+        for index in range(size)
+    ]
+    course = courses[0]
+    modules = [
+        Module.objects.create(course=course, title=f'Module {order}', order=order)
+        for order in range(size)
+    ]
+    lessons = [
+        Lesson.objects.create(module=modules[0], title=f'Lesson {order}', order=order,
+                              is_free_preview=True)
+        for order in range(size)
+    ]
+    contents = [
+        Content.objects.create(lesson=lesson, content_type='file', file='lesson_files/notes.pdf')
+        for lesson in lessons
+    ]
+    enrollments = [Enrollment.objects.create(student=student, course=other) for other in courses]
+    progress = [
+        LessonProgress.objects.create(enrollment=enrollments[0], lesson=lesson, watched_duration=60)
+        for lesson in lessons
+    ]
+    for index, other in enumerate(courses[1:]):
+        CourseRecommendation.objects.create(course=course, recommended=other, rank=index, score=1)
+    payments = [
+        Payment.objects.create(user=student, course=other, amount='49.00', status='completed',
+                               stripe_checkout_session_id=f'cs_{other.pk}')
+        for other in courses
+    ]
+    return {
+        'users': {'staff': staff, 'instructor': instructor, 'student': student},
+        'user': student, 'course': course, 'category': category_list[0], 'module': modules[0],
+        'lesson': lessons[0], 'last_module': modules[-1], 'last_lesson': lessons[-1],
+        'content': contents[0], 'enrollment': enrollments[0],
+        'progress': progress[0], 'payment': payments[0],
+        'student_profile': student.student_profile,
+        'instructor_profile': instructor.instructor_profile,
+    }
+
+
+def pk_of(name):
+    return lambda data: {'pk': data[name].pk}
+
+
+def webhook_event(data):
+    return StripeStandIn('whsec_budget').event('checkout.session.completed', {
+        'id': data['payment'].stripe_checkout_session_id, 'object': 'checkout.session',
+        'payment_status': 'paid', 'payment_intent': 'pi_budget',
+    })
+
+
+# (url name, method): (user, url kwargs, query string or body). Requested as
+# the student unless another user is named.
+BUDGET_ENDPOINTS = {
+    ('user-list', 'get'): ('student', None, None),
+    ('user-me', 'get'): ('student', None, None),
+    ('user-detail', 'get'): ('student', pk_of('user'), None),
+    ('student-profile-list', 'get'): ('student', None, None),
+    ('student-profile-my-profile', 'get'): ('student', None, None),
+    ('student-profile-detail', 'get'): ('student', pk_of('student_profile'), None),
+    ('instructor-profile-list', 'get'): ('student', None, None),
+    ('instructor-profile-my-profile', 'get'): ('instructor', None, None),
+    ('instructor-profile-detail', 'get'): ('student', pk_of('instructor_profile'), None),
+    ('category-list', 'get'): (None, None, None),
+    ('category-detail', 'get'): (None, pk_of('category'), None),
+    ('course-list', 'get'): (None, None, None),
+    ('course-facets', 'get'): (None, None, None),
+    ('course-suggestion-stats', 'get'): ('staff', None, None),
+    ('course-detail', 'get'): (None, pk_of('course'), {'expand': 'modules.lessons.content'}),
+    ('course-also-took', 'get'): (None, pk_of('course'), None),
+    ('course-enroll', 'get'): ('instructor', pk_of('course'), None),
+    ('course-lessons', 'get'): (None, pk_of('course'), None),
+    ('course-modules', 'get'): (None, pk_of('course'), {'expand': 'lessons'}),
+    ('course-outline', 'get'): (None, pk_of('course'), None),
+    ('course-reorder', 'post'): (
+        'instructor', pk_of('course'), lambda data: {'move': data['last_module'].pk, 'after': None},
+    ),
+    ('module-list', 'get'): (None, None, None),
+    ('module-detail', 'get'): (None, pk_of('module'), {'expand': 'lessons'}),
+    ('module-lessons', 'get'): (None, pk_of('module'), None),
+    ('module-reorder', 'post'): (
+        'instructor', pk_of('module'), lambda data: {'move': data['last_lesson'].pk, 'after': None},
+    ),
+    ('lesson-list', 'get'): (None, None, None),
+    ('lesson-detail', 'get'): (None, pk_of('lesson'), {'expand': 'content'}),
+    ('lesson-content', 'get'): (None, pk_of('lesson'), None),
+    ('lesson-mark-complete', 'post'): ('student', pk_of('lesson'), {}),
+    ('content-list', 'get'): (None, None, None),
+    ('content-detail', 'get'): (None, pk_of('content'), None),
+    ('content-download', 'get'): ('student', pk_of('content'), None),
+    ('enrollment-list', 'get'): ('student', None, None),
+    ('enrollment-my-enrollments', 'get'): ('student', None, None),
+    ('enrollment-detail', 'get'): ('student', pk_of('enrollment'), None),
+    ('enrollment-complete', 'post'): ('student', pk_of('enrollment'), {}),
+    ('enrollment-progress', 'get'): ('student', pk_of('enrollment'), None),
+    ('lesson-progress-list', 'get'): ('student', None, None),
+    ('lesson-progress-bulk', 'post'): ('student', None, lambda data: [
+        {'lesson_id': data['lesson'].pk, 'watched_duration': 120, 'is_completed': True},
+    ]),
+    ('lesson-progress-detail', 'get'): ('student', pk_of('progress'), None),
+    ('lesson-progress-mark-complete', 'post'): ('student', pk_of('progress'), {}),
+    ('lesson-progress-update-watch-time', 'post'): (
+        'student', pk_of('progress'), {'watched_duration': 120},
+    ),
+    ('home', 'get'): (None, None, None),
+    ('course_list', 'get'): (None, None, None),
+    ('course_detail', 'get'): ('student', lambda data: {'slug': data['course'].slug}, None),
+    ('search_courses', 'get'): (None, None, {'q': 'course'}),
+    ('user_settings', 'get'): ('student', None, None),
+    ('professor_settings', 'get'): ('instructor', None, None),
+    ('admin_settings', 'get'): ('staff', None, None),
+    ('payments:checkout', 'get'): (
+        'student', lambda data: {'course_slug': data['course'].slug}, None,
+    ),
+    ('payments:payment_success', 'get'): ('student', None, None),
+    ('payments:payment_cancel', 'get'): (
+        'student', lambda data: {'course_slug': data['course'].slug}, None,
+    ),
+    ('payments:stripe_webhook', 'post'): (None, None, webhook_event),
+    ('payments:payment_history', 'get'): ('student', None, None),
+}
+# Generic writes of a single row. Deleting a course or module cascades to
+# its rows (with per-row signals) by design, so they are not budgeted.
+UNBUDGETED_ACTIONS = {'create', 'update', 'partial_update', 'destroy', 'update_profile'}
+FRONTEND_MODULES = {'courses.frontend_views', 'users.frontend_views', 'payments.views'}
+
+
+def budgeted_routes(patterns=None, namespace=''):
+    """(url name, method) of every viewset action and frontend page"""
+    routes = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if not isinstance(pattern, URLPattern):
+            prefix = f'{pattern.namespace}:' if pattern.namespace else namespace
+            routes |= budgeted_routes(pattern.url_patterns, prefix)
+            continue
+        callback = pattern.callback
+        if getattr(callback, 'actions', None):
+            routes |= {
+                (namespace + pattern.name, method)
+                for method, action in callback.actions.items()
+                if action not in UNBUDGETED_ACTIONS
+            }
+        elif callback.__module__ in FRONTEND_MODULES:
+            routes.add((namespace + pattern.name, 'post' if 'webhook' in pattern.name else 'get'))
+    return routes
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_budget')
+class QueryBudgetTests(TestCase):
+    SIZE = 2
+
+    def request(self, data, name, method, user, kwargs, params):
+        client = APIClient(HTTP_X_SENDFILE_TYPE='X-Accel-Redirect')
+        if user:
+            client.force_login(data['users'][user])
+        path = reverse(name, kwargs=kwargs(data) if kwargs else None)
+        if callable(params):
+            params = params(data)
+        # Cold caches: the budget covers a miss
+        cache.clear()
+        suggestions.reset()
+        categories.invalidate()
+        autocomplete.invalidate()
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            if name == 'payments:stripe_webhook':
+                payload, headers = params
+                response = client.post(path, payload, content_type='application/json',
+                                       HTTP_STRIPE_SIGNATURE=headers['Stripe-Signature'])
+            elif method == 'get':
+                response = client.get(path, params)
+            else:
+                response = client.generic(method.upper(), path, json.dumps(params),
+                                          content_type='application/json')
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, f'{method.upper()} {path}')
+        return path, len(queries)
+
+    def measure(self, size):
+        with transaction.atomic():
+            data = build_budget_data(size)
+            counts = {
+                endpoint: self.request(data, *endpoint, *spec)
+                for endpoint, spec in BUDGET_ENDPOINTS.items()
+            }
+            transaction.set_rollback(True)
+        return counts
+
+    def test_every_endpoint_is_measured(self):
+        self.assertEqual(budgeted_routes() - set(BUDGET_ENDPOINTS), set())
+
+    def test_query_counts_are_budgeted_and_do_not_grow(self):
+        small, large = self.measure(self.SIZE), self.measure(self.SIZE * 10)
+        for (name, method), (path, count) in large.items():
+            with self.subTest(endpoint=f'{method.upper()} {name}'):
+                budget = get_query_budget(resolve(path).func, method)
+                self.assertIsNotNone(budget, 'the view declares no query budget')
+                self.assertEqual(count, small[name, method][1],
+                                 f'queries grow from {self.SIZE} to {self.SIZE * 10} rows')
+                self.assertLessEqual(count, budget)
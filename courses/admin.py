@@ -1,8 +1,67 @@
+from django import forms
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from unfold.admin import ModelAdmin, TabularInline, StackedInline
 from unfold.decorators import display
 from django.utils.html import format_html
+from .images import responsive_image
 from .models import Category, Course, Module, Lesson, Content
+from .ordering import apply_order, next_order_key
+
+
+class OrderedInlineForm(forms.ModelForm):
+    """
+    Inline row whose order key is only checked against the other rows of
+    its formset, so two rows can swap keys; every sibling is listed inline.
+    """
+
+    def validate_unique(self):
+        exclude = self._get_validation_exclusions()
+        exclude.add('order')
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except ValidationError as error:
+            self._update_errors(error)
+
+
+def save_ordered_formset(formset):
+    """
+    Save an inline of modules or lessons, applying the submitted order keys
+    with apply_order(). Saving them row by row would trip the
+    (course, order) or (module, order) constraint when two rows swap keys.
+    """
+    siblings = formset.model.objects.filter(**{formset.fk.name: formset.instance})
+    with transaction.atomic():
+        instances = formset.save(commit=False)
+        current = dict(siblings.values_list('pk', 'order'))
+        for obj in formset.deleted_objects:
+            current.pop(obj.pk, None)
+            obj.delete()
+        requested = {}
+        for obj in instances:
+            if obj.pk is None or obj.order != current[obj.pk]:
+                # Keep a free key until every row is saved
+                wanted = obj.order
+                obj.order = next_order_key(siblings) if obj.pk is None else current[obj.pk]
+                obj.save()
+                requested[obj.pk] = wanted
+            else:
+                obj.save()
+        formset.save_m2m()
+        if requested:
+            current.update(requested)
+            apply_order(siblings, sorted(current, key=lambda pk: (current[pk], pk)))
+
+
+class OrderedInlinesMixin:
+    """Save module and lesson inlines through save_ordered_formset()"""
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model in (Module, Lesson):
+            save_ordered_formset(formset)
+        else:
+            super().save_formset(request, form, formset, change)
 
 
 class ContentInline(StackedInline):
@@ -16,6 +75,7 @@ class ContentInline(StackedInline):
 class LessonInline(TabularInline):
     """Inline admin for Lesson model"""
     model = Lesson
+    form = OrderedInlineForm
     extra = 0
     fields = ['title', 'lesson_type', 'order', 'duration_minutes', 'is_free_preview']
     show_change_link = True
@@ -25,6 +85,7 @@ class LessonInline(TabularInline):
 class ModuleInline(StackedInline):
     """Inline admin for Module model"""
     model = Module
+    form = OrderedInlineForm
     extra = 0
     fields = ['title', 'description', 'order']
     show_change_link = True
@@ -53,9 +114,9 @@ class CategoryAdmin(ModelAdmin):
         }),
     )
     
-    @display(description='Courses', ordering='courses__count')
+    @display(description='Courses', ordering='published_courses_count')
     def get_courses_count_display(self, obj):
-        count = obj.courses.filter(status='published').count()
+        count = obj.published_courses_count
         if count > 0:
             return format_html(
                 '<span style="background-color: #3b82f6; color: white; padding: 4px 8px; border-radius: 4px; font-weight: bold;">{}</span>',
@@ -65,7 +126,7 @@ class CategoryAdmin(ModelAdmin):
 
 
 @admin.register(Course)
-class CourseAdmin(ModelAdmin):
+class CourseAdmin(OrderedInlinesMixin, ModelAdmin):
     """Admin interface for Course model"""
     list_display = ['thumbnail_display', 'title', 'instructor', 'category', 'level_display', 'price_display', 'status_display', 'featured_display', 'get_enrollments_count_display', 'created_at']
     list_filter = ['status', 'level', 'featured', 'category', 'created_at']
@@ -75,6 +136,7 @@ class CourseAdmin(ModelAdmin):
     inlines = [ModuleInline]
     list_per_page = 25
     list_select_related = ['instructor', 'category']
+    actions = ['respace_module_order']
     
     fieldsets = (
         ('Basic Information', {
@@ -101,10 +163,11 @@ class CourseAdmin(ModelAdmin):
     
     @display(description='Thumbnail')
     def thumbnail_display(self, obj):
-        if obj.thumbnail:
+        image = responsive_image(obj, 'admin')
+        if image:
             return format_html(
-                '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 4px;" />',
-                obj.thumbnail.url
+                '<img src="{}" srcset="{}" sizes="{}" loading="lazy" style="width: 50px; height: 50px; object-fit: cover; border-radius: 4px;" />',
+                image.src, image.srcset, image.sizes
             )
         return format_html('<span style="color: #9ca3af;">No image</span>')
     
@@ -144,9 +207,18 @@ class CourseAdmin(ModelAdmin):
     def featured_display(self, obj):
         return obj.featured
     
-    @display(description='Enrollments', ordering='enrollments__count')
+    @admin.action(description='Respace module order keys')
+    def respace_module_order(self, request, queryset):
+        """Renumber modules in their current order, leaving gaps for inserts"""
+        rewritten = 0
+        for course in queryset:
+            modules = Module.objects.filter(course=course)
+            rewritten += apply_order(modules, modules.order_by('order', 'id').values_list('id', flat=True))
+        self.message_user(request, f'Renumbered {rewritten} modules in {queryset.count()} courses.')
+    
+    @display(description='Enrollments', ordering='enrollments_count')
     def get_enrollments_count_display(self, obj):
-        count = obj.enrollments.count()
+        count = obj.enrollments_count
         if count > 0:
             return format_html(
                 '<span style="background-color: #8b5cf6; color: white; padding: 4px 8px; border-radius: 4px; font-weight: bold;">{}</span>',
@@ -156,7 +228,7 @@ class CourseAdmin(ModelAdmin):
 
 
 @admin.register(Module)
-class ModuleAdmin(ModelAdmin):
+class ModuleAdmin(OrderedInlinesMixin, ModelAdmin):
     """Admin interface for Module model"""
     list_display = ['title', 'course', 'order', 'get_lessons_count_display', 'created_at']
     list_filter = ['course', 'created_at']
@@ -165,6 +237,7 @@ class ModuleAdmin(ModelAdmin):
     inlines = [LessonInline]
     list_per_page = 25
     list_select_related = ['course']
+    actions = ['respace_lesson_order']
     
     fieldsets = (
         ('Basic Information', {
@@ -177,6 +250,15 @@ class ModuleAdmin(ModelAdmin):
         }),
     )
     
+    @admin.action(description='Respace lesson order keys')
+    def respace_lesson_order(self, request, queryset):
+        """Renumber lessons in their current order, leaving gaps for inserts"""
+        rewritten = 0
+        for module in queryset:
+            lessons = Lesson.objects.filter(module=module)
+            rewritten += apply_order(lessons, lessons.order_by('order', 'id').values_list('id', flat=True))
+        self.message_user(request, f'Renumbered {rewritten} lessons in {queryset.count()} modules.')
+    
     @display(description='Lessons', ordering='lessons__count')
     def get_lessons_count_display(self, obj):
         count = obj.lessons.count()
@@ -0,0 +1,314 @@
+"""
+Per-process autocomplete index for the header search box.
+
+Published course titles, category names and instructor names are split
+into words held in a sorted vocabulary (for prefix lookups) and a trigram
+map (for typo-tolerant lookups). Queries are answered from memory.
+
+Each web worker starts a refresher thread (see warm_up) that rebuilds the
+index once the shared autocomplete version changes or the index is older
+than AUTOCOMPLETE_INDEX_MAX_AGE, so searches keep using the previous index
+meanwhile and never wait for a rebuild. Without a refresher (tests,
+management commands) the index is rebuilt inline on the next query.
+"""
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from heapq import nsmallest
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .cache import bump_version, get_version
+from .models import Course
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'courses:autocomplete:version'
+
+FIELD_WEIGHTS = {
+    'title': 1.0,
+    'category': 0.6,
+    'instructor': 0.5,
+}
+
+# Match quality multipliers per kind of word match
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = 0.6
+
+MAX_PREFIX_EXPANSION = 200
+MAX_FUZZY_CANDIDATES = 50
+
+WORD_RE = re.compile(r'\w+')
+
+Suggestion = namedtuple(
+    'Suggestion',
+    ['id', 'title', 'slug', 'short_description', 'description', 'price', 'level'],
+)
+
+
+def normalize(text):
+    """Lowercase and strip accents so 'Café' and 'cafe' index the same"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    return WORD_RE.findall(normalize(text))
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(token):
+    if len(token) < 4:
+        return 0
+    if len(token) < 7:
+        return 1
+    return 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + cost,
+            )
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2]
+                    and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class AutocompleteIndex:
+    """Immutable word index over a snapshot of published courses"""
+
+    def __init__(self, rows, version=None):
+        # The autocomplete version the rows were read at
+        self.version = version
+        self.suggestions = {}
+        self.popularity = {}
+        self.postings = defaultdict(dict)
+        self.trigram_words = defaultdict(set)
+
+        for row in rows:
+            course_id = row['id']
+            description = row['description'] or ''
+            self.suggestions[course_id] = Suggestion(
+                id=course_id,
+                title=row['title'],
+                slug=row['slug'],
+                short_description=row['short_description'],
+                description=description[:50],
+                price=row['price'],
+                level=row['level'],
+            )
+            self.popularity[course_id] = row['enrollments_count']
+
+            instructor = ' '.join(filter(None, [
+                row['instructor__first_name'],
+                row['instructor__last_name'],
+                row['instructor__username'],
+            ]))
+            for field, text in (
+                ('title', row['title']),
+                ('category', row['category__name']),
+                ('instructor', instructor),
+            ):
+                for word in tokenize(text):
+                    weights = self.postings[word]
+                    weights[course_id] = max(weights.get(course_id, 0), FIELD_WEIGHTS[field])
+
+        self.words = sorted(self.postings)
+        for word in self.words:
+            for gram in trigrams(word):
+                self.trigram_words[gram].add(word)
+
+    @classmethod
+    def from_database(cls, version=None):
+        rows = Course.objects.filter(status='published').values(
+            'id', 'title', 'slug', 'short_description', 'description', 'price',
+            'level', 'enrollments_count', 'category__name',
+            'instructor__first_name', 'instructor__last_name', 'instructor__username',
+        )
+        return cls(rows.iterator(), version)
+
+    def __len__(self):
+        return len(self.suggestions)
+
+    def _prefix_words(self, token):
+        start = bisect_left(self.words, token)
+        words = []
+        for word in self.words[start:start + MAX_PREFIX_EXPANSION]:
+            if not word.startswith(token):
+                break
+            words.append(word)
+        return words
+
+    def _fuzzy_words(self, token):
+        limit = max_edits(token)
+        if not limit:
+            return []
+        token_grams = trigrams(token)
+        shared = Counter()
+        for gram in token_grams:
+            for word in self.trigram_words.get(gram, ()):
+                shared[word] += 1
+        # Each edit destroys at most four of the token's trigrams, so words
+        # sharing fewer cannot be within the edit limit.
+        min_shared = max(1, len(token_grams) - 4 * limit - 1)
+        matches = []
+        for word, count in shared.most_common(MAX_FUZZY_CANDIDATES):
+            if count < min_shared:
+                break
+            if len(word) < len(token) - limit:
+                continue
+            distance = edit_distance(token, word, limit)
+            if distance > limit and len(word) > len(token):
+                # Misspelled partial words ('pyhto') match on the word's prefix
+                distance = edit_distance(token, word[:len(token)], limit)
+            if distance <= limit:
+                matches.append((word, FUZZY_MATCH - 0.1 * distance))
+        return matches
+
+    def _expand(self, token):
+        """Return (word, quality) pairs the token may refer to"""
+        expansions = {}
+        for word in self._prefix_words(token):
+            expansions[word] = EXACT_MATCH if word == token else PREFIX_MATCH
+        if not expansions:
+            expansions.update(self._fuzzy_words(token))
+        return expansions.items()
+
+    def suggest(self, query, limit=8):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for word, quality in self._expand(token):
+                for course_id, weight in self.postings[word].items():
+                    score = quality * weight
+                    if score > token_scores.get(course_id, 0):
+                        token_scores[course_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                # Every token must match somewhere in the course
+                scores = {
+                    course_id: score + token_scores[course_id]
+                    for course_id, score in scores.items()
+                    if course_id in token_scores
+                }
+            if not scores:
+                return []
+
+        ranked = nsmallest(
+            limit,
+            scores,
+            key=lambda course_id: (-scores[course_id], -self.popularity[course_id]),
+        )
+        return [self.suggestions[course_id] for course_id in ranked]
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+_built_at = None
+_refresher = None
+
+
+def _is_current(version):
+    return (
+        _index is not None and _index_version == version
+        and time.monotonic() - _built_at < settings.AUTOCOMPLETE_INDEX_MAX_AGE
+    )
+
+
+def refresh():
+    """Rebuild this process's index if the catalog changed or it is too old"""
+    global _index, _index_version, _built_at
+    version = get_version(VERSION_CACHE_KEY)
+    if _is_current(version):
+        return _index
+    with _lock:
+        if not _is_current(version):
+            _index = AutocompleteIndex.from_database(version)
+            _index_version = version
+            _built_at = time.monotonic()
+    return _index
+
+
+def get_index():
+    """Return this process's index; rebuilt inline only without a refresher"""
+    if _index is not None and _refresher is not None and _refresher.is_alive():
+        return _index
+    return refresh()
+
+
+def invalidate():
+    """Mark every worker's index stale; refreshers rebuild it in the background"""
+    global _index_version
+    bump_version(VERSION_CACHE_KEY)
+    _index_version = None
+
+
+def suggest(query, limit=8):
+    return get_index().suggest(query, limit)
+
+
+def _refresh_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            refresh()
+        except Exception:
+            # Searches keep using the previous index until a refresh succeeds
+            logger.exception("Could not refresh the autocomplete index")
+        finally:
+            connection.close()
+
+
+def start_refresher():
+    """Keep this process's index fresh from a background thread"""
+    global _refresher
+    interval = settings.AUTOCOMPLETE_REFRESH_INTERVAL
+    with _lock:
+        if not interval or (_refresher is not None and _refresher.is_alive()):
+            return
+        _refresher = threading.Thread(
+            target=_refresh_periodically, args=(interval,),
+            name='autocomplete-refresh', daemon=True,
+        )
+        _refresher.start()
+
+
+def warm_up():
+    """Build the index at worker startup and start its refresher"""
+    try:
+        refresh()
+    except DatabaseError:
+        # Not migrated yet; the first query builds it
+        pass
+    start_refresher()
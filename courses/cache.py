@@ -0,0 +1,32 @@
+from django.core.cache import cache
+
+# Bumped whenever anything shown in catalog listings changes (courses,
+# categories, enrollment counts). Cached fragments embed it in their key,
+# so a bump makes every stale fragment unreachable at once.
+CATALOG_VERSION_KEY = 'courses:catalog:version'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_version(key):
+    cache.add(key, 1, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 2, timeout=None)
+        return 2
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    return bump_version(CATALOG_VERSION_KEY)
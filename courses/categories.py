@@ -0,0 +1,55 @@
+"""
+Per-process copy of the category directory.
+
+Categories change rarely and are read on most catalog pages, so every
+worker keeps the full list in memory and reloads it when the shared
+directory version is bumped (category edits and published-course count
+changes) or the copy is older than CATEGORY_DIRECTORY_MAX_AGE, in case the
+version key was evicted. A warm read costs no SQL.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import bump_version, get_version
+from .models import Category
+
+VERSION_CACHE_KEY = 'courses:categories:version'
+
+_lock = threading.Lock()
+_directory = None
+_directory_version = None
+_loaded_at = None
+
+
+def _is_current(version):
+    return (
+        _directory is not None and version == _directory_version
+        and time.monotonic() - _loaded_at < settings.CATEGORY_DIRECTORY_MAX_AGE
+    )
+
+
+def get_directory():
+    """All categories ordered by name, with their published-course counts"""
+    global _directory, _directory_version, _loaded_at
+    version = get_version(VERSION_CACHE_KEY)
+    if _is_current(version):
+        return _directory
+    with _lock:
+        if not _is_current(version):
+            _directory = tuple(Category.objects.order_by('name'))
+            _directory_version = version
+            _loaded_at = time.monotonic()
+    return _directory
+
+
+def with_published_courses():
+    return [category for category in get_directory() if category.published_courses_count]
+
+
+def invalidate():
+    """Mark every worker's directory stale; each reloads on its next read"""
+    global _directory_version
+    bump_version(VERSION_CACHE_KEY)
+    _directory_version = None
@@ -0,0 +1,109 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Category, Course, Lesson, Module
+
+COUNTER_FIELDS = (
+    "modules_count",
+    "lessons_count",
+    "enrollments_count",
+    "total_lesson_minutes",
+)
+
+
+def adjust_course_counters(courses, **deltas):
+    """Atomically shift stored counters of the given courses, e.g. lessons_count=1"""
+    updates = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()
+        if delta
+    }
+    if updates:
+        courses.update(**updates)
+
+
+def _count_subquery(queryset, group_by, aggregate):
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values(group_by)
+            .annotate(value=aggregate)
+            .values("value")[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def expected_counters():
+    """Expressions computing the real counter values for each course row"""
+    from enrollments.models import Enrollment
+
+    lessons = Lesson.objects.filter(module__course=OuterRef("pk"))
+    return {
+        "modules_count": _count_subquery(
+            Module.objects.filter(course=OuterRef("pk")), "course", Count("pk")
+        ),
+        "lessons_count": _count_subquery(lessons, "module__course", Count("pk")),
+        "enrollments_count": _count_subquery(
+            Enrollment.objects.filter(course=OuterRef("pk")), "course", Count("pk")
+        ),
+        "total_lesson_minutes": _count_subquery(
+            lessons, "module__course", Sum("duration_minutes")
+        ),
+    }
+
+
+def rebuild_course_counters(queryset=None, batch_size=500):
+    """
+    Recompute stored counters from the source tables.
+
+    Only courses whose counters drifted are written. Returns the number
+    of repaired courses.
+    """
+    if queryset is None:
+        queryset = Course.objects.all()
+
+    expressions = expected_counters()
+    drifted = Q()
+    for field in COUNTER_FIELDS:
+        drifted |= ~Q(**{field: F(f"expected_{field}")})
+
+    drifted_ids = list(
+        queryset.order_by()
+        .annotate(**{f"expected_{field}": expr for field, expr in expressions.items()})
+        .filter(drifted)
+        .values_list("pk", flat=True)
+    )
+    for start in range(0, len(drifted_ids), batch_size):
+        batch = drifted_ids[start:start + batch_size]
+        Course.objects.filter(pk__in=batch).update(**expressions)
+    return len(drifted_ids)
+
+
+def adjust_category_counts(category_id, delta):
+    """Shift the published-course count of one category"""
+    if category_id and delta:
+        Category.objects.filter(pk=category_id).update(
+            published_courses_count=Greatest(F("published_courses_count") + delta, Value(0))
+        )
+
+
+def rebuild_category_counts(queryset=None):
+    """Recompute published-course counts; returns the number of repaired categories"""
+    if queryset is None:
+        queryset = Category.objects.all()
+    expected = _count_subquery(
+        Course.objects.filter(category=OuterRef("pk"), status="published"),
+        "category",
+        Count("pk"),
+    )
+    drifted_ids = list(
+        queryset.order_by()
+        .annotate(expected=expected)
+        .exclude(published_courses_count=F("expected"))
+        .values_list("pk", flat=True)
+    )
+    if drifted_ids:
+        Category.objects.filter(pk__in=drifted_ids).update(published_courses_count=expected)
+    return len(drifted_ids)
@@ -0,0 +1,136 @@
+"""
+Entitlement-checked delivery of lesson files.
+
+Whether a user may fetch a Content file is decided by a single query:
+free preview lessons are open to everyone, other lessons to the course's
+instructor, staff and students with an enrollment that was not dropped. The transfer itself is handed
+to nginx with X-Accel-Redirect when the request came through the proxy
+(nginx announces that with an `X-Sendfile-Type: X-Accel-Redirect`
+header), so no Django worker is held for the length of a download and
+nginx answers Range requests. Without nginx (runserver), the file is
+streamed from storage with single-range support so video seeking still
+works.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q, Value
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from .models import Content
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def find_download(content_id, user):
+    """
+    Return (file name, allowed) for a Content file in a single query.
+
+    None when the content does not exist or has no file.
+    """
+    from enrollments.models import Enrollment
+
+    if user.is_authenticated and user.is_staff:
+        access = Value(True)
+    else:
+        condition = Q(lesson__is_free_preview=True)
+        if user.is_authenticated:
+            condition |= Q(lesson__module__course__instructor=user) | Q(Exists(
+                Enrollment.objects.filter(
+                    student=user, course_id=OuterRef('lesson__module__course_id')
+                ).exclude(status='dropped')
+            ))
+        access = ExpressionWrapper(condition, output_field=BooleanField())
+
+    return (
+        Content.objects.filter(pk=content_id, file__isnull=False)
+        .exclude(file='')
+        .annotate(allowed=access)
+        .values_list('file', 'allowed')
+        .first()
+    )
+
+
+def serve_file(request, name, storage=None):
+    """Response delivering stored file `name`, via nginx when proxied"""
+    storage = storage or Content._meta.get_field('file').storage
+    filename = os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if request.headers.get('X-Sendfile-Type') == 'X-Accel-Redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.PROTECTED_MEDIA_LOCATION + quote(name)
+    else:
+        response = _ranged_response(request, storage, name, content_type)
+
+    if response.status_code != 416:
+        response['Content-Disposition'] = content_disposition_header(False, filename)
+    response['Accept-Ranges'] = 'bytes'
+    # Entitlement is per user; shared caches must not keep the file
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+def _ranged_response(request, storage, name, content_type):
+    size = storage.size(name)
+    requested = _parse_range(request.headers.get('Range'), size)
+    if requested is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = storage.open(name, 'rb')
+    if requested is None:
+        return FileResponse(file, content_type=content_type)
+
+    start, end = requested
+    file.seek(start)
+    response = StreamingHttpResponse(
+        _read_range(file, end - start + 1), status=206, content_type=content_type
+    )
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    return response
+
+
+def _parse_range(header, size):
+    """
+    (start, end) of a single byte range, None to send the whole file, or
+    False if the range cannot be satisfied. Multi-range requests and invalid
+    ranges (last byte before the first) get the whole file, as RFC 9110 says.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        start, end = max(size - length, 0), size - 1
+    if start >= size:
+        return False
+    return start, end
+
+
+def _read_range(file, remaining):
+    try:
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
@@ -0,0 +1,161 @@
+"""
+Facet counts for the course catalog.
+
+All facets come from one grouped query over published courses: rows are
+grouped by (level, category, price bucket, duration bucket) with only the
+search term applied, and each facet is then counted in Python from those
+groups using every *other* selected filter. That way a facet always shows
+how many courses each of its values would give with the rest of the
+current selection. Results are cached per normalized filter set and
+catalog version.
+"""
+import hashlib
+import json
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from . import categories
+from .cache import get_catalog_version
+from .models import Course
+from .search import rank_courses
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = [
+    ('free', 'Free', None, 0.01),
+    ('under-50', 'Under $50', 0.01, 50),
+    ('50-100', '$50 - $100', 50, 100),
+    ('100-200', '$100 - $200', 100, 200),
+    ('200-plus', '$200+', 200, None),
+]
+DURATION_BUCKETS = [
+    ('under-2', 'Under 2 hours', None, 2),
+    ('2-5', '2 - 5 hours', 2, 5),
+    ('5-10', '5 - 10 hours', 5, 10),
+    ('10-20', '10 - 20 hours', 10, 20),
+    ('20-plus', '20+ hours', 20, None),
+]
+FACETS = ('level', 'category', 'price', 'duration')
+
+
+def _range_q(field, lower, upper):
+    q = Q()
+    if lower is not None:
+        q &= Q(**{f'{field}__gte': lower})
+    if upper is not None:
+        q &= Q(**{f'{field}__lt': upper})
+    return q
+
+
+def _bucket_case(field, buckets):
+    return Case(
+        *[When(_range_q(field, lower, upper), then=Value(key)) for key, _, lower, upper in buckets],
+        output_field=CharField(),
+    )
+
+
+BUCKET_FILTERS = {
+    'price': {key: _range_q('price', lower, upper) for key, _, lower, upper in PRICE_BUCKETS},
+    'duration': {
+        key: _range_q('duration_hours', lower, upper) for key, _, lower, upper in DURATION_BUCKETS
+    },
+}
+
+
+def normalize_filters(params):
+    """Pick the known filters from a QueryDict, dropping empty and invalid values"""
+    levels = {key for key, _ in Course.LEVEL_CHOICES}
+    filters = {
+        'level': params.get('level') if params.get('level') in levels else None,
+        'category': params.get('category') or None,
+        'price': params.get('price') if params.get('price') in BUCKET_FILTERS['price'] else None,
+        'duration': (
+            params.get('duration') if params.get('duration') in BUCKET_FILTERS['duration'] else None
+        ),
+        'search': (params.get('search') or '').strip().lower() or None,
+    }
+    return {name: value for name, value in filters.items() if value}
+
+
+def filter_courses(queryset, filters, exclude=()):
+    """Apply normalized facet filters (except those in `exclude`) to a course queryset"""
+    if 'level' in filters and 'level' not in exclude:
+        queryset = queryset.filter(level=filters['level'])
+    if 'category' in filters and 'category' not in exclude:
+        queryset = queryset.filter(category__slug=filters['category'])
+    for name in ('price', 'duration'):
+        if name in filters and name not in exclude:
+            queryset = queryset.filter(BUCKET_FILTERS[name][filters[name]])
+    return queryset
+
+
+def _grouped_counts(filters):
+    courses = Course.objects.filter(status='published')
+    if 'search' in filters:
+        # Joined into this query rather than used as a pk__in subquery: the
+        # SQLite backend's raw SQL names courses_course, which inside a
+        # subquery is the outer row and made the FTS match run per course.
+        courses = rank_courses(courses, filters['search'])
+    return list(
+        courses.order_by()
+        .annotate(
+            price_bucket=_bucket_case('price', PRICE_BUCKETS),
+            duration_bucket=_bucket_case('duration_hours', DURATION_BUCKETS),
+        )
+        .values_list('level', 'category_id', 'price_bucket', 'duration_bucket')
+        .annotate(count=Count('pk'))
+    )
+
+
+def _compute(filters):
+    directory = categories.get_directory()
+    wanted = dict(filters)
+    if 'category' in wanted:
+        slugs = {category.slug: category.pk for category in directory}
+        wanted['category'] = slugs.get(filters['category'], -1)
+
+    counts = {name: Counter() for name in FACETS}
+    total = 0
+    for level, category_id, price, duration, count in _grouped_counts(filters):
+        values = {'level': level, 'category': category_id, 'price': price, 'duration': duration}
+        mismatched = [name for name in FACETS if name in wanted and values[name] != wanted[name]]
+        if not mismatched:
+            total += count
+        for name in FACETS:
+            # A facet ignores its own selection but honours all the others
+            if not [other for other in mismatched if other != name]:
+                counts[name][values[name]] += count
+
+    return OrderedDict([
+        ('total', total),
+        ('level', [
+            {'value': key, 'label': label, 'count': counts['level'][key]}
+            for key, label in Course.LEVEL_CHOICES
+        ]),
+        ('category', [
+            {'value': category.slug, 'label': category.name, 'count': counts['category'][category.pk]}
+            for category in directory
+            if counts['category'][category.pk] or category.slug == filters.get('category')
+        ]),
+        ('price', [
+            {'value': key, 'label': label, 'count': counts['price'][key]}
+            for key, label, _, _ in PRICE_BUCKETS
+        ]),
+        ('duration', [
+            {'value': key, 'label': label, 'count': counts['duration'][key]}
+            for key, label, _, _ in DURATION_BUCKETS
+        ]),
+    ])
+
+
+def get_facets(filters):
+    """Facet counts for normalized `filters`, cached until the catalog changes"""
+    digest = hashlib.sha1(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    key = f'courses:facets:{get_catalog_version()}:{digest}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = _compute(filters)
+        cache.set(key, facets, settings.FACET_CACHE_TIMEOUT)
+    return facets
@@ -1,77 +1,109 @@
+import json
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Count, Q
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
-from django.urls import reverse
-from .models import Course, Category
+from Core.query_budgets import query_budget
+from .cache import get_catalog_version
+from .models import Course
+from .facets import filter_courses, get_facets, normalize_filters
+from .recommendations import students_also_took
+from .search import rank_courses
+from .snapshots import get_snapshot
+from . import suggestions
+from . import categories as category_directory
 from enrollments.models import Enrollment, CourseProgress
 
+COURSE_LIST_PAGE_SIZE = 24
+
 
+@query_budget(3)
 def home(request):
     """Home page with trending courses"""
-    # Get trending courses (most enrollments)
+    # The catalog sections are cached as rendered fragments keyed by the
+    # catalog version, so these querysets stay lazy and only run on a miss.
     trending_courses = Course.objects.filter(
         status='published'
-    ).annotate(
-        enrollment_count=Count('enrollments')
-    ).order_by('-enrollment_count', '-created_at')[:8]
+    ).order_by('-trending_score', '-created_at')[:8]
     
-    # Get featured courses
     featured_courses = Course.objects.filter(
         status='published',
         featured=True
     ).order_by('-created_at')[:6]
     
-    # Get recent courses
-    recent_courses = Course.objects.filter(status='published').order_by('-created_at')[:12]
-    
-    categories = Category.objects.annotate(
-        course_count=Count('courses', filter=Q(courses__status='published'))
-    ).filter(course_count__gt=0)[:8]
-    
-    selected_course = featured_courses.first() if featured_courses.exists() else trending_courses.first()
+    categories = category_directory.with_published_courses()[:8]
     
     context = {
         'trending_courses': trending_courses,
         'featured_courses': featured_courses,
-        'recent_courses': recent_courses,
         'categories': categories,
-        'selected_course': selected_course,
+        'catalog_version': get_catalog_version(),
+        'fragment_cache_timeout': settings.HOME_FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, 'courses/home.html', context)
 
 
+@query_budget(3)
 def course_list(request):
-    """Course listing page"""
-    category_slug = request.GET.get('category')
-    level = request.GET.get('level')
+    """Course listing page, with the grid paginated and streamed over HTMX"""
+    filters = normalize_filters(request.GET)
     search = request.GET.get('search')
     
-    courses = Course.objects.filter(status='published')
-    
-    if category_slug:
-        courses = courses.filter(category__slug=category_slug)
-    if level:
-        courses = courses.filter(level=level)
+    courses = filter_courses(
+        Course.objects.filter(status='published').select_related('instructor', 'category'),
+        filters,
+    )
     if search:
-        courses = courses.filter(
-            Q(title__icontains=search) | Q(description__icontains=search)
-        )
-    
-    courses = courses.order_by('-created_at')
-    categories = Category.objects.all()
+        courses = rank_courses(courses, search)
+    else:
+        courses = courses.order_by('-created_at', '-id')
+    
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    # Fetch one extra row instead of running COUNT(*) to know whether
+    # another page follows.
+    offset = (page - 1) * COURSE_LIST_PAGE_SIZE
+    page_courses = list(courses[offset:offset + COURSE_LIST_PAGE_SIZE + 1])
+    has_next = len(page_courses) > COURSE_LIST_PAGE_SIZE
+    page_courses = page_courses[:COURSE_LIST_PAGE_SIZE]
+    
+    next_query = None
+    if has_next:
+        query = request.GET.copy()
+        query['page'] = page + 1
+        next_query = query.urlencode()
     
     context = {
-        'courses': courses,
-        'categories': categories,
-        'selected_category': category_slug,
-        'selected_level': level,
+        'courses': page_courses,
+        'page_number': page,
+        'next_query': next_query,
+        'selected_category': filters.get('category'),
+        'selected_level': filters.get('level'),
+        'selected_price': filters.get('price'),
+        'selected_duration': filters.get('duration'),
         'search_query': search,
     }
+    
+    if (request.headers.get('HX-Request')
+            and not request.headers.get('HX-History-Restore-Request')):
+        # "Load more" appends the next page of cards; a filter change
+        # replaces the whole grid.
+        if page > 1:
+            return render(request, 'courses/partials/course_cards.html', context)
+        # Facet counts in the filter form follow the new selection
+        context['facets'] = get_facets(filters)
+        context['filters_oob'] = True
+        return render(request, 'courses/partials/course_grid.html', context)
+    
+    context['facets'] = get_facets(filters)
     return render(request, 'courses/course_list.html', context)
 
 
+@query_budget(15)
 def course_detail(request, slug):
     """Course detail page"""
     course = get_object_or_404(Course, slug=slug, status='published')
@@ -99,11 +131,13 @@ def course_detail(request, slug):
         
         return redirect('course_detail', slug=slug)
     
-    # Get related courses
-    related_courses = Course.objects.filter(
-        status='published',
-        category=course.category
-    ).exclude(id=course.id)[:4]
+    # Co-enrollment neighbors; courses without any yet fall back to their category
+    related_courses = list(students_also_took(course, limit=4))
+    if not related_courses:
+        related_courses = Course.objects.filter(
+            status='published',
+            category=course.category
+        ).exclude(id=course.id)[:4]
     
     # Check if user is enrolled
     is_enrolled = False
@@ -120,61 +154,13 @@ def course_detail(request, slug):
         'related_courses': related_courses,
         'is_enrolled': is_enrolled,
         'enrollment': enrollment,
-        'modules': course.modules.all().prefetch_related('lessons'),
+        'modules': json.loads(get_snapshot(course.pk).payload)['modules'],
     }
     return render(request, 'courses/course_detail.html', context)
 
 
+@query_budget(1)
 def search_courses(request):
     """HTMX search endpoint"""
-    query = request.GET.get('q', '').strip()
-    
-    if not query or len(query) < 2:
-        return HttpResponse('')
-    
-    courses = Course.objects.filter(
-        status='published'
-    ).filter(
-        Q(title__icontains=query) | 
-        Q(description__icontains=query) |
-        Q(short_description__icontains=query) |
-        Q(category__name__icontains=query)
-    ).select_related('category', 'instructor').annotate(
-        enrollment_count=Count('enrollments')
-    ).order_by('-enrollment_count', '-created_at')[:8]
-    
-    if not courses.exists():
-        return HttpResponse(
-            '<div class="p-4 text-center text-gray-500 dark:text-gray-400">'
-            'No courses found matching your search.'
-            '</div>'
-        )
-    
-    html = '<div class="p-2">'
-    for course in courses:
-        course_url = reverse('course_detail', kwargs={'slug': course.slug})
-        short_desc = course.short_description or (course.description[:50] + "..." if course.description else "")
-        html += f'''
-        <a href="{course_url}" 
-           class="flex items-center space-x-3 p-3 hover:bg-gray-100 dark:hover:bg-gray-700 rounded-lg transition group">
-            <div class="flex-shrink-0 w-16 h-16 bg-gradient-to-br from-indigo-500 to-purple-600 rounded-lg flex items-center justify-center">
-                <span class="text-white text-xl font-bold">{course.title[0] if course.title else 'C'}</span>
-            </div>
-            <div class="flex-1 min-w-0">
-                <h4 class="text-sm font-semibold text-gray-900 dark:text-white truncate group-hover:text-indigo-600 dark:group-hover:text-indigo-400">
-                    {course.title}
-                </h4>
-                <p class="text-xs text-gray-500 dark:text-gray-400 truncate">
-                    {short_desc}
-                </p>
-                <div class="flex items-center space-x-2 mt-1">
-                    <span class="text-xs text-indigo-600 dark:text-indigo-400 font-medium">${course.price}</span>
-                    <span class="text-xs text-gray-400">•</span>
-                    <span class="text-xs text-gray-500 dark:text-gray-400">{course.level.title()}</span>
-                </div>
-            </div>
-        </a>
-        '''
-    html += '</div>'
-    return HttpResponse(html)
+    return HttpResponse(suggestions.get_suggestions(request.GET.get('q', '')))
 
@@ -0,0 +1,298 @@
+"""
+Resized WebP/JPEG variants of course images.
+
+Each variant (catalog card, detail hero, admin thumbnail) is rendered at a
+few widths from its source field. The files go to
+course_variants/<course id>/ in the field's storage and their URLs are
+stored in `Course.image_variants` together with the source name they were
+made from, so templates and serializers can emit `srcset` without touching
+storage. Uploads queue generation on a process pool once the transaction
+commits; the `generate_image_variants` command backfills existing media.
+
+Until the variants of the current upload exist, readers fall back to the
+original image.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .cache import bump_catalog_version
+from .models import Course
+
+logger = logging.getLogger(__name__)
+
+# variant: (source field, widths, sizes attribute)
+VARIANTS = {
+    'card': (
+        'thumbnail', (320, 640, 960),
+        '(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw',
+    ),
+    'hero': ('background_image', (960, 1600, 2400), '100vw'),
+    'admin': ('thumbnail', (100, 200), '50px'),
+}
+IMAGE_FIELDS = ('thumbnail', 'background_image')
+# extension: (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANT_ROOT = 'course_variants'
+
+ResponsiveImage = namedtuple('ResponsiveImage', ['src', 'srcset', 'webp_srcset', 'sizes'])
+
+_executor = None
+_pending = set()
+_requeue = set()
+_lock = threading.Lock()
+
+
+def render_variants(data, widths):
+    """
+    Resize encoded image bytes to each of `widths`.
+
+    Returns a list of (width, extension, bytes). Images are never upscaled:
+    widths above the original collapse into one variant at the original
+    width.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    if image.mode == 'RGBA':
+        opaque = Image.new('RGB', image.size, (255, 255, 255))
+        opaque.paste(image, mask=image.getchannel('A'))
+    else:
+        opaque = image
+
+    rendered = []
+    for width in sorted({min(width, image.width) for width in widths}):
+        height = max(round(image.height * width / image.width), 1)
+        for extension, (image_format, options) in FORMATS.items():
+            source = image if image_format == 'WEBP' else opaque
+            if width != image.width:
+                source = source.resize((width, height), Image.LANCZOS)
+            buffer = io.BytesIO()
+            source.save(buffer, image_format, **options)
+            rendered.append((width, extension, buffer.getvalue()))
+    return rendered
+
+
+def _prefix(course_id, field, source_name):
+    digest = hashlib.sha1(source_name.encode()).hexdigest()[:10]
+    return f'{VARIANT_ROOT}/{course_id}/{field}-{digest}'
+
+
+def _render_field(course, field):
+    image = getattr(course, field)
+    with image.open('rb') as source:
+        data = source.read()
+
+    storage = image.storage
+    prefix = _prefix(course.pk, field, image.name)
+    entry = {'source': image.name}
+    for variant, (variant_field, widths, _) in VARIANTS.items():
+        if variant_field != field:
+            continue
+        urls = {extension: [] for extension in FORMATS}
+        for width, extension, content in render_variants(data, widths):
+            name = f'{prefix}-{variant}-{width}.{extension}'
+            if storage.exists(name):
+                storage.delete(name)
+            name = storage.save(name, ContentFile(content))
+            urls[extension].append([width, storage.url(name)])
+        entry[variant] = urls
+    return entry
+
+
+def _unchanged(course):
+    """Match the row only if its images are still the ones we rendered"""
+    condition = Q(pk=course.pk)
+    for field in IMAGE_FIELDS:
+        name = getattr(course, field).name
+        if name:
+            condition &= Q(**{field: name})
+        else:
+            condition &= Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+    return condition
+
+
+def generate_variants(course_id, force=False):
+    """
+    Render the missing or stale variants of one course.
+
+    Returns the number of fields that were rendered, or None when the
+    course is gone. A course whose images changed in the meantime is left
+    alone; the save that changed them has queued its own run.
+    """
+    course = (
+        Course.objects.filter(pk=course_id)
+        .only('pk', *IMAGE_FIELDS, 'image_variants')
+        .first()
+    )
+    if course is None:
+        return None
+
+    variants = {}
+    rendered = 0
+    for field in IMAGE_FIELDS:
+        image = getattr(course, field)
+        if not image:
+            continue
+        stored = course.image_variants.get(field)
+        if stored and stored.get('source') == image.name and not force:
+            variants[field] = stored
+            continue
+        try:
+            variants[field] = _render_field(course, field)
+        except Exception:
+            # Missing or unreadable source; readers keep using the original.
+            logger.warning("Could not render %s variants of course %s", field, course_id,
+                           exc_info=True)
+            continue
+        rendered += 1
+
+    if variants != course.image_variants:
+        if Course.objects.filter(_unchanged(course)).update(image_variants=variants):
+            _delete_stale_files(course, variants)
+    return rendered
+
+
+def _delete_stale_files(course, variants):
+    """Remove variant files of images the course no longer uses"""
+    storage = Course._meta.get_field('thumbnail').storage
+    directory = f'{VARIANT_ROOT}/{course.pk}'
+    keep = tuple(
+        _prefix(course.pk, field, entry['source']).rsplit('/', 1)[1] + '-'
+        for field, entry in variants.items()
+    )
+    try:
+        _, files = storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for name in files:
+        if not name.startswith(keep):
+            storage.delete(f'{directory}/{name}')
+
+
+def delete_variants(course_id):
+    """Remove every variant file of a (deleted) course"""
+    course = Course(pk=course_id)
+    _delete_stale_files(course, {})
+
+
+def needs_variants(course):
+    """Whether the stored variants do not match the course's current images"""
+    stored = course.image_variants or {}
+    for field in IMAGE_FIELDS:
+        image = getattr(course, field)
+        source = (stored.get(field) or {}).get('source')
+        if (image.name or None) != source:
+            return True
+    return False
+
+
+def responsive_image(course, variant, build_url=None):
+    """
+    ResponsiveImage for a variant of a course, or None without a source.
+
+    `build_url` (e.g. request.build_absolute_uri) is applied to every URL.
+    """
+    image = getattr(course, VARIANTS[variant][0])
+    return responsive_image_for(
+        image.name, course.image_variants, variant, image.storage, build_url
+    )
+
+
+def responsive_image_for(name, image_variants, variant, storage, build_url=None):
+    """responsive_image from a stored source name and `image_variants` value"""
+    field, _, sizes = VARIANTS[variant]
+    if not name:
+        return None
+    build_url = build_url or (lambda url: url)
+    entry = (image_variants or {}).get(field) or {}
+    urls = entry.get(variant) if entry.get('source') == name else None
+    if not urls:
+        return ResponsiveImage(build_url(storage.url(name)), '', '', sizes)
+
+    def srcset(candidates):
+        return ', '.join(f'{build_url(url)} {width}w' for width, url in candidates)
+
+    return ResponsiveImage(
+        src=build_url(urls['jpg'][-1][1]),
+        srcset=srcset(urls['jpg']),
+        webp_srcset=srcset(urls['webp']),
+        sizes=sizes,
+    )
+
+
+def queue_variants(course_ids):
+    """Generate variants on the process pool once the transaction commits"""
+    course_ids = {course_id for course_id in course_ids if course_id}
+    if course_ids:
+        transaction.on_commit(lambda: schedule_generation(course_ids))
+
+
+def schedule_generation(course_ids):
+    """Submit variant generation, coalescing courses already queued"""
+    global _executor
+    if not settings.IMAGE_VARIANT_WORKERS:
+        return
+    with _lock:
+        # A course that is being rendered right now runs again afterwards,
+        # since the running job may have read its previous images.
+        _requeue.update(set(course_ids) & _pending)
+        course_ids = set(course_ids) - _pending
+        if not course_ids:
+            return
+        _pending.update(course_ids)
+        if _executor is None:
+            # Spawned rather than forked: the web process runs threads and
+            # holds database connections that a fork would share.
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                # django.setup itself, so unpickling it needs no app imports
+                initializer=django.setup,
+            )
+    for course_id in course_ids:
+        future = _executor.submit(_generate_in_background, course_id)
+        future.add_done_callback(lambda future, course_id=course_id: _finished(course_id, future))
+
+
+def _finished(course_id, future):
+    with _lock:
+        _pending.discard(course_id)
+        again = course_id in _requeue
+        _requeue.discard(course_id)
+    if future.exception() is not None:
+        logger.error(
+            "Could not generate image variants for course %s", course_id,
+            exc_info=future.exception(),
+        )
+    if again:
+        schedule_generation([course_id])
+
+
+def _generate_in_background(course_id):
+    try:
+        rendered = generate_variants(course_id)
+        if rendered:
+            # Cached home page sections still point at the originals
+            bump_catalog_version()
+        return rendered
+    finally:
+        connections.close_all()
@@ -0,0 +1,401 @@
+"""
+Drive the main user journeys over HTTP and report latency, throughput and
+SQL queries per request.
+
+The app is started under gunicorn with QUERY_COUNT_HEADER enabled (or an
+already running server is used with --url) against a database loaded by
+generate_load_data. Each virtual user is one of the generated students with
+its own session and loops over weighted journeys with an asyncio HTTP
+client. Stripe webhooks are signed by a local stand-in with a secret the
+started server is given, against pending payments created beforehand.
+
+Journeys write to the database (enrollments, progress, payments), so run
+it against a disposable load database.
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from courses.models import Category, Course
+from enrollments.models import LessonProgress
+from payments.models import Payment
+from payments.testing import StripeStandIn
+
+User = get_user_model()
+
+# Relative frequency of each journey; roughly what the access logs show
+JOURNEYS = {
+    'home': 15,
+    'catalog': 20,
+    'search': 20,
+    'course_detail': 20,
+    'enroll': 3,
+    'heartbeat': 15,
+    'dashboard': 5,
+    'webhook': 2,
+}
+SEARCH_TERMS = ['python', 'django', 'design', 'marketing', 'guitar', 'finance', 'docker']
+LEVELS = ['beginner', 'intermediate', 'advanced']
+
+
+class Recorder:
+    """Latency, status and query count samples per endpoint"""
+
+    def __init__(self):
+        self.samples = {}
+        self.recording = False
+
+    def add(self, name, seconds, ok, queries):
+        if self.recording:
+            self.samples.setdefault(name, []).append((seconds, ok, queries))
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+            queries = [count for _, _, count in samples if count is not None]
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': sum(not ok for _, ok, _ in samples),
+                'throughput': round(len(samples) / elapsed, 2),
+                'p50_ms': _percentile(latencies, 50),
+                'p95_ms': _percentile(latencies, 95),
+                'p99_ms': _percentile(latencies, 99),
+                'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'requests': total,
+            'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+            'throughput': round(total / elapsed, 2),
+            'endpoints': endpoints,
+        }
+
+
+def _percentile(values, percentile):
+    if len(values) == 1:
+        return round(values[0], 2)
+    return round(statistics.quantiles(values, n=100, method='inclusive')[percentile - 1], 2)
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, fixtures, profile, rng):
+        self.client = client
+        self.recorder = recorder
+        self.fixtures = fixtures
+        self.profile = profile
+        self.rng = rng
+
+    async def request(self, name, method, path, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except Exception:  # connection errors count as failed requests
+            self.recorder.add(name, time.perf_counter() - started, False, None)
+            return None
+        seconds = time.perf_counter() - started
+        queries = response.headers.get('X-Query-Count')
+        self.recorder.add(
+            name, seconds, response.status_code in expected,
+            int(queries) if queries is not None else None,
+        )
+        return response
+
+    async def home(self):
+        await self.request('home', 'GET', '/')
+
+    async def catalog(self):
+        params = {'category': self.rng.choice(self.fixtures['categories'])}
+        if self.rng.random() < 0.5:
+            params['level'] = self.rng.choice(LEVELS)
+        if self.rng.random() < 0.3:
+            params['page'] = self.rng.randint(2, 5)
+        await self.request('catalog', 'GET', '/courses/', expected=(200, 404), params=params)
+
+    async def search(self):
+        # Search-as-you-type: one request per keystroke after the second
+        term = self.rng.choice(SEARCH_TERMS)
+        for length in range(2, len(term) + 1):
+            await self.request('search', 'GET', '/search/', params={'q': term[:length]})
+
+    async def course_detail(self):
+        slug = self.rng.choice(self.fixtures['courses'])[1]
+        await self.request('course_detail', 'GET', f'/course/{slug}/')
+
+    async def enroll(self):
+        course_id = self.rng.choice(self.fixtures['courses'])[0]
+        response = await self.request(
+            'enroll', 'POST', '/api/enrollments/enrollments/', expected=(201, 400),
+            json={'course_id': course_id}, headers=self.profile['csrf_headers'],
+        )
+        if response is not None and response.status_code == 201:
+            # Leave the student's enrollments as they were
+            await self.request(
+                'unenroll', 'DELETE', f'/api/enrollments/enrollments/{response.json()["id"]}/',
+                expected=(204,), headers=self.profile['csrf_headers'],
+            )
+
+    async def heartbeat(self):
+        if not self.profile['progress']:
+            return await self.dashboard()
+        progress_id = self.rng.choice(self.profile['progress'])
+        path = f'/api/enrollments/lesson-progress/{progress_id}/'
+        for seconds in (30, 60, 90):
+            await self.request(
+                'heartbeat', 'POST', f'{path}update_watch_time/',
+                json={'watched_duration': seconds}, headers=self.profile['csrf_headers'],
+            )
+        await self.request(
+            'mark_complete', 'POST', f'{path}mark_complete/', headers=self.profile['csrf_headers'],
+        )
+
+    async def dashboard(self):
+        await self.request('dashboard', 'GET', '/api/enrollments/enrollments/my_enrollments/')
+
+    async def webhook(self):
+        session_id = self.rng.choice(self.fixtures['checkout_sessions'])
+        payload, headers = self.fixtures['stripe'].event('checkout.session.completed', {
+            'id': session_id, 'object': 'checkout.session', 'payment_status': 'paid',
+            'payment_intent': f'pi_{session_id}',
+        })
+        await self.request('webhook', 'POST', '/payments/webhook/', content=payload,
+                           headers=headers)
+
+    async def run(self, journeys, deadline):
+        names, weights = zip(*journeys.items())
+        while time.monotonic() < deadline:
+            await getattr(self, self.rng.choices(names, weights)[0])()
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the main user journeys over HTTP with concurrent virtual users and '
+            'write latency percentiles, throughput and queries per request as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20, help='Virtual users')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Measured seconds, after the warm-up')
+        parser.add_argument('--warmup', type=float, default=5,
+                            help='Seconds of load before measuring starts')
+        parser.add_argument('--journey', action='append', dest='journeys',
+                            choices=sorted(JOURNEYS), help='Only run these journeys (repeatable)')
+        parser.add_argument('--prefix', default='load',
+                            help='Username prefix of the generate_load_data students')
+        parser.add_argument('--url', help='Benchmark a running server instead of starting one')
+        parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--webhook-secret', default='whsec_benchmark',
+                            help='Secret the stand-in signs webhooks with (given to the started '
+                                 'server; with --url it must match its STRIPE_WEBHOOK_SECRET)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Results file (default: '
+                                             'benchmark-results/http-<timestamp>.json)')
+        parser.add_argument('--compare', help='Earlier results file to show changes against')
+
+    def handle(self, *args, **options):
+        try:
+            import httpx
+        except ImportError:
+            raise CommandError('benchmark_http needs httpx (pip install httpx)')
+
+        rng = random.Random(options['seed'])
+        journeys = {
+            name: weight for name, weight in JOURNEYS.items()
+            if not options['journeys'] or name in options['journeys']
+        }
+        students = list(
+            User.objects.filter(username__startswith=f'{options["prefix"]}-', user_type='student')
+            .order_by('pk')[:options['concurrency']]
+        )
+        if len(students) < options['concurrency']:
+            raise CommandError(
+                f'Found {len(students)} "{options["prefix"]}-" students for '
+                f'{options["concurrency"]} virtual users; run generate_load_data first'
+            )
+        fixtures = self._fixtures(rng, students, options['webhook_secret'])
+        profiles = [self._login(student) for student in students]
+
+        server = None
+        base_url = options['url']
+        if not base_url:
+            base_url = f'http://127.0.0.1:{options["port"]}'
+            server = self._start_server(options, base_url, httpx)
+        try:
+            results = asyncio.run(
+                self._load(httpx, base_url, journeys, fixtures, profiles, rng, options)
+            )
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=30)
+            Session.objects.filter(
+                session_key__in=[profile['session_key'] for profile in profiles]
+            ).delete()
+
+        results['meta'] = {
+            'started_at': timezone.now().isoformat(),
+            'url': base_url,
+            'database': connection.vendor,
+            'commit': self._commit(),
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'workers': None if options['url'] else options['workers'],
+            'journeys': journeys,
+        }
+        self._report(results)
+        output = Path(options['output'] or
+                      f'benchmark-results/http-{time.strftime("%Y%m%d-%H%M%S")}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2))
+        self.stdout.write(f'\nResults written to {output}')
+        if options['compare']:
+            self._compare(json.loads(Path(options['compare']).read_text()), results)
+
+    def _fixtures(self, rng, students, webhook_secret):
+        published = list(
+            Course.objects.filter(status='published').values_list('pk', 'slug')[:5000]
+        )
+        if not published:
+            raise CommandError('No published courses; run generate_load_data first')
+        paid = [pk for pk in Course.objects.filter(status='published', price__gt=0)
+                .values_list('pk', flat=True)[:5000]]
+        # Checkout sessions the stand-in completes through the webhook
+        run = get_random_string(8).lower()
+        payments = Payment.objects.bulk_create([
+            Payment(user=rng.choice(students), course_id=rng.choice(paid or [published[0][0]]),
+                    amount=49, status='pending',
+                    stripe_checkout_session_id=f'cs_bench_{run}_{index}')
+            for index in range(500)
+        ])
+        return {
+            'courses': published,
+            'categories': list(Category.objects.values_list('slug', flat=True)) or [''],
+            'checkout_sessions': [payment.stripe_checkout_session_id for payment in payments],
+            'stripe': StripeStandIn(webhook_secret),
+        }
+
+    def _login(self, user):
+        """A session cookie for `user`, as django.contrib.auth.login would create"""
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        csrf = get_random_string(32)
+        return {
+            'session_key': session.session_key,
+            'cookies': {settings.SESSION_COOKIE_NAME: session.session_key,
+                        settings.CSRF_COOKIE_NAME: csrf},
+            'csrf_headers': {'X-CSRFToken': csrf},
+            'progress': list(
+                LessonProgress.objects.filter(enrollment__student=user)
+                .values_list('pk', flat=True)[:50]
+            ),
+        }
+
+    def _start_server(self, options, base_url, httpx):
+        env = {
+            **os.environ,
+            'QUERY_COUNT_HEADER': 'True',
+            'STRIPE_WEBHOOK_SECRET': options['webhook_secret'],
+        }
+        if not settings.SHARED_CACHE:
+            # The workers need a shared cache for invalidation to reach them all
+            env['CACHE_DIR'] = tempfile.mkdtemp(prefix='benchmark-cache-')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'Core.wsgi:application',
+             '--bind', base_url.removeprefix('http://'), '--workers', str(options['workers']),
+             '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with code {server.returncode}')
+            try:
+                if httpx.get(base_url + '/', timeout=5).status_code == 200:
+                    self.stdout.write(f'Server started at {base_url}')
+                    return server
+            except httpx.TransportError:
+                pass
+            time.sleep(0.5)
+        server.terminate()
+        raise CommandError('Server did not start within 60 seconds')
+
+    async def _load(self, httpx, base_url, journeys, fixtures, profiles, rng, options):
+        recorder = Recorder()
+        limits = httpx.Limits(max_connections=1)
+        clients = [
+            httpx.AsyncClient(base_url=base_url, cookies=profile['cookies'], limits=limits,
+                              timeout=30)
+            for profile in profiles
+        ]
+        users = [
+            VirtualUser(client, recorder, fixtures, profile, random.Random(rng.random()))
+            for client, profile in zip(clients, profiles)
+        ]
+        deadline = time.monotonic() + options['warmup'] + options['duration']
+        tasks = [asyncio.create_task(user.run(journeys, deadline)) for user in users]
+        self.stdout.write(f'Warming up for {options["warmup"]:.0f}s, '
+                          f'then measuring for {options["duration"]:.0f}s...')
+        await asyncio.sleep(options['warmup'])
+        recorder.recording = True
+        started = time.monotonic()
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+        for client in clients:
+            await client.aclose()
+        return recorder.summary(elapsed)
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _report(self, results):
+        self.stdout.write(f'\n{"endpoint":<15} {"requests":>9} {"errors":>7} {"req/s":>8} '
+                          f'{"p50":>9} {"p95":>9} {"p99":>9} {"queries":>8}')
+        for name, endpoint in results['endpoints'].items():
+            queries = endpoint['queries_per_request']
+            self.stdout.write(
+                f'{name:<15} {endpoint["requests"]:>9} {endpoint["errors"]:>7} '
+                f'{endpoint["throughput"]:>8.1f} {endpoint["p50_ms"]:>7.1f}ms '
+                f'{endpoint["p95_ms"]:>7.1f}ms {endpoint["p99_ms"]:>7.1f}ms '
+                f'{"-" if queries is None else f"{queries:.1f}":>8}'
+            )
+        self.stdout.write(f'\n{results["requests"]} requests, {results["errors"]} errors, '
+                          f'{results["throughput"]:.1f} req/s')
+
+    def _compare(self, before, after):
+        self.stdout.write(f'\nAgainst {before["meta"].get("commit") or "the earlier run"}:')
+        self.stdout.write(f'{"endpoint":<15} {"p95":>18} {"req/s":>18} {"queries":>14}')
+        for name, endpoint in after['endpoints'].items():
+            old = before['endpoints'].get(name)
+            if not old:
+                continue
+            self.stdout.write(
+                f'{name:<15} {old["p95_ms"]:>7.1f} -> {endpoint["p95_ms"]:>7.1f} '
+                f'{old["throughput"]:>7.1f} -> {endpoint["throughput"]:>7.1f} '
+                f'{old["queries_per_request"] or 0:>5.1f} -> '
+                f'{endpoint["queries_per_request"] or 0:>5.1f}'
+            )
@@ -0,0 +1,167 @@
+import io
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from Core.parsers import ORJSONParser
+from Core.renderers import ORJSONRenderer
+from courses.models import Category, Content, Course, Lesson, Module
+from courses.serializers import CourseListSerializer, CourseSerializer
+from enrollments.models import Enrollment, LessonProgress
+from enrollments.serializers import EnrollmentSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare the orjson renderer and parser with the stock DRF JSON ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=200,
+                            help='Number of synthetic courses to serialize')
+        parser.add_argument('--modules', type=int, default=6, help='Modules per course')
+        parser.add_argument('--lessons', type=int, default=8, help='Lessons per module')
+        parser.add_argument('--repeat', type=int, default=30,
+                            help='Number of timed runs per payload')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            courses = self._seed(options)
+            payloads = self._payloads(courses)
+            transaction.set_rollback(True)
+
+        stock, fast = JSONRenderer(), ORJSONRenderer()
+        self.stdout.write(
+            f'\n{"payload":<22} {"size":>9} {"stock p50":>11} {"orjson p50":>11} '
+            f'{"speedup":>8} {"parse":>8} {"same":>5}'
+        )
+        for name, data in payloads:
+            expected = stock.render(data)
+            rendered = fast.render(data)
+            render_stock = self._time(lambda: stock.render(data), options['repeat'])
+            render_fast = self._time(lambda: fast.render(data), options['repeat'])
+            parse_stock = self._time(
+                lambda: JSONParser().parse(io.BytesIO(expected)), options['repeat']
+            )
+            parse_fast = self._time(
+                lambda: ORJSONParser().parse(io.BytesIO(expected)), options['repeat']
+            )
+            self.stdout.write(
+                f'{name:<22} {len(expected) / 1024:>8.0f}K '
+                f'{self._ms(render_stock):>11} {self._ms(render_fast):>11} '
+                f'{self._ratio(render_stock, render_fast):>8} '
+                f'{self._ratio(parse_stock, parse_fast):>8} '
+                f'{"yes" if rendered == expected else "NO":>5}'
+            )
+
+    def _seed(self, options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(
+            f'Creating {options["courses"]} courses with '
+            f'{options["modules"] * options["lessons"]} lessons each...'
+        )
+        instructor = User.objects.create(
+            username=f'json-benchmark-instructor-{options["seed"]}', first_name='Bench',
+            last_name='Mark', user_type='instructor',
+        )
+        student = User.objects.create(
+            username=f'json-benchmark-student-{options["seed"]}', user_type='student',
+        )
+        category, _ = Category.objects.get_or_create(
+            slug='json-benchmark', defaults={'name': 'JSON Benchmark'}
+        )
+        courses = Course.objects.bulk_create([
+            Course(
+                title=f'Benchmark course {index} – {rng.choice(["Python", "Design", "Ökonomie"])}',
+                slug=f'json-benchmark-{options["seed"]}-{index}',
+                short_description='A realistic short description of the course. ' * 2,
+                description='Longer course description with some détails. ' * 20,
+                instructor=instructor,
+                category=category,
+                price=rng.choice(['0.00', '19.99', '49.50', '129.00']),
+                level=rng.choice(['beginner', 'intermediate', 'advanced']),
+                duration_hours=rng.randint(1, 40),
+                status='published',
+            )
+            for index in range(options['courses'])
+        ])
+        modules = Module.objects.bulk_create([
+            Module(course=course, title=f'Module {number}', description='What this module covers.',
+                   order=number)
+            for course in courses
+            for number in range(1, options['modules'] + 1)
+        ])
+        lessons = Lesson.objects.bulk_create([
+            Lesson(module=module, title=f'Lesson {number}', description='Lesson summary.',
+                   order=number, duration_minutes=rng.randint(3, 30),
+                   is_free_preview=number == 1)
+            for module in modules
+            for number in range(1, options['lessons'] + 1)
+        ])
+        Content.objects.bulk_create([
+            Content(lesson=lesson, content_type='video',
+                    video_url=f'https://videos.example.com/{lesson.pk}.mp4',
+                    text_content='Transcript excerpt. ' * 10)
+            for lesson in lessons
+        ])
+        enrollments = Enrollment.objects.bulk_create([
+            Enrollment(student=student, course=course,
+                       progress_percentage=rng.choice(['0.00', '12.50', '87.25']))
+            for course in courses
+        ])
+        lessons_by_course = {}
+        for lesson in lessons:
+            lessons_by_course.setdefault(lesson.module.course_id, []).append(lesson)
+        LessonProgress.objects.bulk_create([
+            LessonProgress(enrollment=enrollment, lesson=lesson,
+                           is_completed=True, watched_duration=rng.randint(60, 1800))
+            for enrollment in enrollments
+            for lesson in lessons_by_course[enrollment.course_id][:5]
+        ])
+        return Course.objects.filter(pk__in=[course.pk for course in courses])
+
+    def _payloads(self, courses):
+        detailed = courses.select_related('instructor', 'category').prefetch_related(
+            'modules',
+            Prefetch('modules__lessons', queryset=Lesson.objects.select_related('content')),
+        )
+        enrollments = (
+            Enrollment.objects.filter(course__in=courses)
+            .select_related('student', 'course__instructor', 'course__category')
+            .prefetch_related('lesson_progress__lesson')
+        )
+        return [
+            ('course detail (tree)', CourseSerializer(
+                detailed, many=True, expand='modules.lessons.content'
+            ).data),
+            ('course list', CourseListSerializer(
+                courses.select_related('instructor', 'category'), many=True
+            ).data),
+            ('enrollments', EnrollmentSerializer(enrollments, many=True).data),
+            # Raw Decimal and datetime values, as values()-based views return them
+            ('course rows (values)', list(courses.values(
+                'id', 'title', 'slug', 'price', 'level', 'status', 'created_at', 'updated_at'
+            ))),
+        ]
+
+    def _time(self, func, repeat):
+        func()  # warm up
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def _ms(self, timings):
+        return f'{statistics.median(timings) * 1000:.2f}ms'
+
+    def _ratio(self, baseline, candidate):
+        return f'{statistics.median(baseline) / statistics.median(candidate):.1f}x'
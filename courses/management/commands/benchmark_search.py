@@ -0,0 +1,129 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from courses.models import Category, Course
+from courses.search import get_search_backend, rank_courses
+
+User = get_user_model()
+
+WORDS = [
+    'python', 'django', 'react', 'javascript', 'data', 'science', 'machine',
+    'learning', 'design', 'marketing', 'photography', 'business', 'mobile',
+    'flutter', 'vue', 'api', 'rest', 'cloud', 'docker', 'kubernetes', 'security',
+    'finance', 'excel', 'writing', 'music', 'guitar', 'drawing', 'sql',
+    'statistics', 'leadership', 'startup', 'seo', 'animation', 'unity', 'rust',
+]
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ren', 'tor', 'va', 'zu', 'pel', 'dri', 'son', 'qua', 'ni']
+
+DEFAULT_QUERIES = ['python', 'django rest', 'mach', 'data science', 'kubern', 'guitar lessons']
+
+
+class Command(BaseCommand):
+    help = 'Measure ranked course search latency against a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=100000,
+                            help='Number of synthetic courses to create')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Number of timed runs per query')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Query to time (repeatable)')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the synthetic catalog instead of rolling it back')
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        backend = get_search_backend()
+        self.stdout.write(f'Search backend: {backend.__class__.__name__}')
+
+        with transaction.atomic():
+            self._seed(options['courses'], options['seed'])
+            published = Course.objects.filter(status='published')
+
+            self.stdout.write(f'\n{"query":<20} {"ranked p50":>12} {"ranked p95":>12} '
+                              f'{"icontains p50":>14} {"matches":>8}')
+            for query in queries:
+                ranked = self._time(
+                    lambda: list(rank_courses(published, query)[:8]), options['repeat']
+                )
+                legacy = self._time(
+                    lambda: list(self._icontains(published, query)[:8]), options['repeat']
+                )
+                matches = rank_courses(published, query).count()
+                self.stdout.write(
+                    f'{query:<20} {self._ms(ranked, 50):>12} {self._ms(ranked, 95):>12} '
+                    f'{self._ms(legacy, 50):>14} {matches:>8}'
+                )
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def _seed(self, count, seed):
+        rng = random.Random(seed)
+        # Topic words are rare; filler words give descriptions realistic variety.
+        filler = [
+            ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(5000)
+        ]
+        self.stdout.write(f'Creating {count} synthetic courses...')
+        instructor = User.objects.create(
+            username=f'benchmark-instructor-{seed}', first_name='Bench',
+            last_name='Mark', user_type='instructor',
+        )
+        categories = [
+            Category.objects.get_or_create(
+                slug=f'benchmark-{word}', defaults={'name': f'Benchmark {word.title()}'}
+            )[0]
+            for word in WORDS[:8]
+        ]
+
+        batch = []
+        for index in range(count):
+            title = ' '.join([rng.choice(WORDS)] + rng.sample(filler, 3)).title()
+            batch.append(Course(
+                title=title,
+                slug=f'benchmark-{seed}-{index}',
+                short_description=' '.join([rng.choice(WORDS)] + rng.sample(filler, 8)),
+                description=' '.join(rng.choices(filler, k=60) + [rng.choice(WORDS)]),
+                instructor=instructor,
+                category=rng.choice(categories),
+                status='published' if rng.random() < 0.9 else 'draft',
+            ))
+            if len(batch) >= 5000:
+                Course.objects.bulk_create(batch)
+                batch = []
+        Course.objects.bulk_create(batch)
+
+        started = time.perf_counter()
+        get_search_backend().rebuild()
+        self.stdout.write(f'Indexed in {time.perf_counter() - started:.1f}s')
+
+    def _icontains(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(short_description__icontains=query) |
+            Q(category__name__icontains=query)
+        ).order_by('-created_at')
+
+    def _time(self, func, repeat):
+        func()  # warm up
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def _ms(self, timings, percentile):
+        if len(timings) == 1:
+            value = timings[0]
+        else:
+            value = statistics.quantiles(timings, n=100)[percentile - 1]
+        return f'{value * 1000:.2f}ms'
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from courses.recommendations import DEFAULT_CHUNK_SIZE, DEFAULT_TOP_N, build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild "students also took" course recommendations from co-enrollment'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-n', type=int, default=DEFAULT_TOP_N,
+            help='Number of neighbors stored per course',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help='Approximate number of enrollments held in memory at a time',
+        )
+        parser.add_argument(
+            '--min-common', type=int, default=1,
+            help='Minimum number of shared students for a pair to be recommended',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stored = build_recommendations(
+            top_n=options['top_n'],
+            chunk_size=options['chunk_size'],
+            min_common=options['min_common'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} recommendations in {elapsed:.1f}s.'
+        ))
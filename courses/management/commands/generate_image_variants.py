@@ -0,0 +1,73 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from courses.cache import bump_catalog_version
+from courses.images import IMAGE_FIELDS, generate_variants, needs_variants
+from courses.models import Course
+
+
+def generate_chunk(course_ids, force=False):
+    rendered = 0
+    for course_id in course_ids:
+        rendered += generate_variants(course_id, force=force) or 0
+    connections.close_all()
+    return rendered
+
+
+class Command(BaseCommand):
+    help = 'Render resized WebP/JPEG variants of course images in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'course_ids', nargs='*', type=int,
+            help='Only process these courses (default: all courses)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of worker processes (1 renders in this process)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=20,
+            help='Number of courses handed to a worker at a time',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Render again even when the stored variants are current',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Course.objects.order_by('pk').only('pk', *IMAGE_FIELDS, 'image_variants')
+        if options['course_ids']:
+            queryset = queryset.filter(pk__in=options['course_ids'])
+        course_ids = [
+            course.pk for course in queryset.iterator()
+            if needs_variants(course)
+            or (options['force'] and any(getattr(course, field) for field in IMAGE_FIELDS))
+        ]
+        size = options['chunk_size']
+        chunks = [course_ids[start:start + size] for start in range(0, len(course_ids), size)]
+        job = partial(generate_chunk, force=options['force'])
+
+        self.stdout.write(
+            f'Rendering image variants of {len(course_ids)} courses '
+            f'with {options["workers"]} workers...'
+        )
+        started = time.perf_counter()
+        if options['workers'] <= 1:
+            rendered = sum(job(chunk) for chunk in chunks)
+        else:
+            # Forked workers must not share the parent's database connection.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                rendered = sum(pool.map(job, chunks))
+        if course_ids:
+            bump_catalog_version()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered variants of {rendered} images in {elapsed:.1f}s.'
+        ))
@@ -0,0 +1,318 @@
+"""
+Deterministic synthetic data at production scale, for load tests and benchmarks.
+
+Rows are written with bulk_create in chunks, so model signals never fire;
+their side effects (profiles, course counters, category counts, the search
+index and cache versions) are applied in bulk instead. Primary keys are
+assigned from the current maximum of each table, which lets any process
+compute the ids of rows written by another one, so work can be fanned out
+across processes by id range.
+
+Every block of UNIT users or courses draws from its own random stream seeded
+from --seed, so the same arguments produce the same data whatever the number
+of processes.
+"""
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from courses import autocomplete, categories
+from courses.cache import bump_catalog_version
+from courses.counters import rebuild_category_counts, rebuild_course_counters
+from courses.models import Category, Course, CourseEnrollmentBucket, Lesson, Module
+from courses.ordering import ORDER_GAP
+from courses.search import get_search_backend
+from courses.trending import refresh_trending_scores
+from enrollments.models import Enrollment, LessonProgress
+from payments.models import Payment
+from users.models import InstructorProfile, StudentProfile
+
+User = get_user_model()
+
+MODULES_PER_COURSE = 4
+LESSONS_PER_MODULE = 5
+LESSONS_PER_COURSE = MODULES_PER_COURSE * LESSONS_PER_MODULE
+# Users or courses generated from one random stream; fixed so the output
+# does not depend on --processes or --batch-size
+UNIT = 1000
+# One user in this many is an instructor
+INSTRUCTOR_RATIO = 50
+
+TOPICS = [
+    'python', 'django', 'javascript', 'react', 'data science', 'machine learning',
+    'design', 'photography', 'marketing', 'finance', 'guitar', 'cloud', 'docker',
+    'security', 'excel', 'writing', 'leadership', 'sql', 'mobile', 'animation',
+]
+FORMATS = ['for beginners', 'masterclass', 'bootcamp', 'in practice', 'crash course',
+           'from scratch', 'deep dive', 'projects']
+FIRST_NAMES = ['Ada', 'Alan', 'Grace', 'Linus', 'Barbara', 'Ken', 'Margaret', 'Dennis',
+               'Frances', 'Edsger', 'Radia', 'Guido', 'Katherine', 'Donald', 'Hedy']
+LAST_NAMES = ['Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Liskov', 'Thompson',
+              'Hamilton', 'Ritchie', 'Allen', 'Dijkstra', 'Perlman', 'Rossum', 'Knuth']
+STATUSES = ['published', 'draft', 'archived']
+STATUS_WEIGHTS = [70, 25, 5]
+PRICES = [Decimal('0.00'), Decimal('19.99'), Decimal('49.99'), Decimal('99.99'),
+          Decimal('149.99')]
+LEVELS = [choice for choice, _ in Course.LEVEL_CHOICES]
+
+# Tables whose primary keys are assigned here
+ID_MODELS = [User, Course, Module, Lesson, Enrollment]
+
+
+@lru_cache(maxsize=None)
+def _catalog(seed, courses):
+    """Status and price of every course, which enrollments and payments depend on"""
+    rng = random.Random(f'{seed}:catalog')
+    statuses = rng.choices(STATUSES, STATUS_WEIGHTS, k=courses)
+    prices = rng.choices(PRICES, k=courses)
+    published = [index for index, status in enumerate(statuses) if status == 'published']
+    return statuses, prices, published
+
+
+def _units(total, start=0):
+    return [(begin, min(begin + UNIT, total)) for begin in range(start, total, UNIT)]
+
+
+def create_users(plan, start, stop):
+    rng = random.Random(f'{plan["seed"]}:users:{start}')
+    prefix = plan['prefix']
+    users = []
+    for index in range(start, stop):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        users.append(User(
+            pk=plan['base'][User] + index, username=f'{prefix}-{index}',
+            email=f'{prefix}-{index}@example.com', password=plan['password'],
+            first_name=first, last_name=last,
+            user_type='instructor' if index < plan['instructors'] else 'student',
+        ))
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=plan['batch_size'])
+        InstructorProfile.objects.bulk_create([
+            InstructorProfile(user=user, expertise=rng.choice(TOPICS).title())
+            for user in users if user.user_type == 'instructor'
+        ], batch_size=plan['batch_size'])
+        StudentProfile.objects.bulk_create([
+            StudentProfile(user=user) for user in users if user.user_type == 'student'
+        ], batch_size=plan['batch_size'])
+    return len(users)
+
+
+def create_courses(plan, start, stop):
+    rng = random.Random(f'{plan["seed"]}:courses:{start}')
+    statuses, prices, _ = _catalog(plan['seed'], plan['courses'])
+    base = plan['base']
+    courses, modules, lessons = [], [], []
+    for index in range(start, stop):
+        topic = rng.choice(TOPICS)
+        course_id = base[Course] + index
+        minutes = 0
+        for module_order in range(MODULES_PER_COURSE):
+            module_index = index * MODULES_PER_COURSE + module_order
+            modules.append(Module(
+                pk=base[Module] + module_index, course_id=course_id,
+                title=f'Part {module_order + 1}', order=(module_order + 1) * ORDER_GAP,
+            ))
+            for lesson_order in range(LESSONS_PER_MODULE):
+                duration = rng.randint(3, 30)
+                minutes += duration
+                lessons.append(Lesson(
+                    pk=base[Lesson] + module_index * LESSONS_PER_MODULE + lesson_order,
+                    module_id=base[Module] + module_index,
+                    title=f'{topic.title()} lesson {lesson_order + 1}',
+                    order=(lesson_order + 1) * ORDER_GAP, duration_minutes=duration,
+                    is_free_preview=module_order == 0 and lesson_order == 0,
+                ))
+        courses.append(Course(
+            pk=course_id, slug=f'{plan["prefix"]}-course-{index}',
+            title=f'{topic.title()} {rng.choice(FORMATS)} {index}',
+            short_description=f'Learn {topic} step by step.',
+            description=f'A {LESSONS_PER_COURSE}-lesson course on {topic} and '
+                        f'{rng.choice(TOPICS)}.',
+            instructor_id=base[User] + rng.randrange(plan['instructors']),
+            category_id=rng.choice(plan['categories']),
+            price=prices[index], level=rng.choice(LEVELS), status=statuses[index],
+            duration_hours=max(1, minutes // 60), featured=rng.random() < 0.01,
+            modules_count=MODULES_PER_COURSE, lessons_count=LESSONS_PER_COURSE,
+            total_lesson_minutes=minutes,
+        ))
+    with transaction.atomic():
+        Course.objects.bulk_create(courses, batch_size=plan['batch_size'])
+        Module.objects.bulk_create(modules, batch_size=plan['batch_size'])
+        Lesson.objects.bulk_create(lessons, batch_size=plan['batch_size'])
+    return len(courses)
+
+
+def create_enrollments(plan, start, stop):
+    """Enrollments, lesson progress and payments of students start..stop"""
+    rng = random.Random(f'{plan["seed"]}:enrollments:{start}')
+    _, prices, published = _catalog(plan['seed'], plan['courses'])
+    per_user = min(plan['enrollments_per_user'], len(published))
+    base = plan['base']
+    now = timezone.now()
+    enrollments, progress, payments = [], [], []
+    for index in range(start, stop):
+        student_id = base[User] + index
+        for order, course_index in enumerate(rng.sample(published, per_user)):
+            enrollment_id = (
+                base[Enrollment] + (index - plan['instructors']) * per_user + order
+            )
+            completed = min(LESSONS_PER_COURSE, int(rng.expovariate(1 / 5)))
+            finished = completed == LESSONS_PER_COURSE
+            enrollments.append(Enrollment(
+                pk=enrollment_id, student_id=student_id,
+                course_id=base[Course] + course_index,
+                status='completed' if finished else 'active',
+                completed_at=now if finished else None,
+                progress_percentage=Decimal(completed * 100 / LESSONS_PER_COURSE)
+                .quantize(Decimal('0.01')),
+            ))
+            first_lesson = base[Lesson] + course_index * LESSONS_PER_COURSE
+            progress.extend(
+                LessonProgress(
+                    enrollment_id=enrollment_id, lesson_id=first_lesson + offset,
+                    is_completed=True, watched_duration=rng.randint(60, 1800),
+                    completed_at=now,
+                )
+                for offset in range(completed)
+            )
+            if prices[course_index]:
+                payments.append(Payment(
+                    user_id=student_id, course_id=base[Course] + course_index,
+                    amount=prices[course_index], status='completed', completed_at=now,
+                ))
+    with transaction.atomic():
+        Enrollment.objects.bulk_create(enrollments, batch_size=plan['batch_size'])
+        LessonProgress.objects.bulk_create(progress, batch_size=plan['batch_size'])
+        Payment.objects.bulk_create(payments, batch_size=plan['batch_size'])
+    return len(enrollments)
+
+
+def _run_unit(args):
+    step, plan, start, stop = args
+    return step(plan, start, stop)
+
+
+class Command(BaseCommand):
+    help = ('Generate a deterministic synthetic dataset of users, courses, curricula, '
+            'enrollments, lesson progress and payments for load testing')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000,
+                            help=f'Number of users; one in {INSTRUCTOR_RATIO} is an instructor')
+        parser.add_argument('--courses', type=int, default=1000,
+                            help=f'Number of courses, each with {MODULES_PER_COURSE} modules '
+                                 f'of {LESSONS_PER_MODULE} lessons')
+        parser.add_argument('--enrollments-per-user', type=int, default=5,
+                            help='Published courses each student is enrolled in')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='load',
+                            help='Prefix of generated usernames and course slugs')
+        parser.add_argument('--password', default='loadtest',
+                            help='Password of every generated user')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows per INSERT statement')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes, each loading whole id ranges '
+                                 '(PostgreSQL only)')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['courses'] < 1:
+            raise CommandError('Need at least 2 users and 1 course')
+        if options['processes'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError('--processes needs PostgreSQL; SQLite allows one writer at a time')
+        prefix = options['prefix']
+        if User.objects.filter(username=f'{prefix}-0').exists():
+            raise CommandError(f'Data with prefix "{prefix}" already exists; pass --prefix')
+
+        users, courses = options['users'], options['courses']
+        instructors = max(1, users // INSTRUCTOR_RATIO)
+        category_ids = list(Category.objects.values_list('pk', flat=True))
+        if not category_ids:
+            category_ids = [
+                category.pk for category in Category.objects.bulk_create([
+                    Category(name=topic.title(), slug=topic.replace(' ', '-'))
+                    for topic in TOPICS
+                ])
+            ]
+        plan = {
+            'seed': options['seed'],
+            'prefix': prefix,
+            'password': make_password(options['password']),
+            'batch_size': options['batch_size'],
+            'courses': courses,
+            'instructors': instructors,
+            'enrollments_per_user': options['enrollments_per_user'],
+            'categories': category_ids,
+            'base': {
+                model: (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+                for model in ID_MODELS
+            },
+        }
+
+        started = time.perf_counter()
+        self._phase('users', create_users, plan, _units(users), options['processes'])
+        self._phase('courses', create_courses, plan, _units(courses), options['processes'])
+        if options['enrollments_per_user'] > 0:
+            self._phase('students', create_enrollments, plan, _units(users, instructors),
+                        options['processes'])
+        self._finish(plan)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated data for {users} users and {courses} courses '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _phase(self, name, step, plan, units, processes):
+        started = time.perf_counter()
+        work = [(step, plan, start, stop) for start, stop in units]
+        if processes > 1:
+            # Forked workers must not share the parent's connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(processes, mp_context=context,
+                                     initializer=connections.close_all) as executor:
+                created = sum(executor.map(_run_unit, work))
+        else:
+            created = sum(map(_run_unit, work))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{name}: {created} in {elapsed:.1f}s '
+                          f'({created / max(elapsed, 1e-6):.0f}/s)')
+
+    def _finish(self, plan):
+        """What the skipped signals would have done, in bulk"""
+        started = time.perf_counter()
+        # Explicit ids leave PostgreSQL sequences behind the data
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), ID_MODELS):
+                cursor.execute(sql)
+        rebuild_course_counters(Course.objects.filter(pk__gte=plan['base'][Course]))
+        rebuild_category_counts()
+        # Hourly enrollment buckets, then the trending counters built from them
+        buckets = (
+            Enrollment.objects.filter(pk__gte=plan['base'][Enrollment])
+            .annotate(hour=TruncHour('enrolled_at'))
+            .values('course_id', 'hour')
+            .annotate(count=Count('pk'))
+            .order_by()
+        )
+        CourseEnrollmentBucket.objects.bulk_create(
+            [CourseEnrollmentBucket(**row) for row in buckets.iterator()],
+            batch_size=plan['batch_size'],
+        )
+        refresh_trending_scores()
+        get_search_backend().rebuild()
+        categories.invalidate()
+        autocomplete.invalidate()
+        bump_catalog_version()
+        self.stdout.write(f'counters, trending scores and search index: {time.perf_counter() - started:.1f}s')
@@ -0,0 +1,70 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from courses.transfer import CourseImporter, RecordError, count_rows
+
+
+class Command(BaseCommand):
+    help = 'Import courses with their modules, lessons and content from JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='JSONL file to read (default: standard input)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of courses written per transaction',
+        )
+        parser.add_argument(
+            '--default-instructor',
+            help='Username assigned to courses whose instructor does not exist',
+        )
+
+    def handle(self, *args, **options):
+        importer = CourseImporter(default_instructor=options['default_instructor'])
+        source = sys.stdin if options['input'] == '-' else open(
+            options['input'], encoding='utf-8'
+        )
+        self.started = time.perf_counter()
+        self.courses = self.rows = 0
+        batch = []
+        try:
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    batch.append(json.loads(line))
+                except json.JSONDecodeError as error:
+                    raise CommandError(f'Line {line_number}: invalid JSON ({error})')
+                if len(batch) >= options['batch_size']:
+                    self._import(importer, batch)
+                    batch = []
+            if batch:
+                self._import(importer, batch)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if self.courses:
+                importer.finish()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.courses} courses ({self.rows} rows) in {self._elapsed():.1f}s, '
+            f'{self.rows / self._elapsed():.0f} rows/s.'
+        ))
+
+    def _import(self, importer, batch):
+        try:
+            importer.import_batch(batch)
+        except RecordError as error:
+            raise CommandError(str(error))
+        self.courses += len(batch)
+        self.rows += sum(count_rows(record) for record in batch)
+        self.stdout.write(
+            f'{self.courses} courses, {self.rows / self._elapsed():.0f} rows/s'
+        )
+
+    def _elapsed(self):
+        return max(time.perf_counter() - self.started, 1e-9)
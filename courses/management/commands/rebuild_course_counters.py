@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from courses.categories import invalidate as invalidate_categories
+from courses.counters import rebuild_category_counts, rebuild_course_counters
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = ('Recompute the stored module, lesson, enrollment and duration counters of '
+            'courses and the published-course counts of categories')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'course_ids', nargs='*', type=int,
+            help='Only rebuild these courses (default: all courses)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of courses updated per UPDATE statement',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Course.objects.all()
+        if options['course_ids']:
+            queryset = queryset.filter(pk__in=options['course_ids'])
+
+        self.stdout.write(f'Checking counters of {queryset.count()} courses...')
+        repaired = rebuild_course_counters(queryset, batch_size=options['batch_size'])
+
+        if repaired:
+            self.stdout.write(self.style.WARNING(f'Repaired counters of {repaired} courses'))
+
+        repaired = rebuild_category_counts()
+        if repaired:
+            invalidate_categories()
+            self.stdout.write(self.style.WARNING(f'Repaired course counts of {repaired} categories'))
+        self.stdout.write(self.style.SUCCESS('Course counters are up to date.'))
@@ -0,0 +1,59 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from courses.models import Course
+from courses.snapshots import build_snapshot
+
+
+def rebuild_chunk(course_ids):
+    for course_id in course_ids:
+        build_snapshot(course_id)
+    connections.close_all()
+    return len(course_ids)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored curriculum snapshots of courses in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'course_ids', nargs='*', type=int,
+            help='Only rebuild these courses (default: all courses)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of worker processes (1 rebuilds in this process)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='Number of courses handed to a worker at a time',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Course.objects.order_by('pk')
+        if options['course_ids']:
+            queryset = queryset.filter(pk__in=options['course_ids'])
+        course_ids = list(queryset.values_list('pk', flat=True))
+        size = options['chunk_size']
+        chunks = [course_ids[start:start + size] for start in range(0, len(course_ids), size)]
+
+        self.stdout.write(
+            f'Rebuilding {len(course_ids)} curriculum snapshots '
+            f'with {options["workers"]} workers...'
+        )
+        started = time.perf_counter()
+        if options['workers'] <= 1:
+            done = sum(rebuild_chunk(chunk) for chunk in chunks)
+        else:
+            # Forked workers must not share the parent's database connection.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                done = sum(pool.map(rebuild_chunk, chunks))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {done} snapshots in {elapsed:.1f}s.'
+        ))
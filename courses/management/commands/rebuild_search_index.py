@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from courses.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents of all courses'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding search index with {backend.__class__.__name__}...')
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
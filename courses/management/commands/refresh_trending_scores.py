@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from courses.trending import refresh_trending_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute windowed enrollment counters and trending scores (run periodically, e.g. every 15 minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of courses written per UPDATE statement',
+        )
+
+    def handle(self, *args, **options):
+        updated = refresh_trending_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated trending scores of {updated} courses.'))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Module = apps.get_model('courses', 'Module')
+    Lesson = apps.get_model('courses', 'Lesson')
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+
+    def subquery(queryset, group_by, aggregate):
+        return Coalesce(
+            Subquery(
+                queryset.order_by().values(group_by)
+                .annotate(value=aggregate).values('value')[:1],
+                output_field=models.IntegerField(),
+            ),
+            Value(0),
+        )
+
+    lessons = Lesson.objects.filter(module__course=OuterRef('pk'))
+    Course.objects.update(
+        modules_count=subquery(
+            Module.objects.filter(course=OuterRef('pk')), 'course', Count('pk')
+        ),
+        lessons_count=subquery(lessons, 'module__course', Count('pk')),
+        enrollments_count=subquery(
+            Enrollment.objects.filter(course=OuterRef('pk')), 'course', Count('pk')
+        ),
+        total_lesson_minutes=subquery(lessons, 'module__course', Sum('duration_minutes')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+        ('enrollments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lessons_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='modules_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_lesson_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:25
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Kept out of Course.Meta.indexes so SQLite table rebuilds never try to
+# recreate a GIN index.
+POSTGRES_INDEX_SQL = (
+    'CREATE INDEX course_search_vector_idx ON courses_course USING gin (search_vector)'
+)
+
+POSTGRES_POPULATE_SQL = """
+    UPDATE courses_course SET search_vector =
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(short_description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C') ||
+        setweight(to_tsvector('english', concat_ws(' ',
+            (SELECT name FROM courses_category WHERE id = courses_course.category_id),
+            (SELECT concat_ws(' ', first_name, last_name, username)
+             FROM users_user WHERE id = courses_course.instructor_id)
+        )), 'D')
+"""
+
+SQLITE_CREATE_SQL = """
+    CREATE VIRTUAL TABLE courses_course_fts USING fts5(
+        title, short_description, description, taxonomy,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+"""
+
+SQLITE_POPULATE_SQL = """
+    INSERT INTO courses_course_fts (rowid, title, short_description, description, taxonomy)
+    SELECT c.id, c.title, c.short_description, c.description,
+           trim(coalesce(cat.name, '') || ' ' || u.first_name || ' ' ||
+                u.last_name || ' ' || u.username)
+    FROM courses_course c
+    JOIN users_user u ON u.id = c.instructor_id
+    LEFT JOIN courses_category cat ON cat.id = c.category_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_INDEX_SQL)
+        schema_editor.execute(POSTGRES_POPULATE_SQL)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE_SQL)
+        schema_editor.execute(SQLITE_POPULATE_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS course_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS courses_course_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_course_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
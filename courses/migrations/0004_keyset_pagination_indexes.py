@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-created_at', 'id'], name='courses_cou_created_ad794b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', '-created_at', 'id'], name='courses_cou_status_70db17_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['order', 'id'], name='courses_les_order_6c6c3c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='module',
+            index=models.Index(fields=['order', 'id'], name='courses_mod_order_adbb47_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurriculumSnapshot',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='curriculum_snapshot', serialize=False, to='courses.course')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('payload', models.TextField()),
+                ('etag', models.CharField(max_length=64)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='curriculum_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
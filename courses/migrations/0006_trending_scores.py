@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:39
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+
+def populate_buckets(apps, schema_editor):
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+    CourseEnrollmentBucket = apps.get_model('courses', 'CourseEnrollmentBucket')
+
+    recent = (
+        Enrollment.objects.filter(enrolled_at__gte=timezone.now() - timedelta(days=30))
+        .annotate(hour=TruncHour('enrolled_at'))
+        .values('course_id', 'hour')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    CourseEnrollmentBucket.objects.bulk_create(
+        [CourseEnrollmentBucket(**row) for row in recent.iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_curriculum_snapshots'),
+        ('enrollments', '0002_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseEnrollmentBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrollments_24h',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrollments_30d',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrollments_7d',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', '-trending_score', '-created_at'], name='courses_cou_status_69588d_idx'),
+        ),
+        migrations.AddField(
+            model_name='courseenrollmentbucket',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollment_buckets', to='courses.course'),
+        ),
+        migrations.AddIndex(
+            model_name='courseenrollmentbucket',
+            index=models.Index(fields=['hour'], name='courses_cou_hour_1ad418_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='courseenrollmentbucket',
+            unique_together={('course', 'hour')},
+        ),
+        migrations.RunPython(populate_buckets, migrations.RunPython.noop),
+    ]
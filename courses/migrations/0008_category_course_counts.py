@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:44
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counts(apps, schema_editor):
+    Category = apps.get_model('courses', 'Category')
+    Course = apps.get_model('courses', 'Course')
+
+    Category.objects.update(
+        published_courses_count=Coalesce(
+            Subquery(
+                Course.objects.filter(category=OuterRef('pk'), status='published')
+                .order_by().values('category').annotate(value=Count('pk')).values('value')[:1],
+                output_field=models.IntegerField(),
+            ),
+            Value(0),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_courses_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
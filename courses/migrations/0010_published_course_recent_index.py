@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_course_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-created_at', '-id'], name='course_published_recent_idx'),
+        ),
+    ]
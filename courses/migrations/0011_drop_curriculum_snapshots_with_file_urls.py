@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def drop_snapshots(apps, schema_editor):
+    # Stored outlines still list lesson files by their media URL, which is
+    # no longer served; readers rebuild missing snapshots on demand.
+    apps.get_model('courses', 'CurriculumSnapshot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_published_course_recent_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_snapshots, migrations.RunPython.noop),
+    ]
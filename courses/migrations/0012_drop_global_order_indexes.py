@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:50
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_drop_curriculum_snapshots_with_file_urls'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lesson',
+            name='courses_les_order_6c6c3c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='module',
+            name='courses_mod_order_adbb47_idx',
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils.text import slugify
 
@@ -10,6 +11,8 @@ class Category(models.Model):
     slug = models.SlugField(unique=True, max_length=100)
     description = models.TextField(blank=True)
     icon = models.CharField(max_length=50, blank=True)  # Icon class or name
+    # Denormalized counter, maintained by courses.signals
+    published_courses_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -59,16 +62,56 @@ class Course(models.Model):
     background_image = models.ImageField(
         upload_to="course_backgrounds/", null=True, blank=True
     )
+    # Resized WebP/JPEG variant URLs per image field, keyed by the source
+    # they were rendered from; maintained by courses.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     level = models.CharField(max_length=20, choices=LEVEL_CHOICES, default="beginner")
     duration_hours = models.PositiveIntegerField(default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="draft")
     featured = models.BooleanField(default=False)
+
+    # Denormalized counters, maintained by courses.signals
+    modules_count = models.PositiveIntegerField(default=0, editable=False)
+    lessons_count = models.PositiveIntegerField(default=0, editable=False)
+    enrollments_count = models.PositiveIntegerField(default=0, editable=False)
+    total_lesson_minutes = models.PositiveIntegerField(default=0, editable=False)
+
+    # Windowed enrollment counts and decayed trending score, refreshed
+    # periodically by courses.trending
+    enrollments_24h = models.PositiveIntegerField(default=0, editable=False)
+    enrollments_7d = models.PositiveIntegerField(default=0, editable=False)
+    enrollments_30d = models.PositiveIntegerField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
+
+    # Weighted full-text document, maintained by courses.search. On
+    # PostgreSQL it is GIN indexed; SQLite uses an FTS5 table instead
+    # (see migration 0003_course_search).
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Bumped whenever the curriculum changes; see CurriculumSnapshot.
+    curriculum_version = models.PositiveIntegerField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination of the catalog API
+            models.Index(fields=["-created_at", "id"]),
+            models.Index(fields=["status", "-created_at", "id"]),
+            # Trending lists on the home page and the catalog API
+            models.Index(fields=["status", "-trending_score", "-created_at"]),
+            # The course list page, newest first. Partial: the published catalog
+            # is a fraction of all rows. Without it each page is cut from a sort
+            # of every published course (see the query plan tests in Core/tests.py).
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(status="published"),
+                name="course_published_recent_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.title}"
@@ -102,11 +145,21 @@ class Module(models.Model):
 
     class Meta:
         ordering = ["order", "created_at"]
+        # Also serves the (order, id) keyset pagination of a course's
+        # modules: order is unique within it.
         unique_together = ["course", "order"]
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        """Append new modules without an explicit order after the last one"""
+        if self._state.adding and not self.order:
+            from .ordering import next_order_key
+
+            self.order = next_order_key(Module.objects.filter(course_id=self.course_id))
+        super().save(*args, **kwargs)
+
 
 class Lesson(models.Model):
     LESSON_TYPES = (
@@ -128,11 +181,21 @@ class Lesson(models.Model):
 
     class Meta:
         ordering = ["order", "created_at"]
+        # Also serves the (order, id) keyset pagination of a module's
+        # lessons: order is unique within it.
         unique_together = ["module", "order"]
 
     def __str__(self):
         return f"{self.module.course.title} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        """Append new lessons without an explicit order after the last one"""
+        if self._state.adding and not self.order:
+            from .ordering import next_order_key
+
+            self.order = next_order_key(Lesson.objects.filter(module_id=self.module_id))
+        super().save(*args, **kwargs)
+
 
 class Content(models.Model):
     CONTENT_TYPES = (
@@ -157,3 +220,56 @@ class Content(models.Model):
 
     def __str__(self):
         return f"Content for {self.lesson.title}"
+
+
+class CourseEnrollmentBucket(models.Model):
+    """Number of enrollments into a course during one hour"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="enrollment_buckets")
+    hour = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ["course", "hour"]
+        indexes = [
+            models.Index(fields=["hour"]),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} @ {self.hour:%Y-%m-%d %H:00}: {self.count}"
+
+
+class CourseRecommendation(models.Model):
+    """
+    "Students also took" neighbor of a course, ranked by co-enrollment
+    similarity. Rebuilt offline by courses.recommendations.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="recommendations")
+    recommended = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="recommended_for")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["course", "rank"]
+        unique_together = ["course", "rank"]
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.recommended_id} (#{self.rank})"
+
+
+class CurriculumSnapshot(models.Model):
+    """
+    Serialized course outline, stored as the exact JSON served by the API.
+
+    A snapshot is current while its version equals the course's
+    curriculum_version; it is rebuilt by courses.snapshots.
+    """
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, primary_key=True, related_name="curriculum_snapshot"
+    )
+    version = models.PositiveIntegerField(default=0)
+    payload = models.TextField()
+    etag = models.CharField(max_length=64)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Curriculum snapshot v{self.version} for course {self.course_id}"
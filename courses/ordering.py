@@ -0,0 +1,108 @@
+"""
+Sparse order keys for modules within a course and lessons within a module.
+
+Keys are spaced ORDER_GAP apart, so placing a row between two others only
+rewrites that row (it takes the midpoint). When two neighbors are already
+adjacent, the whole sibling list is renumbered in one bulk_update.
+
+`(course, order)` and `(module, order)` are unique and databases check
+that row by row during an UPDATE, so a renumbering always picks keys that
+no sibling currently holds.
+"""
+from django.db import transaction
+
+from . import snapshots
+
+ORDER_GAP = 1024
+
+
+class OrderingError(ValueError):
+    pass
+
+
+def spaced_keys(count, taken=()):
+    """`count` increasing keys ORDER_GAP apart, none of them in `taken`"""
+    taken = set(taken)
+    for shift in range(ORDER_GAP):
+        keys = [(index + 1) * ORDER_GAP + shift for index in range(count)]
+        if taken.isdisjoint(keys):
+            return keys
+    start = max(taken)
+    return [start + (index + 1) * ORDER_GAP for index in range(count)]
+
+
+def next_order_key(siblings):
+    """Key that places a new row after all of `siblings`"""
+    last = siblings.order_by('-order').values_list('order', flat=True).first()
+    return ORDER_GAP if last is None else last + ORDER_GAP
+
+
+def _course_ids(siblings):
+    model = siblings.model
+    if hasattr(model, 'course_id'):
+        return siblings.values_list('course_id', flat=True).distinct()
+    return siblings.values_list('module__course_id', flat=True).distinct()
+
+
+def apply_order(siblings, ordered_ids):
+    """
+    Give `siblings` the order of `ordered_ids` with a single bulk_update.
+
+    `ordered_ids` must list every sibling exactly once. Returns the number
+    of rewritten rows.
+    """
+    with transaction.atomic():
+        rows = {row.pk: row for row in siblings.select_for_update().only('pk', 'order')}
+        ordered_ids = list(ordered_ids)
+        if len(ordered_ids) != len(set(ordered_ids)) or set(ordered_ids) != set(rows):
+            raise OrderingError('The new order must list every item exactly once.')
+
+        current = [row.order for row in sorted(rows.values(), key=lambda row: (row.order, row.pk))]
+        if [rows[pk].order for pk in ordered_ids] == current and _is_sparse(current):
+            return 0
+
+        keys = spaced_keys(len(ordered_ids), taken=[row.order for row in rows.values()])
+        changed = []
+        for pk, key in zip(ordered_ids, keys):
+            rows[pk].order = key
+            changed.append(rows[pk])
+        siblings.model.objects.bulk_update(changed, ['order'])
+        # bulk_update sends no signals; refresh the stored outline ourselves
+        snapshots.invalidate(_course_ids(siblings))
+    return len(changed)
+
+
+def move_after(siblings, pk, after=None):
+    """
+    Move sibling `pk` right after sibling `after` (or first if None).
+
+    Usually rewrites only the moved row; falls back to renumbering every
+    sibling when there is no free key between the new neighbors.
+    """
+    with transaction.atomic():
+        order = list(
+            siblings.select_for_update().order_by('order', 'pk').values_list('pk', 'order')
+        )
+        ids = [row_pk for row_pk, _ in order]
+        if pk not in ids or (after is not None and after not in ids):
+            raise OrderingError('Both items must belong to the same parent.')
+        if pk == after:
+            return 0
+
+        remaining = [(row_pk, key) for row_pk, key in order if row_pk != pk]
+        position = 0 if after is None else [row_pk for row_pk, _ in remaining].index(after) + 1
+        lower = remaining[position - 1][1] if position else -1
+        upper = remaining[position][1] if position < len(remaining) else lower + 2 * ORDER_GAP
+
+        if upper - lower > 1:
+            siblings.model.objects.filter(pk=pk).update(order=(lower + upper) // 2)
+            snapshots.invalidate(_course_ids(siblings))
+            return 1
+
+        new_ids = [row_pk for row_pk, _ in remaining]
+        new_ids.insert(position, pk)
+        return apply_order(siblings, new_ids)
+
+
+def _is_sparse(keys):
+    return all(later - earlier >= 2 for earlier, later in zip(keys, keys[1:]))
@@ -0,0 +1,127 @@
+"""
+Serializer-shaped responses built from values() rows.
+
+Hot list endpoints fetch only the columns their serializer's fields need
+with values() and build the response dicts directly, instead of creating
+a model instance and running every serializer field per row. A
+Projection takes its field list from one serializer instance, so
+?fields= and field options behave as they do for the serializer. Plain
+fields are read from their source column and formatted with the field's
+own to_representation, so the output stays identical. Fields that are not
+backed by a single column (string-related fields, method fields, nested
+serializers) are supplied as `computed` factories, called with the column
+prefix and the bound field and returning (columns, reader).
+"""
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+
+from .images import VARIANTS, responsive_image_for
+from .serializers import ResponsiveImageField
+
+
+def column(lookup):
+    """Computed reader returning one joined column as is, e.g. 'instructor__username'"""
+    def factory(prefix, field):
+        name = prefix + lookup
+        return [name], lambda row: row[name]
+    return factory
+
+
+def nested(build):
+    """Computed reader for a nested serializer; `build(serializer, prefix)` -> Projection"""
+    def factory(prefix, field):
+        projection = build(field, prefix + field.source.replace('.', '__') + '__')
+        return projection.columns, projection.shape_row
+    return factory
+
+
+class Projection:
+    """Shapes values() rows exactly like `serializer` shapes instances"""
+
+    def __init__(self, serializer, computed=None, prefix=''):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        computed = computed or {}
+        self.model = serializer.Meta.model
+        self.request = serializer.context.get('request')
+        self.columns = set()
+        self.readers = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in computed:
+                columns, read = computed[name](prefix, field)
+            else:
+                columns, read = self._reader(name, field, prefix)
+            self.columns.update(columns)
+            self.readers.append((name, read))
+        self.names = [name for name, _ in self.readers]
+
+    def values(self, queryset, *extra):
+        """`queryset` reduced to the columns this projection reads (plus `extra`)"""
+        return queryset.values(*sorted(self.columns.union(extra)))
+
+    def shape_row(self, row):
+        return {name: read(row) for name, read in self.readers}
+
+    def shape(self, rows):
+        readers = self.readers
+        return [{name: read(row) for name, read in readers} for row in rows]
+
+    def _build_url(self):
+        return self.request.build_absolute_uri if self.request is not None else None
+
+    def _reader(self, name, field, prefix):
+        if isinstance(field, ResponsiveImageField):
+            image_field = VARIANTS[field.variant][0]
+            source, variants = prefix + image_field, prefix + 'image_variants'
+            storage = self.model._meta.get_field(image_field).storage
+            build_url, variant = self._build_url(), field.variant
+
+            def read(row):
+                image = responsive_image_for(
+                    row[source], row[variants], variant, storage, build_url
+                )
+                return image._asdict() if image else None
+            return [source, variants], read
+
+        source = prefix + field.source.replace('.', '__')
+        if isinstance(field, serializers.FileField):
+            storage = self.model._meta.get_field(field.source).storage
+            build_url = self._build_url()
+
+            def read(row):
+                if not row[source]:
+                    return None
+                url = storage.url(row[source])
+                return build_url(url) if build_url else url
+            return [source], read
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return [source], lambda row: row[source]
+        if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField,
+                              serializers.SerializerMethodField, serializers.BaseSerializer)):
+            raise ImproperlyConfigured(
+                f'{self.model.__name__} projection needs a computed reader for "{name}".'
+            )
+
+        to_representation = field.to_representation
+
+        def read(row):
+            value = row[source]
+            return None if value is None else to_representation(value)
+        return [source], read
+
+
+def course_list_projection(serializer, prefix=''):
+    """Projection of CourseListSerializer"""
+    return Projection(serializer, prefix=prefix, computed={
+        # StringRelatedField: str(user) is the username, str(category) the name
+        'instructor': column('instructor__username'),
+        'category': column('category__name'),
+    })
+
+
+def lesson_list_projection(serializer, prefix=''):
+    """Projection of LessonListSerializer"""
+    return Projection(serializer, prefix=prefix)
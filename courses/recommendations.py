@@ -0,0 +1,128 @@
+"""
+"Students also took" recommendations from co-enrollment.
+
+`build_recommendations` streams enrollments ordered by student, turns each
+block of students into a sparse student x course matrix X and accumulates
+X.T @ X, the course x course co-enrollment counts. Only one block and the
+(sparse) co-enrollment matrix are held in memory, so the job scales with
+the number of course pairs rather than the number of enrollments.
+
+Pairs are scored with cosine similarity, common / sqrt(n_a * n_b), and the
+top N neighbors of each course are stored in CourseRecommendation, which
+read paths query by its (course, rank) index.
+"""
+from django.db import transaction
+
+from .models import Course, CourseRecommendation
+
+DEFAULT_TOP_N = 10
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def _student_blocks(chunk_size):
+    """Yield (student_ids, course_ids) blocks that never split a student"""
+    from enrollments.models import Enrollment
+
+    rows = (
+        Enrollment.objects.order_by('student_id', 'course_id')
+        .values_list('student_id', 'course_id')
+        .iterator(chunk_size=min(chunk_size, 10000))
+    )
+    students, courses = [], []
+    for student_id, course_id in rows:
+        if len(students) >= chunk_size and student_id != students[-1]:
+            yield students, courses
+            students, courses = [], []
+        students.append(student_id)
+        courses.append(course_id)
+    if students:
+        yield students, courses
+
+
+def co_enrollment_matrix(course_ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return the sparse course x course co-enrollment counts (CSR).
+
+    Rows and columns follow `course_ids`; the diagonal holds each course's
+    enrollment count.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    position = {course_id: index for index, course_id in enumerate(course_ids)}
+    size = len(course_ids)
+    matrix = sparse.csr_matrix((size, size), dtype=np.int64)
+
+    for students, courses in _student_blocks(chunk_size):
+        columns = np.fromiter(
+            (position.get(course_id, -1) for course_id in courses),
+            dtype=np.int64, count=len(courses),
+        )
+        _, rows = np.unique(np.asarray(students, dtype=np.int64), return_inverse=True)
+        known = columns >= 0
+        rows, columns = rows[known], columns[known]
+        block = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, columns)),
+            shape=(int(rows.max()) + 1 if len(rows) else 0, size),
+        )
+        matrix = matrix + (block.T @ block).tocsr()
+    return matrix
+
+
+def top_neighbors(matrix, top_n=DEFAULT_TOP_N, min_common=1):
+    """Yield (row, [(column, score), ...]) with the best cosine neighbors"""
+    import numpy as np
+
+    totals = matrix.diagonal().astype(np.float64)
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        columns = matrix.indices[start:end]
+        common = matrix.data[start:end]
+        keep = (columns != row) & (common >= min_common)
+        columns, common = columns[keep], common[keep]
+        if not len(columns):
+            continue
+        scores = common / np.sqrt(totals[row] * totals[columns])
+        if len(scores) > top_n:
+            best = np.argpartition(-scores, top_n - 1)[:top_n]
+            columns, common, scores = columns[best], common[best], scores[best]
+        # Best first; ties go to the course with more shared students
+        order = np.lexsort((-common, -scores))
+        yield row, [(int(columns[i]), float(scores[i])) for i in order]
+
+
+def build_recommendations(top_n=DEFAULT_TOP_N, chunk_size=DEFAULT_CHUNK_SIZE,
+                          min_common=1, batch_size=1000):
+    """Rebuild every course's neighbor list; returns the number of rows stored"""
+    course_ids = list(Course.objects.order_by('pk').values_list('pk', flat=True))
+    matrix = co_enrollment_matrix(course_ids, chunk_size=chunk_size)
+
+    stored = 0
+    batch = []
+    with transaction.atomic():
+        CourseRecommendation.objects.all().delete()
+        for row, neighbors in top_neighbors(matrix, top_n, min_common):
+            batch.extend(
+                CourseRecommendation(
+                    course_id=course_ids[row],
+                    recommended_id=course_ids[column],
+                    rank=rank,
+                    score=score,
+                )
+                for rank, (column, score) in enumerate(neighbors, start=1)
+            )
+            if len(batch) >= batch_size:
+                CourseRecommendation.objects.bulk_create(batch)
+                stored += len(batch)
+                batch = []
+        CourseRecommendation.objects.bulk_create(batch)
+    return stored + len(batch)
+
+
+def students_also_took(course, limit=DEFAULT_TOP_N):
+    """Published neighbors of a course, best first, in a single query"""
+    return (
+        Course.objects.filter(recommended_for__course=course, status='published')
+        .select_related('instructor', 'category')
+        .order_by('recommended_for__rank')[:limit]
+    )
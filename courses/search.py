@@ -0,0 +1,186 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+
+# Weighted search document: title > short description > description >
+# category and instructor names.
+SEARCH_CONFIG = "english"
+FTS_TABLE = "courses_course_fts"
+FTS_COLUMN_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+POSTGRES_UPDATE_SQL = f"""
+    UPDATE courses_course SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(courses_course.title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(courses_course.short_description, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(courses_course.description, '')), 'C') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', concat_ws(' ',
+            (SELECT name FROM courses_category WHERE id = courses_course.category_id),
+            (SELECT concat_ws(' ', first_name, last_name, username)
+             FROM users_user WHERE id = courses_course.instructor_id)
+        )), 'D')
+"""
+
+SQLITE_INSERT_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, short_description, description, taxonomy)
+    SELECT c.id, c.title, c.short_description, c.description,
+           trim(coalesce(cat.name, '') || ' ' || u.first_name || ' ' ||
+                u.last_name || ' ' || u.username)
+    FROM courses_course c
+    JOIN users_user u ON u.id = c.instructor_id
+    LEFT JOIN courses_category cat ON cat.id = c.category_id
+"""
+
+
+def tokenize(query):
+    """Split a user query into plain word tokens, dropping any operators"""
+    return TOKEN_RE.findall(query.lower())
+
+
+class SearchBackend:
+    """
+    Keeps the per-course search document in sync and runs ranked queries.
+
+    `search` returns the given queryset filtered to matching courses,
+    annotated with `search_rank` (higher is better) and ordered by it.
+    """
+
+    def index(self, course_ids):
+        raise NotImplementedError
+
+    def remove(self, course_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def _chunks(self, course_ids, size=500):
+        course_ids = list(course_ids)
+        for start in range(0, len(course_ids), size):
+            yield course_ids[start:start + size]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector column with a GIN index, ranked with ts_rank"""
+
+    def index(self, course_ids):
+        with connection.cursor() as cursor:
+            for chunk in self._chunks(course_ids):
+                cursor.execute(f"{POSTGRES_UPDATE_SQL} WHERE id = ANY(%s)", [chunk])
+
+    def remove(self, course_ids):
+        # The document lives on the course row and goes away with it.
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_UPDATE_SQL)
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        # Prefix match every token so partial words match while typing.
+        search_query = SearchQuery(
+            " & ".join(f"{token}:*" for token in tokens),
+            config=SEARCH_CONFIG,
+            search_type="raw",
+        )
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(search_rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-search_rank", "-created_at")
+        )
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 virtual table keyed by course id, ranked with bm25"""
+
+    def index(self, course_ids):
+        with connection.cursor() as cursor:
+            for chunk in self._chunks(course_ids):
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk
+                )
+                cursor.execute(
+                    f"{SQLITE_INSERT_SQL} WHERE c.id IN ({placeholders})", chunk
+                )
+
+    def remove(self, course_ids):
+        with connection.cursor() as cursor:
+            for chunk in self._chunks(course_ids):
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk
+                )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(SQLITE_INSERT_SQL)
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        match = " ".join(f'"{token}"*' for token in tokens)
+        weights = ", ".join(str(weight) for weight in FTS_COLUMN_WEIGHTS)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f"{FTS_TABLE}.rowid = courses_course.id",
+                f"{FTS_TABLE} MATCH %s",
+            ],
+            params=[match],
+            select={"search_rank": f"-bm25({FTS_TABLE}, {weights})"},
+        ).order_by("-search_rank", "-created_at")
+
+
+class SubstringSearchBackend(SearchBackend):
+    """Unranked icontains fallback for databases without full-text support"""
+
+    def index(self, course_ids):
+        pass
+
+    def remove(self, course_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        for token in tokens:
+            queryset = queryset.filter(
+                Q(title__icontains=token)
+                | Q(short_description__icontains=token)
+                | Q(description__icontains=token)
+                | Q(category__name__icontains=token)
+            )
+        return queryset.annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        ).order_by("-created_at")
+
+
+BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+def get_search_backend():
+    return BACKENDS.get(connection.vendor, SubstringSearchBackend)()
+
+
+def rank_courses(queryset, query):
+    """Rank `queryset` against a free-text query using the active backend"""
+    return get_search_backend().search(queryset, query)
@@ -1,30 +1,122 @@
+from django.urls import reverse
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from .images import responsive_image
 from .models import Category, Course, Module, Lesson, Content
 
 
-class CategorySerializer(serializers.ModelSerializer):
+def parse_shape(value):
+    """
+    Turn 'id,modules.title,modules.lessons' (or a list of such paths) into
+    a tree: {'id': {}, 'modules': {'title': {}, 'lessons': {}}}.
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+    tree = {}
+    for path in value or ():
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def requested_shape(request):
+    """
+    The (fields, expand) trees asked for with ?fields= and ?expand=.
+
+    `fields` is None when the client did not restrict the fields. Only
+    read requests are shaped.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, {}
+    fields = request.query_params.get('fields')
+    return (
+        parse_shape(fields) if fields else None,
+        parse_shape(request.query_params.get('expand', '')),
+    )
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets and explicit expansion for model serializers.
+
+    Fields named in Meta.expandable_fields are left out unless expanded,
+    and when a field list is given every other field is dropped, so
+    neither is ever evaluated. The top-level serializer reads ?fields= and
+    ?expand= (dotted paths reach nested serializers); `fields` and
+    `expand` keyword arguments set the shape explicitly.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self._shape = (
+            parse_shape(fields) if fields is not None else None,
+            parse_shape(expand) if expand is not None else None,
+        )
+        super().__init__(*args, **kwargs)
+
+    def _is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self._shape
+        if self._is_top_level():
+            requested_fields, requested_expand = requested_shape(self.context.get('request'))
+            only = requested_fields if only is None else only
+            expand = requested_expand if expand is None else expand
+        expand = expand or {}
+
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name not in expand:
+                fields.pop(name, None)
+        if only:
+            for name in list(fields):
+                if name not in only:
+                    fields.pop(name)
+
+        for name, field in fields.items():
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, DynamicFieldsMixin):
+                nested._shape = ((only or {}).get(name) or None, expand.get(name, {}))
+        return fields
+
+
+class CategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Category model"""
-    courses_count = serializers.SerializerMethodField()
+    courses_count = serializers.IntegerField(source='published_courses_count', read_only=True)
     
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description', 'icon', 'courses_count', 'created_at']
         read_only_fields = ['id', 'created_at']
-    
-    def get_courses_count(self, obj):
-        return obj.courses.filter(status='published').count()
 
 
-class ContentSerializer(serializers.ModelSerializer):
+class ContentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Content model"""
+    # Files are only delivered through the entitlement-checked download
+    # action; their media URLs are not served, so `file` is upload-only.
+    download_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = Content
         fields = ['id', 'content_type', 'video_url', 'text_content', 
-                  'file', 'external_link', 'created_at', 'updated_at']
+                  'file', 'download_url', 'external_link', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        extra_kwargs = {'file': {'write_only': True}}
+    
+    def get_download_url(self, obj):
+        if not obj.file:
+            return None
+        url = reverse('content-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Lesson model"""
     content = ContentSerializer(read_only=True)
     
@@ -34,9 +126,10 @@ class LessonSerializer(serializers.ModelSerializer):
                   'order', 'duration_minutes', 'is_free_preview', 
                   'content', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = ['content']
 
 
-class LessonListSerializer(serializers.ModelSerializer):
+class LessonListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Simplified serializer for listing lessons"""
     class Meta:
         model = Lesson
@@ -44,7 +137,7 @@ class LessonListSerializer(serializers.ModelSerializer):
                   'is_free_preview']
 
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Module model"""
     lessons = LessonSerializer(many=True, read_only=True)
     lessons_count = serializers.SerializerMethodField()
@@ -54,12 +147,16 @@ class ModuleSerializer(serializers.ModelSerializer):
         fields = ['id', 'course', 'title', 'description', 'order', 
                   'lessons', 'lessons_count', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = ['lessons']
     
     def get_lessons_count(self, obj):
+        # Annotated by the viewsets; otherwise one query per module
+        if hasattr(obj, 'lessons_total'):
+            return obj.lessons_total
         return obj.lessons.count()
 
 
-class ModuleListSerializer(serializers.ModelSerializer):
+class ModuleListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Simplified serializer for listing modules"""
     lessons_count = serializers.SerializerMethodField()
     
@@ -68,36 +165,49 @@ class ModuleListSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'order', 'lessons_count']
     
     def get_lessons_count(self, obj):
+        if hasattr(obj, 'lessons_total'):
+            return obj.lessons_total
         return obj.lessons.count()
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class ResponsiveImageField(serializers.Field):
+    """Read-only src/srcset/webp_srcset/sizes of a course image variant"""
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, course):
+        request = self.context.get('request')
+        image = responsive_image(
+            course, self.variant, build_url=request.build_absolute_uri if request else None
+        )
+        return image._asdict() if image else None
+
+
+class CourseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Course model"""
     instructor = serializers.StringRelatedField(read_only=True)
     instructor_id = serializers.IntegerField(write_only=True, required=False)
     category = CategorySerializer(read_only=True)
     category_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     modules = ModuleSerializer(many=True, read_only=True)
-    modules_count = serializers.SerializerMethodField()
-    total_lessons = serializers.SerializerMethodField()
-    enrollments_count = serializers.SerializerMethodField()
+    modules_count = serializers.IntegerField(read_only=True)
+    total_lessons = serializers.IntegerField(source='lessons_count', read_only=True)
+    enrollments_count = serializers.IntegerField(read_only=True)
+    card_image = ResponsiveImageField('card')
+    hero_image = ResponsiveImageField('hero')
     
     class Meta:
         model = Course
         fields = ['id', 'title', 'slug', 'short_description', 'description', 'instructor', 
                   'instructor_id', 'category', 'category_id', 'thumbnail', 'background_image', 
-                  'price', 'level', 'duration_hours', 'status', 'featured', 'modules', 
-                  'modules_count', 'total_lessons', 'enrollments_count', 'created_at', 'updated_at']
+                  'card_image', 'hero_image', 'price', 'level', 'duration_hours', 'status', 
+                  'featured', 'modules', 'modules_count', 'total_lessons', 'enrollments_count', 
+                  'created_at', 'updated_at']
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
-    
-    def get_modules_count(self, obj):
-        return obj.modules.count()
-    
-    def get_total_lessons(self, obj):
-        return Lesson.objects.filter(module__course=obj).count()
-    
-    def get_enrollments_count(self, obj):
-        return obj.enrollments.count()
+        expandable_fields = ['modules']
     
     def create(self, validated_data):
         instructor_id = validated_data.pop('instructor_id', None)
@@ -116,23 +226,45 @@ class CourseSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class CourseListSerializer(serializers.ModelSerializer):
+class CourseListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Simplified serializer for listing courses"""
     instructor = serializers.StringRelatedField(read_only=True)
     category = serializers.StringRelatedField(read_only=True)
-    modules_count = serializers.SerializerMethodField()
-    enrollments_count = serializers.SerializerMethodField()
+    modules_count = serializers.IntegerField(read_only=True)
+    enrollments_count = serializers.IntegerField(read_only=True)
+    card_image = ResponsiveImageField('card')
     
     class Meta:
         model = Course
         fields = ['id', 'title', 'slug', 'short_description', 'description', 'instructor', 
-                  'category', 'thumbnail', 'background_image', 'price', 'level', 
+                  'category', 'thumbnail', 'background_image', 'card_image', 'price', 'level', 
                   'duration_hours', 'status', 'featured', 'modules_count', 
                   'enrollments_count', 'created_at']
+
+
+
+class CourseOutlineSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Full module/lesson/content tree of a course, read from prefetched rows"""
+    modules = ModuleSerializer(many=True, read_only=True)
+    total_lessons = serializers.IntegerField(source='lessons_count', read_only=True)
     
-    def get_modules_count(self, obj):
-        return obj.modules.count()
-    
-    def get_enrollments_count(self, obj):
-        return obj.enrollments.count()
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'slug', 'modules_count', 'total_lessons',
+                  'total_lesson_minutes', 'modules', 'updated_at']
+        read_only_fields = fields
 
+
+class ReorderSerializer(serializers.Serializer):
+    """
+    Either a complete new `order` (list of child ids), or a single `move`
+    of one child to just after `after` (null moves it first).
+    """
+    order = serializers.ListField(child=serializers.IntegerField(), required=False)
+    move = serializers.IntegerField(required=False)
+    after = serializers.IntegerField(required=False, allow_null=True)
+    
+    def validate(self, attrs):
+        if ('order' in attrs) == ('move' in attrs):
+            raise serializers.ValidationError('Send either "order" or "move".')
+        return attrs
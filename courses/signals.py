@@ -0,0 +1,292 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from . import autocomplete, categories, images, snapshots, trending
+from .cache import bump_catalog_version
+from .counters import adjust_category_counts, adjust_course_counters, rebuild_course_counters
+from .models import Category, Content, Course, Module, Lesson
+from .search import get_search_backend
+
+SEARCH_DOCUMENT_FIELDS = ['title', 'short_description', 'description', 'category', 'instructor']
+
+
+def _tracked_fields_changed(update_fields, fields):
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+@receiver(pre_save, sender=Module)
+def remember_module_course(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored course so a move between courses can be counted"""
+    instance._counter_course_id = None
+    if instance.pk and _tracked_fields_changed(update_fields, ['course']):
+        instance._counter_course_id = Module.objects.filter(
+            pk=instance.pk
+        ).values_list('course_id', flat=True).first()
+
+
+@receiver(post_save, sender=Module)
+def count_saved_module(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        adjust_course_counters(Course.objects.filter(pk=instance.course_id), modules_count=1)
+        return
+
+    old_course_id = getattr(instance, '_counter_course_id', None)
+    if old_course_id and old_course_id != instance.course_id:
+        rebuild_course_counters(
+            Course.objects.filter(pk__in=[old_course_id, instance.course_id])
+        )
+
+
+@receiver(post_delete, sender=Module)
+def count_deleted_module(sender, instance, **kwargs):
+    adjust_course_counters(Course.objects.filter(pk=instance.course_id), modules_count=-1)
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_totals(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored module and duration so edits can be applied as deltas"""
+    instance._counter_origin = None
+    if instance.pk and _tracked_fields_changed(update_fields, ['module', 'duration_minutes']):
+        instance._counter_origin = Lesson.objects.filter(
+            pk=instance.pk
+        ).values('module_id', 'duration_minutes').first()
+
+
+@receiver(post_save, sender=Lesson)
+def count_saved_lesson(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    course = Course.objects.filter(modules=instance.module_id)
+    if created:
+        adjust_course_counters(
+            course, lessons_count=1, total_lesson_minutes=instance.duration_minutes
+        )
+        return
+
+    origin = getattr(instance, '_counter_origin', None)
+    if not origin:
+        return
+    module_courses = dict(
+        Module.objects.filter(
+            pk__in=[origin['module_id'], instance.module_id]
+        ).values_list('pk', 'course_id')
+    )
+    old_course_id = module_courses.get(origin['module_id'])
+    new_course_id = module_courses.get(instance.module_id)
+    if old_course_id == new_course_id:
+        adjust_course_counters(
+            course,
+            total_lesson_minutes=instance.duration_minutes - origin['duration_minutes'],
+        )
+        return
+    adjust_course_counters(
+        Course.objects.filter(pk=old_course_id),
+        lessons_count=-1,
+        total_lesson_minutes=-origin['duration_minutes'],
+    )
+    adjust_course_counters(
+        Course.objects.filter(pk=new_course_id),
+        lessons_count=1,
+        total_lesson_minutes=instance.duration_minutes,
+    )
+
+
+@receiver(post_delete, sender=Lesson)
+def count_deleted_lesson(sender, instance, **kwargs):
+    adjust_course_counters(
+        Course.objects.filter(modules=instance.module_id),
+        lessons_count=-1,
+        total_lesson_minutes=-instance.duration_minutes,
+    )
+
+
+@receiver(post_save, sender='enrollments.Enrollment')
+def count_saved_enrollment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_course_counters(Course.objects.filter(pk=instance.course_id), enrollments_count=1)
+        trending.record_enrollment(instance.course_id, instance.enrolled_at)
+
+
+@receiver(post_delete, sender='enrollments.Enrollment')
+def count_deleted_enrollment(sender, instance, **kwargs):
+    adjust_course_counters(Course.objects.filter(pk=instance.course_id), enrollments_count=-1)
+    trending.record_enrollment(instance.course_id, instance.enrolled_at, delta=-1)
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_listing(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored status and category so count changes can be applied"""
+    instance._listing_origin = None
+    if instance.pk and _tracked_fields_changed(update_fields, ['status', 'category']):
+        instance._listing_origin = Course.objects.filter(
+            pk=instance.pk
+        ).values('status', 'category_id').first()
+
+
+@receiver(post_save, sender=Course)
+def count_saved_course(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    origin = getattr(instance, '_listing_origin', None)
+    if created:
+        origin = {'status': None, 'category_id': None}
+    elif not origin:
+        return
+    was_listed = origin['status'] == 'published' and origin['category_id']
+    is_listed = instance.status == 'published' and instance.category_id
+    if was_listed and is_listed and origin['category_id'] == instance.category_id:
+        return
+    if not was_listed and not is_listed:
+        return
+    if was_listed:
+        adjust_category_counts(origin['category_id'], -1)
+    if is_listed:
+        adjust_category_counts(instance.category_id, 1)
+    categories.invalidate()
+
+
+@receiver(post_delete, sender=Course)
+def count_deleted_course(sender, instance, **kwargs):
+    if instance.status == 'published' and instance.category_id:
+        adjust_category_counts(instance.category_id, -1)
+        categories.invalidate()
+
+
+@receiver(post_save, sender=Course)
+def queue_image_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not _tracked_fields_changed(update_fields, images.IMAGE_FIELDS):
+        return
+    if images.needs_variants(instance):
+        images.queue_variants([instance.pk])
+
+
+@receiver(post_delete, sender=Course)
+def delete_image_variants(sender, instance, **kwargs):
+    if instance.image_variants:
+        course_id = instance.pk
+        transaction.on_commit(lambda: images.delete_variants(course_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_directory(sender, raw=False, **kwargs):
+    if not raw:
+        categories.invalidate()
+
+
+@receiver(post_save, sender=Course)
+def index_saved_course(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and _tracked_fields_changed(update_fields, SEARCH_DOCUMENT_FIELDS):
+        get_search_backend().index([instance.pk])
+
+
+@receiver(post_delete, sender=Course)
+def unindex_deleted_course(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_courses(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    course_ids = list(instance.courses.values_list('pk', flat=True))
+    if course_ids:
+        get_search_backend().index(course_ids)
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_courses(sender, instance, **kwargs):
+    instance._search_course_ids = list(instance.courses.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def reindex_uncategorized_courses(sender, instance, **kwargs):
+    course_ids = getattr(instance, '_search_course_ids', None)
+    if course_ids:
+        get_search_backend().index(course_ids)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindex_instructor_courses(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created or raw:
+        return
+    if not _tracked_fields_changed(update_fields, ['first_name', 'last_name', 'username']):
+        return
+    course_ids = list(Course.objects.filter(instructor=instance).values_list('pk', flat=True))
+    if course_ids:
+        get_search_backend().index(course_ids)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_autocomplete(sender, raw=False, **kwargs):
+    if not raw:
+        autocomplete.invalidate()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_autocomplete_for_instructor(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created or raw or instance.user_type != 'instructor':
+        return
+    if _tracked_fields_changed(update_fields, ['first_name', 'last_name', 'username']):
+        autocomplete.invalidate()
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender='enrollments.Enrollment')
+def refresh_catalog_version(sender, raw=False, **kwargs):
+    if not raw:
+        bump_catalog_version()
+
+
+@receiver(post_save, sender='enrollments.Enrollment')
+def refresh_catalog_version_for_enrollment(sender, created, raw=False, **kwargs):
+    # Progress updates re-save enrollments constantly; only new ones matter
+    if created and not raw:
+        bump_catalog_version()
+
+
+def _module_course_ids(module_ids):
+    return Module.objects.filter(pk__in=module_ids).values_list('course_id', flat=True)
+
+
+@receiver(post_save, sender=Course)
+def refresh_course_snapshot(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        snapshots.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def refresh_module_snapshot(sender, instance, raw=False, **kwargs):
+    if not raw:
+        snapshots.invalidate([instance.course_id, getattr(instance, '_counter_course_id', None)])
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def refresh_lesson_snapshot(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    module_ids = [instance.module_id]
+    origin = getattr(instance, '_counter_origin', None)
+    if origin:
+        module_ids.append(origin['module_id'])
+    snapshots.invalidate(_module_course_ids(module_ids))
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def refresh_content_snapshot(sender, instance, raw=False, **kwargs):
+    if not raw:
+        snapshots.invalidate(
+            Module.objects.filter(lessons=instance.lesson_id).values_list('course_id', flat=True)
+        )
@@ -0,0 +1,124 @@
+"""
+Precompiled curriculum snapshots.
+
+The outline of a course (modules, lessons and content) is serialized once
+per curriculum version and stored as JSON text, so read paths hand out
+the stored bytes instead of loading and serializing the tree. Edits bump
+`Course.curriculum_version` and queue a rebuild on a small thread pool
+once the transaction commits; a reader that finds no current snapshot
+builds it inline.
+"""
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Prefetch
+from Core.renderers import ORJSONRenderer
+from .models import Course, CurriculumSnapshot, Lesson
+
+logger = logging.getLogger(__name__)
+
+Snapshot = namedtuple('Snapshot', ['payload', 'etag'])
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def render_snapshot(course):
+    """Serialize the outline of `course` to JSON text"""
+    from .serializers import CourseOutlineSerializer
+
+    serializer = CourseOutlineSerializer(course, expand='modules.lessons.content')
+    return ORJSONRenderer().render(serializer.data).decode()
+
+
+def build_snapshot(course_id):
+    """Rebuild and store the snapshot of one course; None if it is gone"""
+    course = (
+        Course.objects.filter(pk=course_id)
+        .prefetch_related(
+            'modules',
+            Prefetch('modules__lessons', queryset=Lesson.objects.select_related('content')),
+        )
+        .first()
+    )
+    if course is None:
+        return None
+
+    payload = render_snapshot(course)
+    snapshot = Snapshot(payload, '"%s"' % hashlib.sha1(payload.encode()).hexdigest())
+    fields = {
+        'version': course.curriculum_version,
+        'payload': snapshot.payload,
+        'etag': snapshot.etag,
+    }
+    # A slower build of an older version must not overwrite a newer one.
+    updated = CurriculumSnapshot.objects.filter(
+        course_id=course_id, version__lte=course.curriculum_version
+    ).update(**fields)
+    if not updated:
+        try:
+            with transaction.atomic():
+                CurriculumSnapshot.objects.create(course_id=course_id, **fields)
+        except IntegrityError:
+            pass
+    return snapshot
+
+
+def get_snapshot(course_id):
+    """Return the current Snapshot of a course, building it if needed"""
+    row = CurriculumSnapshot.objects.filter(
+        course_id=course_id, version=F('course__curriculum_version')
+    ).values_list('payload', 'etag').first()
+    if row is not None:
+        return Snapshot(*row)
+    return build_snapshot(course_id)
+
+
+def invalidate(course_ids):
+    """Bump the curriculum version of the given courses and queue rebuilds"""
+    course_ids = {course_id for course_id in course_ids if course_id}
+    if not course_ids:
+        return
+    Course.objects.filter(pk__in=course_ids).update(
+        curriculum_version=F('curriculum_version') + 1
+    )
+    transaction.on_commit(lambda: schedule_rebuild(course_ids))
+
+
+def schedule_rebuild(course_ids):
+    """Rebuild snapshots in the background, coalescing repeated requests"""
+    global _executor
+    if not settings.CURRICULUM_SNAPSHOT_WORKERS:
+        return
+    with _lock:
+        course_ids = set(course_ids) - _pending
+        if not course_ids:
+            return
+        _pending.update(course_ids)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CURRICULUM_SNAPSHOT_WORKERS,
+                thread_name_prefix='curriculum-snapshot',
+            )
+    for course_id in course_ids:
+        _executor.submit(_rebuild_in_background, course_id)
+
+
+def _rebuild_in_background(course_id):
+    with _lock:
+        # Changes made from here on queue a fresh build.
+        _pending.discard(course_id)
+    try:
+        build_snapshot(course_id)
+    except Exception:
+        # Readers rebuild stale snapshots inline, so a failure here only
+        # costs the next reader some latency.
+        logger.exception("Could not rebuild curriculum snapshot for course %s", course_id)
+    finally:
+        connection.close()
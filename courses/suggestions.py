@@ -0,0 +1,112 @@
+"""
+Cached HTML fragments for the header search box.
+
+The box asks for suggestions on every keystroke and popular prefixes
+repeat constantly, so the rendered fragment is cached per normalized
+query: first in a bounded per-process LRU, then in the shared cache.
+Keys carry the catalog version and the version of the autocomplete index
+that answered, so any catalog change makes old fragments unreachable and
+a worker still on an older index never stores under a newer key; entries also expire after
+SEARCH_SUGGESTION_CACHE_TIMEOUT. Fragments do not depend on the user.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from . import autocomplete
+from .cache import CATALOG_VERSION_KEY, get_version
+from .models import Course
+from .search import rank_courses
+
+MIN_QUERY_LENGTH = 2
+LIMIT = 8
+TEMPLATE = 'courses/partials/search_suggestions.html'
+
+_lock = threading.Lock()
+_fragments = OrderedDict()  # key: (expires at, html), least recently used first
+_counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query; equal forms get the same results"""
+    return ' '.join((query or '').lower().split())
+
+
+def find_courses(query, index=None):
+    # Titles, categories and instructors are answered from the in-memory
+    # index; only fall back to the database for description-only matches.
+    index = index or autocomplete.get_index()
+    courses = index.suggest(query, limit=LIMIT)
+    if not courses:
+        courses = list(rank_courses(Course.objects.filter(status='published'), query)[:LIMIT])
+    return courses
+
+
+def render_suggestions(query, index=None):
+    return render_to_string(TEMPLATE, {'courses': find_courses(query, index)})
+
+
+def _cache_key(query, index):
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return f'courses:suggestions:{get_version(CATALOG_VERSION_KEY)}:{index.version}:{digest}'
+
+
+def get_suggestions(query):
+    """Rendered suggestion fragment for `query` ('' for queries that are too short)"""
+    query = normalize_query(query)
+    if len(query) < MIN_QUERY_LENGTH:
+        return ''
+
+    index = autocomplete.get_index()
+    key = _cache_key(query, index)
+    now = time.monotonic()
+    with _lock:
+        entry = _fragments.get(key)
+        if entry is not None and entry[0] > now:
+            _fragments.move_to_end(key)
+            _counters['local_hits'] += 1
+            return entry[1]
+
+    html = cache.get(key)
+    with _lock:
+        _counters['shared_hits' if html is not None else 'misses'] += 1
+    if html is None:
+        html = render_suggestions(query, index)
+        cache.set(key, html, settings.SEARCH_SUGGESTION_CACHE_TIMEOUT)
+
+    with _lock:
+        # A shared entry may be older, so this copy can outlive it by up
+        # to one timeout; both are replaced on the next catalog change.
+        _fragments[key] = (now + settings.SEARCH_SUGGESTION_CACHE_TIMEOUT, html)
+        _fragments.move_to_end(key)
+        while len(_fragments) > settings.SEARCH_SUGGESTION_LOCAL_CACHE_SIZE:
+            _fragments.popitem(last=False)
+    return html
+
+
+def stats():
+    """Hit/miss counters of this process since it started (or since reset())"""
+    with _lock:
+        counters = dict(_counters)
+        size = len(_fragments)
+    lookups = sum(counters.values())
+    hits = counters['local_hits'] + counters['shared_hits']
+    return {
+        **counters,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+        'size': size,
+        'max_size': settings.SEARCH_SUGGESTION_LOCAL_CACHE_SIZE,
+    }
+
+
+def reset():
+    """Empty this process's LRU and zero its counters"""
+    with _lock:
+        _fragments.clear()
+        for name in _counters:
+            _counters[name] = 0
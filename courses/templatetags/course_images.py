@@ -0,0 +1,23 @@
+from django import template
+
+from courses.images import responsive_image
+
+register = template.Library()
+
+
+@register.inclusion_tag('courses/partials/course_picture.html')
+def course_picture(course, variant, css_class='', loading='lazy', sizes=None):
+    """
+    Render a course image variant as <picture> with WebP and JPEG srcsets.
+
+    Usage: {% course_picture course "card" "w-full h-48 object-cover" %}
+    """
+    image = responsive_image(course, variant)
+    if image and sizes:
+        image = image._replace(sizes=sizes)
+    return {
+        'image': image,
+        'alt': course.title,
+        'css_class': css_class,
+        'loading': loading,
+    }
@@ -1,4 +1,578 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+import msgpack
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.forms import inlineformset_factory
+from django.test import TestCase, override_settings
+from rest_framework import mixins
+from rest_framework.test import APIClient, APIRequestFactory
 
+from enrollments.models import Enrollment
+from payments.models import Payment
+from users.models import InstructorProfile, StudentProfile
+
+from . import autocomplete, categories, suggestions
+from .admin import OrderedInlineForm, save_ordered_formset
+from .cache import bump_version
+from .counters import rebuild_category_counts, rebuild_course_counters
+from .models import Category, Content, Course, CourseEnrollmentBucket, Lesson, Module
+from .ordering import ORDER_GAP, OrderingError, apply_order, move_after
+from .transfer import CourseImporter
+from .views import CourseViewSet, LessonViewSet
+
+User = get_user_model()
+
+
+class SerializedCourseViewSet(CourseViewSet):
+    """CourseViewSet listing through CourseListSerializer, as before projections"""
+    list = mixins.ListModelMixin.list
+
+
+class SerializedLessonViewSet(LessonViewSet):
+    list = mixins.ListModelMixin.list
+
+
+class ProjectedListContractTests(TestCase):
+    """The values()-based list endpoints must render exactly what the serializers render"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create(username='ada', user_type='instructor')
+        category = Category.objects.create(name='Data Science', slug='data-science')
+        cls.courses = []
+        for index in range(25):
+            cls.courses.append(Course.objects.create(
+                title=f'Course {index} – Ökonomie' if index % 3 else f'Python {index}',
+                slug=f'course-{index}',
+                description='Learn things. ' * 5,
+                short_description='Short.',
+                instructor=instructor,
+                category=category if index % 2 else None,
+                thumbnail=f'course_thumbnails/course-{index}.jpg' if index % 4 else None,
+                price=Decimal('19.99') * index,
+                level=('beginner', 'intermediate', 'advanced')[index % 3],
+                duration_hours=index,
+                status='published',
+                featured=index % 5 == 0,
+            ))
+        cls.courses[1].image_variants = {'thumbnail': {
+            'source': 'course_thumbnails/course-1.jpg',
+            'card': {
+                'webp': [[320, '/media/course_variants/1/card-320.webp']],
+                'jpg': [[320, '/media/course_variants/1/card-320.jpg']],
+            },
+        }}
+        cls.courses[1].save()
+        Course.objects.filter(pk=cls.courses[2].pk).update(trending_score=5.0)
+
+        for course in cls.courses[:2]:
+            for number in range(1, 3):
+                module = Module.objects.create(course=course, title=f'Module {number}', order=number)
+                for order in range(1, 15):
+                    Lesson.objects.create(
+                        module=module, title=f'Lesson {order}', order=order,
+                        duration_minutes=order, is_free_preview=order == 1,
+                    )
+
+    def get_both(self, viewset_class, serialized_class, path):
+        factory = APIRequestFactory()
+        responses = []
+        for view_class in (viewset_class, serialized_class):
+            view = view_class.as_view({'get': 'list'})
+            response = view(factory.get(path))
+            response.render()
+            responses.append(response)
+        return responses
+
+    def assertSameContent(self, viewset_class, serialized_class, path):
+        projected, serialized = self.get_both(viewset_class, serialized_class, path)
+        self.assertEqual(projected.status_code, 200)
+        self.assertEqual(projected.content, serialized.content, path)
+        return projected
+
+    def test_course_list_matches_serializer(self):
+        for path in (
+            '/api/courses/courses/',
+            '/api/courses/courses/?page=2',
+            '/api/courses/courses/?ordering=price',
+            '/api/courses/courses/?ordering=trending',
+            '/api/courses/courses/?search=python',
+            '/api/courses/courses/?level=advanced',
+            '/api/courses/courses/?fields=id,title,card_image,instructor',
+            '/api/courses/courses/?fields=category,thumbnail&page=1',
+        ):
+            self.assertSameContent(CourseViewSet, SerializedCourseViewSet, path)
+
+    def test_course_list_cursor_pages_match_serializer(self):
+        response = self.assertSameContent(
+            CourseViewSet, SerializedCourseViewSet, '/api/courses/courses/'
+        )
+        next_link = response.data['next']
+        self.assertIsNotNone(next_link)
+        self.assertSameContent(
+            CourseViewSet, SerializedCourseViewSet, next_link.replace('http://testserver', '')
+        )
+
+    def test_lesson_list_matches_serializer(self):
+        course = self.courses[0]
+        for path in (
+            '/api/courses/lessons/',
+            f'/api/courses/lessons/?course={course.pk}',
+            f'/api/courses/lessons/?module={course.modules.first().pk}',
+            '/api/courses/lessons/?page=2',
+            '/api/courses/lessons/?fields=id,order',
+        ):
+            self.assertSameContent(LessonViewSet, SerializedLessonViewSet, path)
+
+    def test_course_list_reads_one_query_per_page(self):
+        factory = APIRequestFactory()
+        view = CourseViewSet.as_view({'get': 'list'})
+        with self.assertNumQueries(1):
+            view(factory.get('/api/courses/courses/')).render()
+
+
+class MessagePackTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create(username='edsger', user_type='instructor')
+        cls.course = Course.objects.create(
+            title='Algorithms', slug='algorithms', description='About it.',
+            instructor=instructor, price=Decimal('12.50'), status='published',
+        )
+        Lesson.objects.create(
+            module=Module.objects.create(course=cls.course, title='Basics', order=1),
+            title='Sorting', order=1,
+        )
+
+    def test_msgpack_decodes_to_the_json_payload(self):
+        for path in ('/api/courses/courses/', f'/api/courses/courses/{self.course.pk}/'):
+            as_json = self.client.get(path).json()
+            response = self.client.get(path, HTTP_ACCEPT='application/msgpack')
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            self.assertEqual(msgpack.unpackb(response.content), as_json)
+
+    def test_outline_in_msgpack_has_its_own_etag(self):
+        path = f'/api/courses/courses/{self.course.pk}/outline/'
+        as_json = self.client.get(path)
+        response = self.client.get(path, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), as_json.json())
+        self.assertNotEqual(response['ETag'], as_json['ETag'])
+        cached = self.client.get(
+            path, HTTP_ACCEPT='application/msgpack', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(cached.status_code, 304)
+
+
+class SearchSuggestionCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create(username='alan', user_type='instructor')
+        cls.course = Course.objects.create(
+            title='Python <script>alert(1)</script>', slug='python-basics',
+            description='About it.', instructor=instructor, status='published',
+        )
+
+    def setUp(self):
+        cache.clear()
+        suggestions.reset()
+
+    def test_fragment_is_escaped(self):
+        html = self.client.get('/search/', {'q': 'python'}).content.decode()
+        self.assertIn('Python &lt;script&gt;alert(1)&lt;/script&gt;', html)
+        self.assertIn('href="/course/python-basics/"', html)
+
+    def test_normalized_queries_share_an_entry(self):
+        first = self.client.get('/search/', {'q': 'Python'}).content
+        with self.assertNumQueries(0):
+            second = self.client.get('/search/', {'q': '  python '}).content
+        self.assertEqual(first, second)
+        self.assertEqual(
+            {name: suggestions.stats()[name] for name in ('local_hits', 'shared_hits', 'misses')},
+            {'local_hits': 1, 'shared_hits': 0, 'misses': 1},
+        )
+
+    def test_shared_cache_serves_other_processes(self):
+        self.client.get('/search/', {'q': 'python'})
+        suggestions.reset()  # as if another worker answered
+        self.client.get('/search/', {'q': 'python'})
+        self.assertEqual(suggestions.stats()['shared_hits'], 1)
+
+    def test_catalog_change_replaces_fragments(self):
+        self.client.get('/search/', {'q': 'python'})
+        self.course.title = 'Python Deep Dive'
+        self.course.save()  # bumps the catalog version
+        html = self.client.get('/search/', {'q': 'python'}).content.decode()
+        self.assertIn('Python Deep Dive', html)
+        self.assertEqual(suggestions.stats()['misses'], 2)
+
+    def test_local_cache_is_bounded(self):
+        with self.settings(SEARCH_SUGGESTION_LOCAL_CACHE_SIZE=2):
+            for query in ('python', 'pyth', 'pyt'):
+                self.client.get('/search/', {'q': query})
+            self.assertEqual(suggestions.stats()['size'], 2)
+
+    def test_short_queries_render_nothing(self):
+        self.assertEqual(self.client.get('/search/', {'q': ' p '}).content, b'')
+
+
+class AutocompleteRefreshTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create(username='alan', user_type='instructor')
+        cls.course = Course.objects.create(
+            title='Python Basics', slug='python-basics', description='About it.',
+            instructor=instructor, status='published',
+        )
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch.multiple(
+            autocomplete, _index=None, _index_version=None, _built_at=None, _refresher=None
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def titles(self, query):
+        return [suggestion.title for suggestion in autocomplete.suggest(query)]
+
+    def test_searches_do_not_rebuild_while_a_refresher_runs(self):
+        self.assertEqual(self.titles('python'), ['Python Basics'])
+        self.course.title = 'Python Deep Dive'
+        self.course.save()  # bumps the autocomplete version
+        with patch.object(autocomplete, '_refresher', Mock(is_alive=Mock(return_value=True))):
+            with self.assertNumQueries(0):
+                self.assertEqual(self.titles('python'), ['Python Basics'])
+            autocomplete.refresh()  # what the refresher thread runs
+            self.assertEqual(self.titles('python'), ['Python Deep Dive'])
+
+    def test_searches_rebuild_inline_without_a_refresher(self):
+        self.titles('python')
+        self.course.title = 'Python Deep Dive'
+        self.course.save()
+        self.assertEqual(self.titles('python'), ['Python Deep Dive'])
+
+    def test_index_older_than_max_age_is_rebuilt(self):
+        index = autocomplete.refresh()
+        self.assertIs(autocomplete.refresh(), index)
+        with self.settings(AUTOCOMPLETE_INDEX_MAX_AGE=0):
+            self.assertIsNot(autocomplete.refresh(), index)
+
+
+class CategoryDirectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.create(name='Design', slug='design')
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch.multiple(
+            categories, _directory=None, _directory_version=None, _loaded_at=None
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_version_bumped_by_another_worker_reloads(self):
+        categories.get_directory()
+        with self.assertNumQueries(0):
+            categories.get_directory()
+        # Another worker's invalidate() only reaches this one through the cache
+        bump_version(categories.VERSION_CACHE_KEY)
+        Category.objects.filter(slug='design').update(name='Graphic Design')
+        with self.assertNumQueries(1):
+            self.assertEqual(categories.get_directory()[0].name, 'Graphic Design')
+
+    def test_directory_older_than_max_age_reloads(self):
+        categories.get_directory()
+        with self.settings(CATEGORY_DIRECTORY_MAX_AGE=0), self.assertNumQueries(1):
+            categories.get_directory()
+
+
+class OrderingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create(username='alan', user_type='instructor')
+        cls.course = Course.objects.create(
+            title='Python Basics', slug='python-basics', description='About it.',
+            instructor=cls.instructor,
+        )
+        cls.modules = [
+            Module.objects.create(course=cls.course, title=f'Module {index}')
+            for index in range(3)
+        ]
+        cls.lessons = [
+            Lesson.objects.create(module=cls.modules[0], title=f'Lesson {index}')
+            for index in range(3)
+        ]
+
+    def order(self, siblings):
+        return list(siblings.order_by('order', 'id').values_list('pk', flat=True))
+
+    def module_siblings(self):
+        return Module.objects.filter(course=self.course)
+
+    def test_new_rows_get_spaced_keys(self):
+        self.assertEqual(
+            list(self.module_siblings().order_by('order').values_list('order', flat=True)),
+            [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP],
+        )
+
+    def test_move_first_rewrites_one_row(self):
+        first, second, third = self.modules
+        self.assertEqual(move_after(self.module_siblings(), third.pk), 1)
+        self.assertEqual(self.order(self.module_siblings()), [third.pk, first.pk, second.pk])
+
+    def test_move_between_adjacent_keys_renumbers(self):
+        first, second, third = self.modules
+        Module.objects.filter(pk=second.pk).update(order=ORDER_GAP + 1)
+        self.assertEqual(move_after(self.module_siblings(), third.pk, after=first.pk), 3)
+        self.assertEqual(self.order(self.module_siblings()), [first.pk, third.pk, second.pk])
+        keys = sorted(self.module_siblings().values_list('order', flat=True))
+        self.assertTrue(all(later - earlier == ORDER_GAP for earlier, later in zip(keys, keys[1:])))
+
+    def test_apply_order_swaps_under_unique_constraints(self):
+        for siblings, rows in (
+            (self.module_siblings(), self.modules),
+            (Lesson.objects.filter(module=self.modules[0]), self.lessons),
+        ):
+            reversed_ids = [row.pk for row in reversed(rows)]
+            self.assertEqual(apply_order(siblings, reversed_ids), 3)
+            self.assertEqual(self.order(siblings), reversed_ids)
+
+    def test_apply_order_rejects_foreign_or_duplicate_ids(self):
+        other = Module.objects.create(
+            course=Course.objects.create(
+                title='Other', slug='other', description='About it.', instructor=self.instructor,
+            ),
+            title='Elsewhere',
+        )
+        first, second, third = (module.pk for module in self.modules)
+        for ordered_ids in ([first, second, other.pk], [first, first, second], [first, second]):
+            with self.assertRaises(OrderingError):
+                apply_order(self.module_siblings(), ordered_ids)
+        with self.assertRaises(OrderingError):
+            move_after(self.module_siblings(), first, after=other.pk)
+        self.assertEqual(self.order(self.module_siblings()), [first, second, third])
+
+    def test_reorder_is_limited_to_the_instructor_and_staff(self):
+        first, second, third = (module.pk for module in self.modules)
+        url = f'/api/courses/courses/{self.course.pk}/reorder/'
+        payload = {'order': [third, second, first]}
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='grace', user_type='student'))
+        self.assertEqual(client.post(url, payload, format='json').status_code, 403)
+        lesson_url = f'/api/courses/modules/{first}/reorder/'
+        self.assertEqual(client.post(lesson_url, {'move': self.lessons[2].pk}, format='json')
+                         .status_code, 403)
+        self.assertEqual(self.order(self.module_siblings()), [first, second, third])
+
+        client.force_authenticate(self.instructor)
+        self.assertEqual(client.post(url, payload, format='json').status_code, 200)
+        client.force_authenticate(User.objects.create(username='root', is_staff=True))
+        self.assertEqual(client.post(lesson_url, {'move': self.lessons[2].pk}, format='json')
+                         .status_code, 200)
+        self.assertEqual(self.order(self.module_siblings()), [third, second, first])
+
+    def test_admin_inline_swap_goes_through_apply_order(self):
+        first, second, third = self.modules
+        formset_class = inlineformset_factory(
+            Course, Module, form=OrderedInlineForm, fields=['title', 'order'], extra=1
+        )
+        data = {
+            'modules-TOTAL_FORMS': '4', 'modules-INITIAL_FORMS': '3',
+            'modules-MIN_NUM_FORMS': '0', 'modules-MAX_NUM_FORMS': '1000',
+            'modules-3-title': 'Module 3', 'modules-3-order': '1',
+        }
+        swapped = {first.pk: third.order, second.pk: second.order, third.pk: first.order}
+        for index, module in enumerate(self.modules):
+            data.update({
+                f'modules-{index}-id': str(module.pk),
+                f'modules-{index}-course': str(self.course.pk),
+                f'modules-{index}-title': module.title,
+                f'modules-{index}-order': str(swapped[module.pk]),
+            })
+        duplicate = formset_class({**data, 'modules-3-order': str(second.order)}, instance=self.course)
+        self.assertFalse(duplicate.is_valid())
+        formset = formset_class(data, instance=self.course)
+        self.assertTrue(formset.is_valid(), formset.errors)
+        save_ordered_formset(formset)
+        added = Module.objects.get(title='Module 3')
+        self.assertEqual(self.order(self.module_siblings()), [added.pk, third.pk, second.pk, first.pk])
+
+
+class ContentDownloadTests(TestCase):
+    BODY = b'0123456789'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
+        cls.addClassCleanup(shutil.rmtree, cls.media_root)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create(username='alan', user_type='instructor')
+        cls.course = Course.objects.create(
+            title='Python Basics', slug='python-basics', description='About it.',
+            instructor=cls.instructor, status='published',
+        )
+        module = Module.objects.create(course=cls.course, title='Setup')
+        cls.lesson = Lesson.objects.create(module=module, title='Install')
+        cls.content = Content.objects.create(lesson=cls.lesson, content_type='file')
+        cls.content.file.save('notes.txt', ContentFile(cls.BODY))
+        cls.url = f'/api/courses/contents/{cls.content.pk}/download/'
+
+    def download(self, user=None, **headers):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client.get(self.url, **headers)
+
+    def student(self, status=None):
+        student = User.objects.create(username=f'grace-{status}', user_type='student')
+        if status:
+            Enrollment.objects.create(student=student, course=self.course, status=status)
+        return student
+
+    def test_anonymous_users_must_log_in(self):
+        self.assertEqual(self.download().status_code, 401)
+
+    def test_students_must_be_enrolled(self):
+        self.assertEqual(self.download(self.student()).status_code, 403)
+        self.assertEqual(self.download(self.student('dropped')).status_code, 403)
+
+    def test_enrolled_students_instructor_and_staff_may_download(self):
+        staff = User.objects.create(username='root', is_staff=True)
+        for user in (self.student('active'), self.student('completed'), self.instructor, staff):
+            response = self.download(user)
+            self.assertEqual(response.status_code, 200, user.username)
+            self.assertEqual(b''.join(response.streaming_content), self.BODY)
+            self.assertEqual(response['Cache-Control'], 'private, max-age=3600')
+
+    def test_free_previews_are_open_to_everyone(self):
+        Lesson.objects.filter(pk=self.lesson.pk).update(is_free_preview=True)
+        self.assertEqual(self.download().status_code, 200)
+
+    def test_proxied_requests_are_handed_to_nginx(self):
+        response = self.download(self.instructor, HTTP_X_SENDFILE_TYPE='X-Accel-Redirect')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.content.file.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_range_requests(self):
+        partial = self.download(self.instructor, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(partial.streaming_content), b'2345')
+        suffix = self.download(self.instructor, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(suffix.streaming_content), b'789')
+        unsatisfiable = self.download(self.instructor, HTTP_RANGE='bytes=20-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable['Content-Range'], 'bytes */10')
+        # An invalid range is ignored rather than refused
+        invalid = self.download(self.instructor, HTTP_RANGE='bytes=5-2')
+        self.assertEqual(invalid.status_code, 200)
+        self.assertEqual(b''.join(invalid.streaming_content), b'0123456789')
+
+    def test_api_links_to_the_download_instead_of_the_file(self):
+        data = self.client.get(f'/api/courses/contents/{self.content.pk}/').json()
+        self.assertNotIn('file', data)
+        self.assertTrue(data['download_url'].endswith(self.url))
+
+
+class CourseImportTests(TestCase):
+    def test_imports_a_default_size_batch(self):
+        instructor = User.objects.create(username='alan', user_type='instructor')
+        Course.objects.create(
+            title='Topic 0', slug='topic-0', description='About it.', instructor=instructor,
+        )
+        # 700 records over 600 titles: past SQLite's expression depth limit
+        # for a single lookup query, clashing with each other and the database
+        records = [
+            {
+                'title': f'Topic {index % 600}', 'description': 'About it.',
+                'instructor': 'alan', 'category': {'slug': 'python', 'name': 'Python'},
+                'modules': [{'title': 'Setup', 'order': 1, 'lessons': [
+                    {'title': 'Install', 'order': 1, 'duration_minutes': 5,
+                     'content': {'content_type': 'text', 'text_content': 'Notes.'}},
+                ]}],
+            }
+            for index in range(700)
+        ]
+        course_ids = CourseImporter().import_batch(records)
+        self.assertEqual(len(course_ids), 700)
+        slugs = list(Course.objects.filter(pk__in=course_ids).values_list('slug', flat=True))
+        self.assertEqual(len(set(slugs)), 700)
+        self.assertNotIn('topic-0', slugs)
+        self.assertIn('topic-0-2', slugs)
+        self.assertIn('topic-99-1', slugs)
+        self.assertEqual(Content.objects.filter(lesson__module__course_id__in=course_ids).count(), 700)
+        self.assertEqual(Category.objects.get(slug='python').published_courses_count, 0)
+
+
+class GenerateLoadDataTests(TestCase):
+    def generate(self, prefix):
+        call_command(
+            'generate_load_data', users=120, courses=30, enrollments_per_user=3, seed=9,
+            prefix=prefix, password='secret', stdout=StringIO(),
+        )
+
+    def shape(self, prefix):
+        """Generated rows with the prefix stripped, to compare two loads"""
+        courses = [
+            (title, price, status, instructor.split('-')[1])
+            for title, price, status, instructor in Course.objects.filter(
+                slug__startswith=f'{prefix}-course-'
+            ).order_by('pk').values_list('title', 'price', 'status', 'instructor__username')
+        ]
+        enrollments = [
+            (student.split('-')[1], course.rsplit('-', 1)[1], percentage)
+            for student, course, percentage in Enrollment.objects.filter(
+                student__username__startswith=f'{prefix}-'
+            ).order_by('pk').values_list('student__username', 'course__slug',
+                                         'progress_percentage')
+        ]
+        return courses, enrollments
+
+    def test_generates_consistent_dataset(self):
+        self.generate('load')
+        self.assertEqual(User.objects.count(), 120)
+        self.assertEqual(InstructorProfile.objects.count(), 2)
+        self.assertEqual(StudentProfile.objects.count(), 118)
+        self.assertEqual(Lesson.objects.count(), 30 * 20)
+        self.assertEqual(Enrollment.objects.count(), 118 * 3)
+        self.assertFalse(Enrollment.objects.exclude(course__status='published').exists())
+        self.assertEqual(
+            Payment.objects.count(),
+            Enrollment.objects.filter(course__price__gt=0).count(),
+        )
+        # Counters the skipped signals maintain are already right
+        self.assertEqual(rebuild_course_counters(), 0)
+        self.assertEqual(rebuild_category_counts(), 0)
+        self.assertEqual(
+            sum(CourseEnrollmentBucket.objects.values_list('count', flat=True)), 118 * 3
+        )
+        enrolled = Course.objects.filter(enrollments__isnull=False).distinct()
+        self.assertTrue(enrolled.exists())
+        self.assertFalse(enrolled.filter(trending_score=0).exists())
+        self.assertEqual(
+            sum(Course.objects.values_list('enrollments_24h', flat=True)), 118 * 3
+        )
+        # Curriculum order keys leave room for moves
+        self.assertEqual(
+            list(Module.objects.filter(course__slug='load-course-0').values_list('order', flat=True)),
+            [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP, 4 * ORDER_GAP],
+        )
+        self.assertTrue(self.client.login(username='load-5', password='secret'))
+
+    def test_same_seed_generates_same_data(self):
+        self.generate('first')
+        self.generate('second')
+        self.assertEqual(self.shape('first'), self.shape('second'))
@@ -0,0 +1,264 @@
+"""
+Streaming JSONL export and import of whole courses.
+
+Each line holds one course with its modules, lessons and lesson content
+nested inside it. Export walks the catalog in primary-key batches with a
+fixed number of queries per batch; import parses a bounded batch of lines
+and writes it with one bulk_create per table, so memory and transaction
+size stay flat however large the file is.
+"""
+import json
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils.text import slugify
+
+from . import autocomplete, categories
+from .cache import bump_catalog_version
+from .counters import rebuild_category_counts
+from .models import Category, Content, Course, Lesson, Module
+from .search import get_search_backend
+
+COURSE_FIELDS = [
+    'title', 'slug', 'short_description', 'description', 'thumbnail',
+    'background_image', 'price', 'level', 'duration_hours', 'status', 'featured',
+]
+MODULE_FIELDS = ['title', 'description', 'order']
+LESSON_FIELDS = [
+    'title', 'description', 'lesson_type', 'order', 'duration_minutes', 'is_free_preview',
+]
+CONTENT_FIELDS = ['content_type', 'video_url', 'text_content', 'file', 'external_link']
+
+SLUG_MAX_LENGTH = Course._meta.get_field('slug').max_length
+# Distinct slug bases looked up per query; each adds two OR terms, and
+# SQLite rejects expression trees deeper than 1000
+SLUG_LOOKUP_CHUNK = 100
+
+
+class RecordError(ValueError):
+    """A JSONL record that cannot be imported"""
+
+
+def _fields(obj, names):
+    record = {}
+    for name in names:
+        value = getattr(obj, name)
+        if hasattr(value, 'field'):  # File and image fields export their stored name
+            value = value.name or None
+        record[name] = value
+    return record
+
+
+def export_records(queryset=None, batch_size=500):
+    """Yield one nested dict per course, in primary-key order"""
+    if queryset is None:
+        queryset = Course.objects.all()
+    queryset = (
+        queryset.select_related('instructor', 'category')
+        .prefetch_related(
+            Prefetch('modules', queryset=Module.objects.order_by('order', 'id')),
+            Prefetch(
+                'modules__lessons',
+                queryset=Lesson.objects.select_related('content').order_by('order', 'id'),
+            ),
+        )
+        .order_by('pk')
+    )
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        for course in batch:
+            yield _course_record(course)
+        last_pk = batch[-1].pk
+
+
+def _course_record(course):
+    record = _fields(course, COURSE_FIELDS)
+    record['instructor'] = course.instructor.username
+    record['category'] = (
+        {'slug': course.category.slug, 'name': course.category.name}
+        if course.category else None
+    )
+    record['modules'] = []
+    for module in course.modules.all():
+        module_record = _fields(module, MODULE_FIELDS)
+        module_record['lessons'] = []
+        for lesson in module.lessons.all():
+            lesson_record = _fields(lesson, LESSON_FIELDS)
+            content = getattr(lesson, 'content', None)
+            lesson_record['content'] = _fields(content, CONTENT_FIELDS) if content else None
+            module_record['lessons'].append(lesson_record)
+        record['modules'].append(module_record)
+    return record
+
+
+def dump_record(record):
+    return json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def count_rows(record):
+    """Number of database rows a course record stands for"""
+    rows = 1
+    for module in record.get('modules') or []:
+        rows += 1
+        for lesson in module.get('lessons') or []:
+            rows += 1 + bool(lesson.get('content'))
+    return rows
+
+
+class CourseImporter:
+    """
+    Writes batches of course records with one bulk_create per table.
+
+    Instructors are matched by username (falling back to
+    `default_instructor`), categories by slug (missing ones are created),
+    and course slugs are made unique against the database and the batch
+    itself with one query per SLUG_LOOKUP_CHUNK distinct slugs.
+    """
+
+    def __init__(self, default_instructor=None):
+        self.default_instructor = default_instructor
+        self.category_ids = {}
+        self.instructor_ids = {}
+
+    def import_batch(self, records):
+        """Import a list of course records; returns the created course ids"""
+        with transaction.atomic():
+            self._resolve_instructors(records)
+            self._resolve_categories(records)
+            slugs = self._unique_slugs(records)
+
+            courses = [
+                self._build_course(record, slug) for record, slug in zip(records, slugs)
+            ]
+            Course.objects.bulk_create(courses)
+
+            modules, module_records = [], []
+            for course, record in zip(courses, records):
+                for module_record in record.get('modules') or []:
+                    modules.append(Module(
+                        course_id=course.pk,
+                        **self._pick(module_record, MODULE_FIELDS),
+                    ))
+                    module_records.append(module_record)
+            Module.objects.bulk_create(modules)
+
+            lessons, contents = [], []
+            for module, module_record in zip(modules, module_records):
+                for lesson_record in module_record.get('lessons') or []:
+                    lesson = Lesson(module_id=module.pk, **self._pick(lesson_record, LESSON_FIELDS))
+                    lessons.append(lesson)
+                    contents.append(lesson_record.get('content'))
+            Lesson.objects.bulk_create(lessons)
+
+            Content.objects.bulk_create([
+                Content(lesson_id=lesson.pk, **self._pick(content, CONTENT_FIELDS))
+                for lesson, content in zip(lessons, contents)
+                if content
+            ])
+            course_ids = [course.pk for course in courses]
+            get_search_backend().index(course_ids)
+            rebuild_category_counts(Category.objects.filter(
+                pk__in={course.category_id for course in courses if course.category_id}
+            ))
+        return course_ids
+
+    def finish(self):
+        """Refresh the per-process catalog caches once the import is done"""
+        autocomplete.invalidate()
+        categories.invalidate()
+        bump_catalog_version()
+
+    def _pick(self, record, names):
+        return {name: record[name] for name in names if record.get(name) is not None}
+
+    def _build_course(self, record, slug):
+        lessons = [
+            lesson
+            for module in record.get('modules') or []
+            for lesson in module.get('lessons') or []
+        ]
+        course = Course(**self._pick(record, COURSE_FIELDS))
+        course.slug = slug
+        course.instructor_id = self.instructor_ids.get(record.get('instructor')) or \
+            self.instructor_ids[self.default_instructor]
+        category = record.get('category')
+        course.category_id = self.category_ids[category['slug']] if category else None
+        # bulk_create skips the signals that normally maintain these
+        course.modules_count = len(record.get('modules') or [])
+        course.lessons_count = len(lessons)
+        course.total_lesson_minutes = sum(lesson.get('duration_minutes') or 0 for lesson in lessons)
+        return course
+
+    def _resolve_instructors(self, records):
+        usernames = {record.get('instructor') for record in records} | {self.default_instructor}
+        missing = {name for name in usernames if name} - set(self.instructor_ids)
+        if missing:
+            User = get_user_model()
+            self.instructor_ids.update(
+                User.objects.filter(username__in=missing).values_list('username', 'pk')
+            )
+        for record in records:
+            if record.get('instructor') not in self.instructor_ids and \
+                    self.default_instructor not in self.instructor_ids:
+                raise RecordError(
+                    f"Unknown instructor {record.get('instructor')!r} for course "
+                    f"{record.get('title')!r}"
+                )
+
+    def _resolve_categories(self, records):
+        wanted = {
+            record['category']['slug']: record['category']
+            for record in records if record.get('category')
+        }
+        missing = set(wanted) - set(self.category_ids)
+        if not missing:
+            return
+        self.category_ids.update(
+            Category.objects.filter(slug__in=missing).values_list('slug', 'pk')
+        )
+        new = [
+            Category(slug=slug, name=wanted[slug].get('name') or slug)
+            for slug in missing - set(self.category_ids)
+        ]
+        if new:
+            Category.objects.bulk_create(new, ignore_conflicts=True)
+            # A category may already exist under the same name with another slug
+            by_name = dict(
+                Category.objects.filter(
+                    Q(slug__in=[c.slug for c in new]) | Q(name__in=[c.name for c in new])
+                ).values_list('name', 'pk')
+            )
+            self.category_ids.update((c.slug, by_name[c.name]) for c in new)
+
+    def _unique_slugs(self, records):
+        """Assign unique slugs like Course.save does, with a few queries per batch"""
+        bases = [
+            (slugify(record.get('slug') or record.get('title') or '') or 'course')[:SLUG_MAX_LENGTH - 8]
+            for record in records
+        ]
+        distinct = sorted(set(bases))
+        taken = set()
+        for start in range(0, len(distinct), SLUG_LOOKUP_CHUNK):
+            chunk = distinct[start:start + SLUG_LOOKUP_CHUNK]
+            taken.update(
+                Course.objects.filter(
+                    reduce(or_, (Q(slug=base) | Q(slug__startswith=f'{base}-') for base in chunk))
+                ).values_list('slug', flat=True)
+            )
+
+        slugs = []
+        for base in bases:
+            slug, counter = base, 1
+            while slug in taken:
+                slug = f'{base}-{counter}'
+                counter += 1
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
@@ -0,0 +1,91 @@
+"""
+Windowed enrollment counters and the decayed trending score.
+
+Every enrollment is counted in an hourly bucket per course. A periodic
+refresh (the `refresh_trending_scores` command) sums the buckets into the
+24h/7d/30d counters on Course and computes a trending score in which each
+enrollment weighs half as much every TRENDING_HALF_LIFE_HOURS. Buckets
+older than the longest window are dropped.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Course, CourseEnrollmentBucket
+
+WINDOWS = {
+    'enrollments_24h': timedelta(hours=24),
+    'enrollments_7d': timedelta(days=7),
+    'enrollments_30d': timedelta(days=30),
+}
+RETENTION = max(WINDOWS.values())
+TRENDING_FIELDS = (*WINDOWS, 'trending_score')
+
+
+def bucket_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_enrollment(course_id, moment=None, delta=1):
+    """Add `delta` enrollments to the course's bucket for the given hour"""
+    hour = bucket_hour(moment or timezone.now())
+    if timezone.now() - hour > RETENTION:
+        return
+    buckets = CourseEnrollmentBucket.objects.filter(course_id=course_id, hour=hour)
+    if buckets.update(count=Greatest(F('count') + delta, Value(0))) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            CourseEnrollmentBucket.objects.create(course_id=course_id, hour=hour, count=delta)
+    except IntegrityError:
+        # Created concurrently by another enrollment in the same hour
+        buckets.update(count=F('count') + delta)
+
+
+def refresh_trending_scores(now=None, batch_size=500):
+    """
+    Recompute windowed counters and trending scores from the buckets.
+
+    Only courses whose values changed are written. Returns the number of
+    updated courses.
+    """
+    now = now or timezone.now()
+    half_life = settings.TRENDING_HALF_LIFE_HOURS
+    CourseEnrollmentBucket.objects.filter(hour__lt=now - RETENTION).delete()
+
+    values = {}
+    buckets = CourseEnrollmentBucket.objects.filter(hour__gte=now - RETENTION)
+    for course_id, hour, count in buckets.values_list('course_id', 'hour', 'count').iterator():
+        course = values.setdefault(course_id, dict.fromkeys(TRENDING_FIELDS, 0))
+        age = now - hour
+        for field, window in WINDOWS.items():
+            if age <= window:
+                course[field] += count
+        age_hours = max(age.total_seconds() / 3600, 0)
+        course['trending_score'] += count * 0.5 ** (age_hours / half_life)
+
+    # Courses with stale non-zero values drop back to zero
+    stale = Q()
+    for field in TRENDING_FIELDS:
+        stale |= ~Q(**{field: 0})
+    current = Course.objects.filter(Q(pk__in=list(values)) | stale).values_list(
+        'pk', *TRENDING_FIELDS
+    )
+
+    changed = []
+    for pk, *stored in current.iterator():
+        new = values.get(pk, dict.fromkeys(TRENDING_FIELDS, 0))
+        new['trending_score'] = round(new['trending_score'], 6)
+        if [new[field] for field in TRENDING_FIELDS] != stored:
+            changed.append(Course(pk=pk, **new))
+
+    Course.objects.bulk_update(changed, TRENDING_FIELDS, batch_size=batch_size)
+    if changed:
+        # The home page caches its trending section by catalog version
+        bump_catalog_version()
+    return len(changed)
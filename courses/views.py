@@ -1,35 +1,145 @@
+import orjson
 from rest_framework import viewsets, status, permissions
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from django.db.models import Q
+from django.db.models import Count, Prefetch, Q
+from django.http import Http404, HttpResponse
+from django.utils.http import parse_etags
+from . import categories, suggestions
+from .downloads import find_download, serve_file
 from .models import Category, Course, Module, Lesson, Content
+from .facets import get_facets, normalize_filters
+from .ordering import OrderingError, apply_order, move_after
+from .projections import course_list_projection, lesson_list_projection
+from .recommendations import students_also_took
+from .snapshots import get_snapshot
 from .serializers import (
     CategorySerializer,
     CourseSerializer, CourseListSerializer,
     ModuleSerializer, ModuleListSerializer,
     LessonSerializer, LessonListSerializer,
-    ContentSerializer
+    ContentSerializer, ReorderSerializer,
+    requested_shape,
 )
 
 
+def _wants(fields, name):
+    return fields is None or name in fields
+
+
+def _nested(fields, name):
+    return (fields or {}).get(name) or None
+
+
+def projected_list(view, projection):
+    """
+    ListModelMixin.list with rows fetched by values() and shaped by `projection`.
+
+    Filtering, ordering and pagination run on the queryset as usual; only
+    the projection's columns (and the keyset ordering fields) are read.
+    """
+    keyset = [field.lstrip('-') for field in getattr(view, 'keyset_ordering', ())]
+    queryset = projection.values(view.filter_queryset(view.get_queryset()), *keyset)
+    page = view.paginate_queryset(queryset)
+    if page is not None:
+        return view.get_paginated_response(projection.shape(page))
+    return Response(projection.shape(queryset))
+
+
+def lesson_queryset(fields=None, expand=None):
+    """Lessons with only the joins a requested (fields, expand) shape needs"""
+    queryset = Lesson.objects.all()
+    if 'content' in (expand or {}) and _wants(fields, 'content'):
+        queryset = queryset.select_related('content')
+    return queryset
+
+
+def module_queryset(fields=None, expand=None):
+    """Modules with only the annotations and prefetches a requested shape needs"""
+    queryset = Module.objects.all()
+    expand = expand or {}
+    if _wants(fields, 'lessons_count'):
+        queryset = queryset.annotate(lessons_total=Count('lessons'))
+    if 'lessons' in expand and _wants(fields, 'lessons'):
+        queryset = queryset.prefetch_related(Prefetch(
+            'lessons', queryset=lesson_queryset(_nested(fields, 'lessons'), expand['lessons'])
+        ))
+    return queryset
+
+
+class IsCourseInstructorOrStaff(permissions.BasePermission):
+    """Only the course's instructor (or staff) may change a course or its modules"""
+
+    def has_object_permission(self, request, view, obj):
+        course = obj if isinstance(obj, Course) else obj.course
+        return request.user.is_staff or course.instructor_id == request.user.pk
+
+
+def reorder_children(request, siblings, list_serializer_class, listed=None):
+    """
+    Apply a ReorderSerializer payload to `siblings` and return the new
+    order, serialized from `listed` (default: `siblings`) so callers can
+    add the annotations the list serializer reads.
+    """
+    serializer = ReorderSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    try:
+        if 'order' in data:
+            apply_order(siblings, data['order'])
+        else:
+            move_after(siblings, data['move'], data.get('after'))
+    except OrderingError as error:
+        return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    listed = siblings if listed is None else listed
+    return Response(list_serializer_class(listed.order_by('order', 'id'), many=True).data)
+
+
 class CourseViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing courses
     """
     queryset = Course.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budgets = {
+        'list': 1,
+        'retrieve': 3,
+        'facets': 2,
+        'suggestion_stats': 2,
+        'also_took': 2,
+        'enroll': 9,
+        'lessons': 2,
+        'modules': 3,
+        'outline': 9,
+        'reorder': 10,
+    }
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'price', 'title']
     ordering = ['-created_at']
+    ordering_aliases = {'trending': ['-trending_score', '-created_at']}
+    keyset_ordering = ['-created_at', 'id']
     
     def get_serializer_class(self):
         if self.action == 'list':
             return CourseListSerializer
         return CourseSerializer
     
+    def list(self, request, *args, **kwargs):
+        return projected_list(self, course_list_projection(self.get_serializer(many=True)))
+    
     def get_queryset(self):
+        fields, expand = requested_shape(self.request)
         queryset = Course.objects.all()
+        related = [name for name in ('instructor', 'category') if _wants(fields, name)]
+        if related:
+            queryset = queryset.select_related(*related)
+        if self.action != 'list' and 'modules' in expand and _wants(fields, 'modules'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'modules', queryset=module_queryset(_nested(fields, 'modules'), expand['modules'])
+            ))
         status_filter = self.request.query_params.get('status', None)
         level_filter = self.request.query_params.get('level', None)
         instructor_filter = self.request.query_params.get('instructor', None)
@@ -54,18 +164,66 @@ class CourseViewSet(viewsets.ModelViewSet):
     def modules(self, request, pk=None):
         """Get all modules for a course"""
         course = self.get_object()
-        modules = course.modules.all()
-        serializer = ModuleSerializer(modules, many=True)
+        modules = module_queryset(*requested_shape(request)).filter(course=course)
+        serializer = ModuleSerializer(modules, many=True, context={'request': request})
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticatedOrReadOnly])
+    def outline(self, request, pk=None):
+        """Get the full module/lesson/content tree of a course"""
+        snapshot = get_snapshot(self.get_object().pk)
+        as_msgpack = request.accepted_renderer.format == 'msgpack'
+        # Each representation gets its own validator
+        etag = snapshot.etag[:-1] + '-msgpack"' if as_msgpack else snapshot.etag
+        headers = {'ETag': etag, 'Vary': 'Accept'}
+        client_etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in client_etags or '*' in client_etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if as_msgpack:
+            return Response(orjson.loads(snapshot.payload), headers=headers)
+        # The snapshot already holds the serialized JSON; send it as is.
+        response = HttpResponse(snapshot.payload, content_type='application/json')
+        for name, value in headers.items():
+            response[name] = value
+        return response
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticatedOrReadOnly])
+    def facets(self, request):
+        """Counts per level, category, price and duration for the given filters"""
+        return Response(get_facets(normalize_filters(request.query_params)))
+    
+    @action(detail=False, methods=['get'], url_path='suggestion-stats',
+            permission_classes=[permissions.IsAdminUser])
+    def suggestion_stats(self, request):
+        """Hit/miss counters of the search suggestion cache in this worker"""
+        return Response(suggestions.stats())
+    
+    @action(detail=True, methods=['get'], url_path='also-took',
+            permission_classes=[IsAuthenticatedOrReadOnly])
+    def also_took(self, request, pk=None):
+        """Get courses that students of this course also enrolled in"""
+        courses = students_also_took(self.get_object())
+        serializer = CourseListSerializer(courses, many=True, context={'request': request})
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticatedOrReadOnly])
     def lessons(self, request, pk=None):
         """Get all lessons for a course"""
         course = self.get_object()
-        lessons = Lesson.objects.filter(module__course=course)
-        serializer = LessonSerializer(lessons, many=True)
+        lessons = lesson_queryset(*requested_shape(request)).filter(module__course=course)
+        serializer = LessonSerializer(lessons, many=True, context={'request': request})
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'],
+            permission_classes=[IsAuthenticated, IsCourseInstructorOrStaff])
+    def reorder(self, request, pk=None):
+        """Reorder the modules of a course"""
+        course = self.get_object()
+        return reorder_children(
+            request, Module.objects.filter(course=course), ModuleListSerializer,
+            listed=module_queryset().filter(course=course),
+        )
+    
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def enroll(self, request, pk=None):
         """Enroll current user in a course"""
@@ -95,6 +253,13 @@ class ModuleViewSet(viewsets.ModelViewSet):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budgets = {
+        'list': 1,
+        'retrieve': 2,
+        'lessons': 2,
+        'reorder': 11,
+    }
+    keyset_ordering = ['order', 'id']
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -102,18 +267,26 @@ class ModuleViewSet(viewsets.ModelViewSet):
         return ModuleSerializer
     
     def get_queryset(self):
-        queryset = Module.objects.all()
+        fields, expand = requested_shape(self.request)
+        queryset = module_queryset(fields, {} if self.action == 'list' else expand)
         course_id = self.request.query_params.get('course', None)
         if course_id:
             queryset = queryset.filter(course_id=course_id)
         return queryset
     
+    @action(detail=True, methods=['post'],
+            permission_classes=[IsAuthenticated, IsCourseInstructorOrStaff])
+    def reorder(self, request, pk=None):
+        """Reorder the lessons of a module"""
+        module = self.get_object()
+        return reorder_children(request, Lesson.objects.filter(module=module), LessonListSerializer)
+    
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticatedOrReadOnly])
     def lessons(self, request, pk=None):
         """Get all lessons for a module"""
         module = self.get_object()
-        lessons = module.lessons.all()
-        serializer = LessonSerializer(lessons, many=True)
+        lessons = lesson_queryset(*requested_shape(request)).filter(module=module)
+        serializer = LessonSerializer(lessons, many=True, context={'request': request})
         return Response(serializer.data)
 
 
@@ -124,14 +297,25 @@ class LessonViewSet(viewsets.ModelViewSet):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budgets = {
+        'list': 1,
+        'retrieve': 1,
+        'content': 2,
+        'mark_complete': 13,
+    }
+    keyset_ordering = ['order', 'id']
     
     def get_serializer_class(self):
         if self.action == 'list':
             return LessonListSerializer
         return LessonSerializer
     
+    def list(self, request, *args, **kwargs):
+        return projected_list(self, lesson_list_projection(self.get_serializer(many=True)))
+    
     def get_queryset(self):
-        queryset = Lesson.objects.all()
+        fields, expand = requested_shape(self.request)
+        queryset = lesson_queryset(fields, {} if self.action == 'list' else expand)
         module_id = self.request.query_params.get('module', None)
         course_id = self.request.query_params.get('course', None)
         
@@ -191,6 +375,33 @@ class ContentViewSet(viewsets.ModelViewSet):
     queryset = Content.objects.all()
     serializer_class = ContentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budgets = {
+        'list': 2,
+        'retrieve': 1,
+        'download': 3,
+    }
+    
+    def perform_content_negotiation(self, request, force=False):
+        # Media elements ask for video/*, audio/* etc.; downloads answer any Accept
+        return super().perform_content_negotiation(
+            request, force=force or self.action == 'download'
+        )
+    
+    # Token first, so anonymous requests get a 401 with a WWW-Authenticate
+    # header; DRF answers 403 when the first scheme has no such header.
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny],
+            authentication_classes=[TokenAuthentication, SessionAuthentication])
+    def download(self, request, pk=None):
+        """Deliver the content's file to enrolled students (or anyone for free previews)"""
+        found = find_download(pk, request.user) if pk.isdigit() else None
+        if found is None:
+            raise Http404
+        name, allowed = found
+        if not allowed:
+            if not request.user.is_authenticated:
+                raise NotAuthenticated
+            raise PermissionDenied('You must be enrolled in this course to download this file.')
+        return serve_file(request, name)
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
@@ -200,7 +411,21 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budgets = {
+        'list': 1,
+        'retrieve': 1,
+    }
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    
+    def list(self, request, *args, **kwargs):
+        # The plain directory listing is served from the per-process copy
+        if any(param in request.query_params for param in ('search', 'ordering')):
+            return super().list(request, *args, **kwargs)
+        directory = categories.get_directory()
+        page = self.paginate_queryset(directory)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(directory, many=True).data)
 
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_keyset_pagination_indexes'),
+        ('enrollments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', '-enrolled_at', 'id'], name='enrollments_student_46c995_idx'),
+        ),
+    ]
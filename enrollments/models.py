@@ -24,6 +24,9 @@ class Enrollment(models.Model):
     class Meta:
         unique_together = ['student', 'course']
         ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['student', '-enrolled_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.course.title}"
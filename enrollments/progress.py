@@ -0,0 +1,85 @@
+"""
+Bulk lesson progress updates.
+
+Clients that track playback offline (the mobile app) send progress for
+many lessons at once. The entries are applied in a fixed number of
+queries: the lessons and the student's enrollments are looked up
+together, new records are bulk-created and existing ones bulk-updated,
+and each touched enrollment recalculates its percentage once.
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from courses.models import Lesson
+
+from .models import Enrollment, LessonProgress
+
+
+def record_progress(student, entries):
+    """
+    Apply validated LessonProgressUpdateSerializer entries for `student`.
+
+    As with the single-lesson actions, watch time only grows and a
+    completed lesson stays completed. Returns (created, updated, touched
+    enrollment ids). Raises ValidationError, without saving anything, if
+    a lesson does not exist or its course is not one the student is
+    enrolled in.
+    """
+    merged = {}
+    for entry in entries:
+        current = merged.setdefault(
+            entry['lesson_id'], {'watched_duration': 0, 'is_completed': False}
+        )
+        current['watched_duration'] = max(current['watched_duration'], entry['watched_duration'])
+        current['is_completed'] = current['is_completed'] or entry['is_completed']
+
+    courses = dict(
+        Lesson.objects.filter(pk__in=merged).values_list('pk', 'module__course_id')
+    )
+    enrollments = dict(
+        Enrollment.objects.filter(student=student, course_id__in=set(courses.values()))
+        .values_list('course_id', 'pk')
+    )
+    missing = sorted(lesson_id for lesson_id in merged if courses.get(lesson_id) not in enrollments)
+    if missing:
+        raise serializers.ValidationError({
+            'lesson_id': [
+                'You must be enrolled in this course to track progress '
+                f'(lessons {", ".join(map(str, missing))})'
+            ]
+        })
+
+    now = timezone.now()
+    existing = {
+        record.lesson_id: record
+        for record in LessonProgress.objects.filter(
+            enrollment_id__in=enrollments.values(), lesson_id__in=merged
+        )
+    }
+    created, updated = [], []
+    for lesson_id, entry in merged.items():
+        record = existing.get(lesson_id)
+        if record is None:
+            record = LessonProgress(
+                enrollment_id=enrollments[courses[lesson_id]], lesson_id=lesson_id
+            )
+            created.append(record)
+        else:
+            updated.append(record)
+        record.watched_duration = max(record.watched_duration, entry['watched_duration'])
+        record.is_completed = record.is_completed or entry['is_completed']
+        if record.is_completed and not record.completed_at:
+            record.completed_at = now
+        # auto_now is not applied by bulk_update
+        record.last_watched_at = now
+
+    touched = {record.enrollment_id for record in created + updated}
+    with transaction.atomic():
+        LessonProgress.objects.bulk_create(created)
+        LessonProgress.objects.bulk_update(
+            updated, ['watched_duration', 'is_completed', 'completed_at', 'last_watched_at']
+        )
+        for enrollment in Enrollment.objects.filter(pk__in=touched).select_related('course'):
+            enrollment.update_progress()
+    return len(created), len(updated), touched
@@ -0,0 +1,49 @@
+"""
+values()-based rendering of EnrollmentSerializer for the enrollment list.
+
+Enrollment rows and their nested course are read in one joined query,
+and the lesson progress of every listed enrollment in a second one,
+instead of two queries per enrollment.
+"""
+from courses.projections import (
+    Projection, column, course_list_projection, lesson_list_projection, nested,
+)
+
+from .models import LessonProgress
+
+
+def progress_projection(serializer, prefix=''):
+    """Projection of LessonProgressSerializer"""
+    return Projection(serializer, prefix=prefix, computed={
+        'lesson': nested(lesson_list_projection),
+    })
+
+
+def enrollment_rows(serializer, queryset):
+    """The data of EnrollmentSerializer(queryset, many=True), from values() rows"""
+    progress = {}
+
+    def from_progress(read):
+        return lambda prefix, field: ([], lambda row: read(progress.get(row['id'], [])))
+
+    lesson_progress = progress_projection(serializer.child.fields['lesson_progress'])
+    projection = Projection(serializer, computed={
+        # StringRelatedField: str(user) is the username
+        'student': column('student__username'),
+        'course': nested(course_list_projection),
+        'total_lessons_count': column('course__lessons_count'),
+        'lesson_progress': from_progress(lesson_progress.shape),
+        'completed_lessons_count': from_progress(
+            lambda records: sum(1 for record in records if record['is_completed'])
+        ),
+    })
+
+    rows = list(projection.values(queryset, 'id'))
+    if rows:
+        records = lesson_progress.values(
+            LessonProgress.objects.filter(enrollment_id__in=[row['id'] for row in rows]),
+            'enrollment_id', 'is_completed',
+        )
+        for record in records:
+            progress.setdefault(record['enrollment_id'], []).append(record)
+    return projection.shape(rows)
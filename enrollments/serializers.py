@@ -15,6 +15,13 @@ class LessonProgressSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'last_watched_at', 'completed_at']
 
 
+class LessonProgressUpdateSerializer(serializers.Serializer):
+    """One entry of a bulk lesson progress update"""
+    lesson_id = serializers.IntegerField()
+    watched_duration = serializers.IntegerField(min_value=0, default=0)
+    is_completed = serializers.BooleanField(default=False)
+
+
 class EnrollmentSerializer(serializers.ModelSerializer):
     """Serializer for Enrollment model"""
     student = serializers.StringRelatedField(read_only=True)
@@ -37,8 +44,7 @@ class EnrollmentSerializer(serializers.ModelSerializer):
         return obj.lesson_progress.filter(is_completed=True).count()
     
     def get_total_lessons_count(self, obj):
-        from courses.models import Lesson
-        return Lesson.objects.filter(module__course=obj.course).count()
+        return obj.course.lessons_count
     
     def create(self, validated_data):
         validated_data['student'] = self.context['request'].user
@@ -55,6 +61,13 @@ class EnrollmentListSerializer(serializers.ModelSerializer):
                   'enrolled_at', 'completed_at']
 
 
+class EnrollmentProgressSerializer(serializers.ModelSerializer):
+    """Progress summary of an enrollment"""
+    class Meta:
+        model = Enrollment
+        fields = ['id', 'status', 'progress_percentage']
+
+
 class CourseProgressSerializer(serializers.ModelSerializer):
     """Serializer for CourseProgress model"""
     enrollment = EnrollmentListSerializer(read_only=True)
@@ -1,4 +1,144 @@
+import msgpack
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 
-# Create your tests here.
+from courses.models import Category, Course, Lesson, Module
+from .models import Enrollment, LessonProgress
+from .views import EnrollmentViewSet
 
+User = get_user_model()
+
+
+class SerializedEnrollmentViewSet(EnrollmentViewSet):
+    """my_enrollments through EnrollmentSerializer, as before projections"""
+
+    def my_enrollments(self, request):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return Response(serializer.data)
+
+
+class MyEnrollmentsContractTests(TestCase):
+    """The values()-based enrollment list must render exactly what the serializer renders"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create(username='grace', user_type='instructor')
+        cls.student = User.objects.create(username='linus', user_type='student')
+        category = Category.objects.create(name='Design', slug='design')
+        for index in range(4):
+            course = Course.objects.create(
+                title=f'Course {index}', slug=f'course-{index}', description='About it.',
+                instructor=instructor, category=category if index % 2 else None,
+                thumbnail='course_thumbnails/cover.png' if index == 1 else None,
+                price='49.50', status='published',
+            )
+            module = Module.objects.create(course=course, title='Basics', order=1)
+            lessons = [
+                Lesson.objects.create(module=module, title=f'Lesson {order}', order=order)
+                for order in range(1, 5)
+            ]
+            enrollment = Enrollment.objects.create(
+                student=cls.student, course=course,
+                status='completed' if index == 3 else 'active',
+            )
+            for lesson in lessons[:index]:
+                LessonProgress.objects.create(
+                    enrollment=enrollment, lesson=lesson, is_completed=lesson.order != 2,
+                    watched_duration=lesson.order * 60,
+                )
+
+    def render(self, viewset_class, path):
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, self.student)
+        response = viewset_class.as_view({'get': 'my_enrollments'})(request)
+        response.render()
+        return response
+
+    def test_my_enrollments_matches_serializer(self):
+        for path in (
+            '/api/enrollments/enrollments/my_enrollments/',
+            '/api/enrollments/enrollments/my_enrollments/?status=completed',
+        ):
+            projected = self.render(EnrollmentViewSet, path)
+            self.assertEqual(projected.status_code, 200)
+            self.assertEqual(
+                projected.content, self.render(SerializedEnrollmentViewSet, path).content, path
+            )
+
+    def test_my_enrollments_reads_two_queries(self):
+        request = APIRequestFactory().get('/api/enrollments/enrollments/my_enrollments/')
+        force_authenticate(request, self.student)
+        view = EnrollmentViewSet.as_view({'get': 'my_enrollments'})
+        with self.assertNumQueries(2):
+            view(request).render()
+
+
+class BulkProgressTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create(username='barbara', user_type='instructor')
+        cls.student = User.objects.create(username='ken', user_type='student')
+        course = Course.objects.create(
+            title='Systems', slug='systems', description='About it.', instructor=instructor,
+        )
+        other = Course.objects.create(
+            title='Other', slug='other', description='About it.', instructor=instructor,
+        )
+        module = Module.objects.create(course=course, title='Basics', order=1)
+        cls.lessons = [
+            Lesson.objects.create(module=module, title=f'Lesson {order}', order=order)
+            for order in range(1, 5)
+        ]
+        cls.other_lesson = Lesson.objects.create(
+            module=Module.objects.create(course=other, title='Intro', order=1), title='Intro',
+        )
+        cls.enrollment = Enrollment.objects.create(student=cls.student, course=course)
+        LessonProgress.objects.create(
+            enrollment=cls.enrollment, lesson=cls.lessons[0], watched_duration=300,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def post_msgpack(self, entries):
+        return self.client.post(
+            '/api/enrollments/lesson-progress/bulk/', msgpack.packb(entries),
+            content_type='application/msgpack', HTTP_ACCEPT='application/msgpack',
+        )
+
+    def test_bulk_update_accepts_and_returns_msgpack(self):
+        response = self.post_msgpack([
+            {'lesson_id': self.lessons[0].pk, 'watched_duration': 120, 'is_completed': True},
+            {'lesson_id': self.lessons[1].pk, 'watched_duration': 60},
+            {'lesson_id': self.lessons[1].pk, 'watched_duration': 90},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), {
+            'created': 1,
+            'updated': 1,
+            'enrollments': [
+                {'id': self.enrollment.pk, 'status': 'active', 'progress_percentage': '25.00'},
+            ],
+        })
+        first, second = LessonProgress.objects.filter(enrollment=self.enrollment)
+        self.assertEqual((first.watched_duration, first.is_completed), (300, True))
+        self.assertIsNotNone(first.completed_at)
+        self.assertEqual((second.watched_duration, second.is_completed), (90, False))
+
+    def test_bulk_update_rejects_lessons_outside_enrollments(self):
+        response = self.post_msgpack([
+            {'lesson_id': self.lessons[1].pk, 'watched_duration': 60},
+            {'lesson_id': self.other_lesson.pk, 'watched_duration': 60},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(LessonProgress.objects.count(), 1)
+
+    def test_bulk_update_rejects_invalid_msgpack(self):
+        response = self.client.post(
+            '/api/enrollments/lesson-progress/bulk/', b'\xc1', content_type='application/msgpack',
+        )
+        self.assertEqual(response.status_code, 400)
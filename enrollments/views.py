@@ -2,9 +2,17 @@ from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from .models import Enrollment, LessonProgress
-from .serializers import EnrollmentSerializer, EnrollmentListSerializer, LessonProgressSerializer
+from .progress import record_progress
+from .projections import enrollment_rows
+from .serializers import (
+    EnrollmentSerializer, EnrollmentListSerializer, EnrollmentProgressSerializer,
+    LessonProgressSerializer, LessonProgressUpdateSerializer,
+)
+
+# Entries accepted by one bulk progress request
+BULK_PROGRESS_LIMIT = 500
 
 
 class EnrollmentViewSet(viewsets.ModelViewSet):
@@ -12,6 +20,14 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     ViewSet for managing enrollments
     """
     permission_classes = [IsAuthenticated]
+    query_budgets = {
+        'list': 3,
+        'retrieve': 5,
+        'my_enrollments': 4,
+        'complete': 4,
+        'progress': 5,
+    }
+    keyset_ordering = ['-enrolled_at', 'id']
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -21,7 +37,13 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Return enrollments for the current user"""
         user = self.request.user
-        queryset = Enrollment.objects.filter(student=user)
+        queryset = Enrollment.objects.filter(student=user).select_related(
+            'student', 'course__instructor', 'course__category'
+        )
+        if self.action in ('retrieve', 'progress'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'lesson_progress', queryset=LessonProgress.objects.select_related('lesson')
+            ))
         
         # Filter by status if provided
         status_filter = self.request.query_params.get('status', None)
@@ -71,9 +93,8 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_enrollments(self, request):
         """Get all enrollments for the current user"""
-        enrollments = self.get_queryset()
-        serializer = self.get_serializer(enrollments, many=True)
-        return Response(serializer.data)
+        serializer = self.get_serializer(many=True)
+        return Response(enrollment_rows(serializer, self.get_queryset()))
 
 
 class LessonProgressViewSet(viewsets.ModelViewSet):
@@ -82,12 +103,19 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
     """
     serializer_class = LessonProgressSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'bulk': 13,
+        'mark_complete': 10,
+        'update_watch_time': 10,
+    }
     
     def get_queryset(self):
         """Return lesson progress for the current user's enrollments"""
         user = self.request.user
         enrollments = Enrollment.objects.filter(student=user)
-        return LessonProgress.objects.filter(enrollment__in=enrollments)
+        return LessonProgress.objects.filter(enrollment__in=enrollments).select_related('lesson')
     
     def perform_create(self, serializer):
         """Set the enrollment based on lesson"""
@@ -104,6 +132,21 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
         
         serializer.save(enrollment=enrollment)
     
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """Record watch time and completion for many lessons in one request"""
+        serializer = LessonProgressUpdateSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=BULK_PROGRESS_LIMIT
+        )
+        serializer.is_valid(raise_exception=True)
+        created, updated, enrollment_ids = record_progress(request.user, serializer.validated_data)
+        enrollments = Enrollment.objects.filter(pk__in=enrollment_ids).order_by('id')
+        return Response({
+            'created': created,
+            'updated': updated,
+            'enrollments': EnrollmentProgressSerializer(enrollments, many=True).data,
+        })
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def update_watch_time(self, request, pk=None):
         """Update watch time for a lesson"""
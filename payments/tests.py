@@ -1,3 +1,78 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from courses.models import Course
+from enrollments.models import Enrollment
+from .models import Payment, StripeWebhookEvent
+from .testing import StripeStandIn
+
+User = get_user_model()
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+class StripeWebhookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create(username='ada', user_type='instructor')
+        cls.student = User.objects.create(username='alan', user_type='student')
+        cls.course = Course.objects.create(
+            title='Engines', slug='engines', description='About it.', instructor=instructor,
+            price='49.00', status='published',
+        )
+        cls.payment = Payment.objects.create(
+            user=cls.student, course=cls.course, amount='49.00',
+            stripe_checkout_session_id='cs_test_1',
+        )
+
+    def post(self, payload, headers):
+        return self.client.post(
+            '/payments/webhook/', payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=headers['Stripe-Signature'],
+        )
+
+    def test_completed_checkout_enrolls_the_student(self):
+        payload, headers = StripeStandIn('whsec_test').event('checkout.session.completed', {
+            'id': 'cs_test_1', 'object': 'checkout.session', 'payment_status': 'paid',
+            'payment_intent': 'pi_test_1',
+        })
+        self.assertEqual(self.post(payload, headers).status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(
+            (self.payment.status, self.payment.stripe_payment_intent_id), ('completed', 'pi_test_1')
+        )
+        self.assertTrue(Enrollment.objects.filter(student=self.student, course=self.course).exists())
+        event = StripeWebhookEvent.objects.get()
+        self.assertTrue(event.processed)
+        self.assertEqual(event.payload['data']['object']['id'], 'cs_test_1')
+
+    def test_rejects_bad_signature(self):
+        payload, headers = StripeStandIn('whsec_other').event('checkout.session.completed', {})
+        self.assertEqual(self.post(payload, headers).status_code, 400)
+        self.assertFalse(StripeWebhookEvent.objects.exists())
+
+
+class PaymentPagesTests(TestCase):
+    def test_history_and_cancel_render_card_thumbnails(self):
+        instructor = User.objects.create(username='ada', user_type='instructor')
+        student = User.objects.create(username='alan', user_type='student')
+        course = Course.objects.create(
+            title='Engines', slug='engines', description='About it.', instructor=instructor,
+            price='49.00', status='published', thumbnail='course_thumbnails/engines.jpg',
+            image_variants={'thumbnail': {
+                'source': 'course_thumbnails/engines.jpg',
+                'card': {
+                    'jpg': [[320, '/media/v/card-320.jpg'], [640, '/media/v/card-640.jpg']],
+                    'webp': [[320, '/media/v/card-320.webp'], [640, '/media/v/card-640.webp']],
+                },
+            }},
+        )
+        Payment.objects.create(user=student, course=course, amount='49.00', status='completed')
+        self.client.force_login(student)
+        html = self.client.get('/payments/history/').content.decode()
+        self.assertIn('srcset="/media/v/card-320.webp 320w, /media/v/card-640.webp 640w"', html)
+        self.assertIn('sizes="48px"', html)
+        self.assertNotIn('course_thumbnails/engines.jpg', html)
+
+        html = self.client.get('/payments/cancel/engines/').content.decode()
+        self.assertIn('srcset="/media/v/card-320.webp 320w, /media/v/card-640.webp 640w"', html)
+        self.assertIn('sizes="96px"', html)
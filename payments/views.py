@@ -1,3 +1,5 @@
+import json
+
 import stripe
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
@@ -7,6 +9,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.http import HttpResponse, JsonResponse
 from django.urls import reverse
 from django.utils import timezone
+from Core.query_budgets import query_budget
 from courses.models import Course
 from enrollments.models import Enrollment
 from .models import Payment, StripeWebhookEvent
@@ -26,6 +29,7 @@ except AttributeError:
     stripe.api_key = None
 
 
+@query_budget(4)
 @login_required
 def create_checkout_session(request, course_slug):
     """Create a Stripe checkout session for a course"""
@@ -158,6 +162,7 @@ def create_checkout_session(request, course_slug):
         return redirect('home')
 
 
+@query_budget(2)
 @login_required
 def payment_success(request):
     """Handle successful payment"""
@@ -222,6 +227,7 @@ def payment_success(request):
         return redirect('home')
 
 
+@query_budget(4)
 @login_required
 def payment_cancel(request, course_slug):
     """Handle cancelled payment"""
@@ -246,6 +252,7 @@ def payment_cancel(request, course_slug):
         return redirect('home')
 
 
+@query_budget(10)
 @csrf_exempt
 def stripe_webhook(request):
     """Handle Stripe webhook events"""
@@ -266,6 +273,10 @@ def stripe_webhook(request):
         logger.error(f"STRIPE_WEBHOOK_SECRET not configured: {str(e)}")
         return HttpResponse(status=400)
     
+    # Handle the verified event as plain JSON: stripe's objects are neither
+    # dicts nor JSON serializable
+    event = json.loads(payload)
+    
     # Store webhook event
     try:
         webhook_event, created = StripeWebhookEvent.objects.get_or_create(
@@ -360,6 +371,7 @@ def handle_payment_intent_failed(payment_intent):
         logger.error(f"Error in handle_payment_intent_failed: {str(e)}")
 
 
+@query_budget(3)
 @login_required
 def payment_history(request):
     """View payment history"""
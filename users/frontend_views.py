@@ -2,10 +2,12 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
+from Core.query_budgets import query_budget
 from .models import User, StudentProfile, InstructorProfile
 from enrollments.models import Enrollment
 
 
+@query_budget(2)
 @login_required
 def user_settings(request):
     """User settings page"""
@@ -29,6 +31,7 @@ def user_settings(request):
     return render(request, 'users/user_settings.html', context)
 
 
+@query_budget(4)
 @login_required
 def professor_settings(request, *args, **kwargs):
     """Professor/Instructor settings page"""
@@ -57,7 +60,7 @@ def professor_settings(request, *args, **kwargs):
         return redirect('professor_settings')
     
     # Get instructor's courses
-    instructor_courses = user.courses.filter(status='published').order_by('-created_at')[:10]
+    instructor_courses = request.user.courses.filter(status='published').order_by('-created_at')[:10]
     
     context = {
         'user': request.user,
@@ -67,6 +70,7 @@ def professor_settings(request, *args, **kwargs):
     return render(request, 'users/professor_settings.html', context)
 
 
+@query_budget(7)
 @login_required
 def admin_settings(request):
     """Admin settings page"""
@@ -54,6 +54,9 @@ class StudentProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
     
     def get_enrolled_courses_count(self, obj):
+        # Annotated by the viewset; otherwise one query per profile
+        if hasattr(obj, 'enrolled_courses_total'):
+            return obj.enrolled_courses_total
         return obj.enrolled_courses.count()
 
 
@@ -68,5 +71,7 @@ class InstructorProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
     
     def get_courses_count(self, obj):
+        if hasattr(obj, 'courses_total'):
+            return obj.courses_total
         return obj.user.courses.count()
 
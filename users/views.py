@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth import get_user_model
+from django.db.models import Count
 from .models import StudentProfile, InstructorProfile
 from .serializers import (
     UserSerializer, UserUpdateSerializer, 
@@ -18,6 +19,11 @@ class UserViewSet(viewsets.ModelViewSet):
     """
     queryset = User.objects.all()
     permission_classes = [AllowAny]  # Allow registration
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'me': 2,
+    }
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -56,9 +62,16 @@ class StudentProfileViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing student profiles
     """
-    queryset = StudentProfile.objects.all()
+    queryset = StudentProfile.objects.select_related('user').annotate(
+        enrolled_courses_total=Count('user__enrollments')
+    ).order_by('id')
     serializer_class = StudentProfileSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'my_profile': 4,
+    }
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_profile(self, request):
@@ -78,9 +91,16 @@ class InstructorProfileViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing instructor profiles
     """
-    queryset = InstructorProfile.objects.all()
+    queryset = InstructorProfile.objects.select_related('user').annotate(
+        courses_total=Count('user__courses')
+    ).order_by('id')
     serializer_class = InstructorProfileSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'my_profile': 4,
+    }
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_profile(self, request):